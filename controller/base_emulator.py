@@ -0,0 +1,357 @@
+"""ESP32 base station emulator, and test_mode.py's eight checks run against it.
+
+BaseEmulator behaves like the base's firmware on any paho-compatible
+client: it shows game/display frames, enforces their "buttons" mask,
+records game/sound, ACKs each frame after `ack_delay` plus up to `jitter`
+seconds (losing a `drop` fraction of the ACKs), announces CONNECTED on
+game/connection, leaves DISCONNECTED as its last will, and presses buttons
+from a script of (delay, button) steps. Presses outside the mask are
+dropped on the device, as the real buttons are.
+
+SCENARIOS are test_mode.py's interactive checks with the prompts replaced
+by assertions on what the emulator saw. Each runs `rounds` times against a
+Bus on real time, and the report gives its pass count and latency
+percentiles: server publish to frame or sound on the device, publish to
+ACK settled, device press to server receipt, reconnect to refreshed frame.
+
+Run: python base_emulator.py [--rounds 20] [--ack-delay 0.005] [--jitter 0.005] [--drop 0.05] [scenario ...]
+     python base_emulator.py --broker localhost:1883
+"""
+import argparse, contextlib, heapq, itertools, json, os, random, threading, time
+import paho.mqtt.client as mqtt
+from paho.mqtt.enums import CallbackAPIVersion
+from fleet_sim import percentile
+from memory_broker import MemoryBroker, MemoryClient
+from mqtt_bus import Bus
+
+WAIT = 2.0   # seconds a scenario waits for what it expects
+
+class BaseEmulator:
+    def __init__(self, client, prefix="", ack_delay=0.0, jitter=0.0, drop=0.0, seed=None):
+        self.client = client
+        self.prefix = prefix
+        self.ack_delay, self.jitter, self.drop = ack_delay, jitter, drop
+        self.rng = random.Random(seed)
+        self.frames = []    # (received at, frame)
+        self.sounds = []    # (received at, sound)
+        self.presses = []   # (pressed at, button, sent)
+        self.acks = self.dropped = 0
+        self.mask = set()
+        self.connected_at = None
+        self._due = []      # heap of (time, seq, fn, args)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="base-emulator", daemon=True)
+        self._thread.start()
+        client.on_connect = self._on_connect
+        client.on_message = self._on_message
+        client.will_set(prefix + "game/connection", "DISCONNECTED")
+
+    @property
+    def frame(self):
+        return self.frames[-1][1] if self.frames else {}
+
+    def start(self, host="localhost", port=1883):
+        self.client.connect(host, port, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(1.0)
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def press(self, button):
+        """Press a button; returns False if the current mask ignores it."""
+        sent = button in self.mask
+        self.presses.append((time.monotonic(), button, sent))
+        if sent:
+            self.client.publish(self.prefix + "base/button", json.dumps({"button": button}))
+        return sent
+
+    def play(self, script):
+        """Press buttons from (delay, button) steps, each delay after the previous press."""
+        at = 0.0
+        for delay, button in script:
+            at += delay
+            self.later(at, self.press, button)
+
+    def reset(self, downtime=0.1):
+        """Power-cycle: the will announces DISCONNECTED, the display and mask are
+        lost, and after `downtime` the base reconnects and announces CONNECTED."""
+        if hasattr(self.client, "drop"):
+            self.client.drop()   # memory_broker: no DISCONNECT packet, the will fires
+        else:
+            self.client.publish(self.prefix + "game/connection", "DISCONNECTED")
+            self.client.disconnect()
+            self.client.loop_stop()   # paho's loop thread ends with the connection
+        self.mask = set()
+        self.connected_at = None
+        self.later(downtime, self._reconnect)
+
+    def _reconnect(self):
+        self.client.reconnect()
+        self.client.loop_start()
+
+    def later(self, delay, fn, *args):
+        with self._cond:
+            heapq.heappush(self._due, (time.monotonic() + delay, next(self._seq), fn, args))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._due or self._due[0][0] > time.monotonic()):
+                    self._cond.wait(self._due[0][0] - time.monotonic() if self._due else None)
+                if not self._running:
+                    return
+                _, _, fn, args = heapq.heappop(self._due)
+            fn(*args)
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        client.subscribe(self.prefix + "game/display")
+        client.subscribe(self.prefix + "game/sound")
+        self.connected_at = time.monotonic()
+        client.publish(self.prefix + "game/connection", "CONNECTED")
+
+    def _on_message(self, client, userdata, msg):
+        now = time.monotonic()
+        topic = msg.topic[len(self.prefix):]
+        if topic == "game/sound":
+            self.sounds.append((now, msg.payload.decode()))
+            return
+        if not msg.payload:
+            return   # a retained display cleared by the server's clear_retained()
+        frame = json.loads(msg.payload)
+        self.frames.append((now, frame))
+        if "buttons" in frame:
+            self.mask = set(frame["buttons"] or [])
+        if self.drop and self.rng.random() < self.drop:
+            self.dropped += 1
+            return
+        ack = json.dumps({"seq": frame["seq"]}) if "seq" in frame else ""
+        self.later(self.ack_delay + self.rng.uniform(0, self.jitter), self._ack, ack)
+
+    def _ack(self, payload):
+        self.acks += 1
+        self.client.publish(self.prefix + "game/ack", payload)
+
+class Harness:
+    """The server side of test_mode.py: a Bus, and what it received."""
+    def __init__(self, bus, base):
+        self.bus = bus
+        self.base = base
+        self.buttons = []       # (received at, button)
+        self.connection = []    # (received at, status)
+        self.results = {}       # scenario -> [passed rounds, rounds, latency samples]
+        self.on_connected = None
+
+    def on_message(self, client, userdata, msg):
+        now = time.monotonic()
+        if msg.topic == "base/button":
+            if msg.payload:
+                self.buttons.append((now, json.loads(msg.payload)["button"]))
+        elif msg.topic == "game/connection":
+            status = msg.payload.decode()
+            self.connection.append((now, status))
+            if status == "CONNECTED" and self.on_connected:
+                self.on_connected()
+
+    @staticmethod
+    def wait(cond, timeout=WAIT):
+        end = time.monotonic() + timeout
+        while not cond():
+            if time.monotonic() >= end:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def show(self, frame):
+        """Publish a frame; returns (sent at, Future of its ACK)."""
+        sent = time.monotonic()
+        fut = self.bus.pub("game/display", frame)
+        fut.add_done_callback(lambda f: setattr(f, "settled_at", time.monotonic()))
+        return sent, fut
+
+    def shown(self, frame, since):
+        """When the base received a frame with these lines after `since`, or None."""
+        for at, f in self.base.frames:
+            if at >= since and f.get("line1") == frame["line1"] and f.get("line2") == frame["line2"]:
+                return at
+        return None
+
+    def acked(self, fut, sent, samples):
+        ok = fut.result(timeout=WAIT * 2) is True
+        if ok:
+            # the callback may still be running when result() returns
+            samples.append(getattr(fut, "settled_at", time.monotonic()) - sent)
+        return ok
+
+    def run(self, number, rounds):
+        name, scenario = SCENARIOS[number]
+        stats = self.results.setdefault(name, [0, 0, []])
+        for _ in range(rounds):
+            self.bus.display.flush()
+            stats[1] += 1
+            try:
+                stats[0] += bool(scenario(self, stats[2]))
+            except TimeoutError:
+                pass
+
+    def report(self):
+        lines = [f"{'scenario':22} {'passed':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}"]
+        for name, (passed, rounds, samples) in self.results.items():
+            ms = [percentile(samples, p) * 1e3 for p in (50, 90, 99)]
+            lines.append(f"{name:22} {passed:>4}/{rounds:<3} {ms[0]:8.2f} {ms[1]:8.2f} {ms[2]:8.2f}")
+        lines.append(f"ACKs sent {self.base.acks}, dropped {self.base.dropped}")
+        return "\n".join(lines)
+
+def display_messages(h, samples):
+    frame = {"line1": "Test Mode", "line2": "Display OK?", "buttons": []}
+    sent, fut = h.show(frame)
+    if not h.wait(lambda: h.shown(frame, sent)):
+        return False
+    samples.append(h.shown(frame, sent) - sent)
+    return h.acked(fut, sent, [])
+
+def button_masking(h, samples):
+    frame = {"line1": "Press Button 1", "line2": "(2&3 disabled)", "buttons": [1]}
+    sent, _ = h.show(frame)
+    if not h.wait(lambda: h.shown(frame, sent)):
+        return False
+    start = len(h.buttons)
+    h.base.play([(0, 2), (0, 3), (0.01, 1)])
+    if not h.wait(lambda: len(h.buttons) > start):
+        return False
+    h.wait(lambda: len(h.buttons) > start + 1, timeout=0.05)   # a leaked 2 or 3 would follow
+    pressed = [p for p in h.base.presses if p[1] == 1][-1][0]
+    samples.append(h.buttons[start][0] - pressed)
+    return [b for _, b in h.buttons[start:]] == [1]
+
+def all_buttons(h, samples):
+    frame = {"line1": "Press any button", "line2": "1, 2, or 3", "buttons": [1, 2, 3]}
+    sent, _ = h.show(frame)
+    if not h.wait(lambda: h.shown(frame, sent)):
+        return False
+    start, first = len(h.buttons), len(h.base.presses)
+    h.base.play([(0, 1), (0.01, 2), (0.01, 3)])
+    if not h.wait(lambda: len(h.buttons) >= start + 3):
+        return False
+    for (pressed, _, _), (received, _) in zip(h.base.presses[first:], h.buttons[start:]):
+        samples.append(received - pressed)
+    return [b for _, b in h.buttons[start:]] == [1, 2, 3]
+
+def sound_effects(h, samples):
+    sounds = ["ROLL", "WIN", "DAMAGE", "SIGNAL"]
+    start = len(h.base.sounds)
+    sent = []
+    for sound in sounds:
+        sent.append(time.monotonic())
+        h.bus.pub("game/sound", sound)
+    if not h.wait(lambda: len(h.base.sounds) >= start + len(sounds)):
+        return False
+    received = h.base.sounds[start:]
+    samples.extend(at - t for t, (at, _) in zip(sent, received))
+    return [s for _, s in received] == sounds
+
+def countdown(h, samples):
+    frame = {"line1": "Countdown Test", "line2": "Watch LEDs!", "buttons": []}
+    sent, _ = h.show(frame)
+    start = len(h.base.sounds)
+    sound_sent = time.monotonic()
+    h.bus.pub("game/sound", "MINIGAME_START")
+    if not h.wait(lambda: h.shown(frame, sent) and len(h.base.sounds) > start):
+        return False
+    samples.append(h.base.sounds[start][0] - sound_sent)
+    return h.base.sounds[start][1] == "MINIGAME_START"
+
+def ack_flow(h, samples):
+    sent, fut = h.show({"line1": "ACK Test", "line2": "Waiting...", "buttons": []})
+    return h.acked(fut, sent, samples)
+
+def message_flow(h, samples):
+    frames = [{"line1": f"Message {i}/5", "line2": line2, "buttons": []}
+              for i, line2 in enumerate(["First", "Second", "Third", "Fourth", "Last!"], 1)]
+    sent = [h.show(frame) for frame in frames]
+    if not all(h.acked(fut, at, samples) for at, fut in sent):
+        return False
+    shown = [h.shown(frame, at) for frame, (at, _) in zip(frames, sent)]
+    return None not in shown and shown == sorted(shown) and h.base.frame.get("line1") == "Message 5/5"
+
+def reconnection(h, samples):
+    frame = {"line1": "Reconnected!", "line2": "Success!", "buttons": [1, 2, 3]}
+    h.show({"line1": "Reconnect Test", "line2": "Reset ESP32...", "buttons": []})
+    start = len(h.connection)
+    h.on_connected = lambda: h.show(frame)   # what Table does: refresh the display
+    try:
+        h.base.reset()
+        if not h.wait(lambda: h.base.connected_at and h.shown(frame, h.base.connected_at)):
+            return False
+    finally:
+        h.on_connected = None
+    samples.append(h.shown(frame, h.base.connected_at) - h.base.connected_at)
+    transitions = [status for _, status in h.connection[start:]]
+    return transitions == ["DISCONNECTED", "CONNECTED"] and h.base.mask == {1, 2, 3}
+
+SCENARIOS = {
+    1: ("Display Message", display_messages),
+    2: ("Button Masking", button_masking),
+    3: ("All Buttons", all_buttons),
+    4: ("Sound Effects", sound_effects),
+    5: ("Countdown Sequence", countdown),
+    6: ("ACK Received", ack_flow),
+    7: ("Message Flow Order", message_flow),
+    8: ("Reconnection Refresh", reconnection),
+}
+
+def run_scenarios(numbers=None, rounds=20, ack_delay=0.005, jitter=0.005, drop=0.0, seed=None, broker=None):
+    """Run the scenarios against an emulated base; returns the Harness with results.
+    broker: "host:port" of a running broker; by default memory_broker in-process."""
+    if broker:
+        host, _, port = broker.partition(":")
+        port = int(port or 1883)
+        server = mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2, client_id=f"test-mode-{os.getpid()}")
+        device = mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2, client_id=f"base-emulator-{os.getpid()}")
+    else:
+        host, port = None, None
+        memory = MemoryBroker()
+        server, device = MemoryClient(memory, "test-mode"), MemoryClient(memory, "base-emulator")
+    base = BaseEmulator(device, ack_delay=ack_delay, jitter=jitter, drop=drop, seed=seed)
+    harness = Harness(None, base)
+    harness.bus = bus = Bus(harness.on_message, client=server)
+    if broker:
+        bus.host, bus.port = host, port
+    bus.start()
+    base.start(host, port)
+    try:
+        if not harness.wait(lambda: base.connected_at and harness.connection, timeout=5):
+            raise RuntimeError("base emulator did not connect")
+        for number in numbers or SCENARIOS:
+            harness.run(number, rounds)
+    finally:
+        base.stop()
+        bus.stop()
+    return harness
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("scenarios", nargs="*", type=int, help="numbers 1-8, as in test_mode.py (default: all)")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--ack-delay", type=float, default=0.005)
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--drop", type=float, default=0.0, help="fraction of ACKs lost")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--broker", help="host:port (default: in-process memory broker)")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"no scenario {', '.join(map(str, sorted(unknown)))}")
+    with contextlib.redirect_stdout(open(os.devnull, "w")):   # the bus's connect banner
+        harness = run_scenarios(args.scenarios, args.rounds, args.ack_delay, args.jitter, args.drop, args.seed, args.broker)
+    print(harness.report())
+
+if __name__ == "__main__":
+    main()
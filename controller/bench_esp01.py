@@ -0,0 +1,82 @@
+"""Benchmark: a registration storm against one ESP01Manager.
+
+N meeples register at once into a lobby of N slots, then every one
+announces ONLINE, and the table's tick asks connected_count() as it does
+every 100 ms. "old" is the previous manager, with a linear slot scan and a
+count over every assignment; "new" is esp01.ESP01Manager, with the free-slot
+bitmap and the incremental online counter. Config messages go to a sink.
+
+Run: python bench_esp01.py [meeples]
+"""
+import sys, time
+import logger
+from esp01 import ESP01Manager
+from logger import log
+
+class SinkBus:
+    prefix = "table/1/"
+    def pub(self, topic, payload, **kwargs):
+        pass
+
+class OldManager:
+    """ESP01Manager before the slot bitmap and online counter."""
+    def __init__(self, bus, max_players=3):
+        self.bus = bus
+        self.max_players = max_players
+        self.assignments = {}
+        self.assigned_ids = set()
+        self.connection_status = {}
+
+    def handle_register(self, payload):
+        mac = payload.get("mac")
+        if mac in self.assignments:
+            return
+        for pid in range(self.max_players):
+            if pid not in self.assigned_ids:
+                self.assignments[mac] = pid
+                self.assigned_ids.add(pid)
+                self.connection_status[mac] = "ONLINE"
+                log("ESP01", f"Assigned P{pid+1} to MAC {mac}")
+                ESP01Manager._send_config(self, mac, pid)
+                return
+
+    def handle_status(self, mac, status):
+        self.connection_status[mac] = status
+        if mac in self.assignments:
+            pid = self.assignments[mac]
+            log("ESP01", f"P{pid+1} ({mac}) is now {status}")
+
+    def connected_count(self):
+        return sum(1 for mac in self.assignments if self.connection_status.get(mac) == "ONLINE")
+
+def storm(cls, meeples, ticks=100):
+    """µs per register, per status and per connected_count() call."""
+    manager = cls(SinkBus(), max_players=meeples)
+    macs = [f"MAC_{i:06d}" for i in range(meeples)]
+    start = time.perf_counter()
+    for mac in macs:
+        manager.handle_register({"mac": mac})
+    registered = time.perf_counter()
+    for mac in macs:
+        manager.handle_status(mac, "OFFLINE")
+        manager.handle_status(mac, "ONLINE")
+    statuses = time.perf_counter()
+    for _ in range(ticks):
+        count = manager.connected_count()
+    counted = time.perf_counter()
+    assert count == meeples
+    return ((registered - start) / meeples * 1e6,
+            (statuses - registered) / (2 * meeples) * 1e6,
+            (counted - statuses) / ticks * 1e6)
+
+def main():
+    meeples = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    logger.set_level("ERROR")
+    print(f"{meeples} meeples in one lobby")
+    print(f"{'':4} {'register':>12} {'status':>12} {'count/tick':>12}")
+    for name, cls in (("old", OldManager), ("new", ESP01Manager)):
+        register, status, count = storm(cls, meeples)
+        print(f"{name:4} {register:9.2f} µs {status:9.2f} µs {count:9.1f} µs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark: hot-standby failover time.
+
+Starts the broker stand-in, a primary and a standby (main.py --engine asyncio
+--role primary|standby), drives the legacy table into a 3-player game from a
+simulated base station that ACKs every frame, then SIGKILLs the primary. The
+failover time is from the kill to the standby's republished display, which
+must match the last display the primary showed.
+
+Run: python bench_failover.py [trials]
+"""
+import json, os, signal, statistics, subprocess, sys, time
+import paho.mqtt.client as mqtt
+from paho.mqtt.enums import CallbackAPIVersion
+from broker import BrokerThread
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def wait_for(cond, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.005)
+    raise TimeoutError
+
+def start_server(port, role):
+    return subprocess.Popen(
+        [sys.executable, "main.py", "--engine", "asyncio", "--role", role, "--broker", f"127.0.0.1:{port}"],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def frame(payload):
+    data = json.loads(payload)
+    data.pop("seq", None)
+    return data
+
+def trial():
+    broker = BrokerThread()
+    log = []   # (time, sender, topic, payload)
+    broker.broker.on_publish = lambda sender, topic, payload: log.append((time.time(), sender, topic, payload))
+    primary = start_server(broker.port, "primary")
+    wait_for(lambda: any(t == "replica/game/heartbeat" for _, _, t, _ in log))
+    primary_id = next(s for _, s, t, _ in log if t == "replica/game/heartbeat")
+    standby = start_server(broker.port, "standby")
+    wait_for(lambda: len(broker.broker.sessions) >= 2)
+
+    base = mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2, client_id="base")
+    base.on_message = lambda c, u, m: c.publish("game/ack", json.dumps({"seq": json.loads(m.payload).get("seq")}))
+    base.connect("127.0.0.1", broker.port)
+    base.subscribe("game/display")
+    base.loop_start()
+    try:
+        wait_for(lambda: any(t == "game/display" for _, _, t, _ in log))
+        for button in (3, 1, 2, 3):
+            base.publish("base/button", json.dumps({"button": button}))
+            time.sleep(0.05)
+        time.sleep(0.5)   # let the last state and a few heartbeats reach the standby
+        last = frame([p for _, s, t, p in log if t == "game/display" and s == primary_id][-1])
+
+        killed_at = time.time()
+        primary.send_signal(signal.SIGKILL)
+        wait_for(lambda: any(ts > killed_at and t == "game/display" and s != primary_id
+                             for ts, s, t, _ in log))
+        at, payload = next((ts, p) for ts, s, t, p in log
+                           if ts > killed_at and t == "game/display" and s != primary_id)
+        assert frame(payload) == last, (frame(payload), last)
+        return at - killed_at
+    finally:
+        base.loop_stop()
+        base.disconnect()
+        for proc in (primary, standby):
+            proc.kill()
+            proc.wait()
+        broker.stop()
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    times = []
+    for i in range(trials):
+        t = trial()
+        times.append(t)
+        print(f"trial {i + 1}: failover {t * 1e3:6.1f} ms")
+    print(f"median {statistics.median(times) * 1e3:.1f} ms, max {max(times) * 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Benchmark: bytes per table of game state, and of the whole Table, at 10k tables.
+
+"game" builds N mid-game Games (3 players in turn, a piece lifted) on their
+own; "table" builds N Tables through bench_tables.build_tables(), which
+includes the game, meeple assignments, timers and the display cache.
+tracemalloc counts every allocation made while building.
+
+Run: python bench_game_memory.py [tables]
+"""
+import sys, tracemalloc
+from game_fsm import Game
+from timer_wheel import TimerWheel
+from bench_tables import build_tables
+import esp01, logger
+
+def build_games(count):
+    games = []
+    for i in range(count):
+        game = Game(n_players=3)
+        game.set_turn_order([(0, 5, 1.0), (1, 3, 2.0), (2, 1, 3.0)])
+        game.move_player(i % 3 + 1)
+        for p in game.players:
+            p.sensor_state = "DETECTED"
+        game.get_current_player().lifted_piece = True
+        games.append(game)
+    return games
+
+def measure(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build(count)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used / count
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    logger.log = esp01.log = lambda *a, **k: None
+    print(f"{count} tables")
+    print(f"game  (Game + 3 Players): {measure(build_games, count):8.0f} bytes/table")
+    print(f"table (everything)      : {measure(lambda n: build_tables(n, TimerWheel()), count):8.0f} bytes/table")
+
+if __name__ == "__main__":
+    main()
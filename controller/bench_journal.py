@@ -0,0 +1,68 @@
+"""Benchmark: journal cost on the input path and recovery time.
+
+Records MASH button presses on a set of tables (publishing to a counting sink,
+as in bench_tables.py), then loads the file back and restores every table as
+a restarted server would. The writer thread starts after the presses, so
+"press+record" is the input path alone and "writer" the diffing, labelling
+and writing it does off that path, per record.
+
+Run: python bench_journal.py [tables] [presses]
+"""
+import os, sys, time, tempfile
+from table import State, Table
+from timer_wheel import TimerWheel
+from journal import Journal
+from bench_tables import SinkBus, build_tables, msg
+import esp01, logger
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    presses = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    logger.log = esp01.log = lambda *a, **k: None
+    path = os.path.join(tempfile.mkdtemp(), "bench.journal")
+
+    tables = build_tables(count, TimerWheel())
+    for table in tables:
+        table.game.state = "MINIGAME_RUN"
+        table.game.current_minigame = "MASH"
+        table.timer_state = State.PLAYING
+    journal = Journal(path)
+    for table in tables:
+        journal.record(table)
+    press = msg({"button": 1})
+
+    start = time.perf_counter()
+    for _ in range(presses):
+        for table in tables:
+            table.on_button(press)
+    plain = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(presses):
+        for table in tables:
+            table.on_button(press)
+            journal.record(table)
+    journaled = time.perf_counter() - start
+    start = time.perf_counter()
+    journal.start()
+    journal.stop()
+    written = time.perf_counter() - start
+
+    inputs = count * presses
+    print(f"{count} tables, {inputs} presses, {journal.records} records in {journal.commits} commits, "
+          f"{os.path.getsize(path) / 1024:.0f} KiB")
+    print(f"press        {plain / inputs * 1e6:7.1f} us")
+    print(f"press+record {journaled / inputs * 1e6:7.1f} us")
+    print(f"writer       {written / journal.records * 1e6:7.1f} us/record")
+
+    start = time.perf_counter()
+    snaps = Journal(path).load()
+    loaded = time.perf_counter() - start
+    timers = TimerWheel()
+    for table_id, snap in snaps.items():
+        Table(SinkBus(f"table/{table_id}/"), table_id, timers).restore(snap)
+    restored = time.perf_counter() - start
+    print(f"recovery: load {loaded * 1e3:.1f} ms, load+restore {restored * 1e3:.1f} ms "
+          f"({restored / count * 1e6:.0f} us/table)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark: per-call cost of logging on the hot path.
+
+Times one log call the way table.py makes it for a button press:
+"print" is the old synchronous logger (strftime + print), "queued" a kept
+record handed to the writer thread, and "filtered" a call below the level,
+once with a lazy format string and once with an f-string built anyway.
+The writer is held back while the calls are timed; "writer" is its own
+cost per record, paid off the caller's thread. Output goes to /dev/null.
+
+Run: python bench_logger.py [calls]
+"""
+import contextlib, os, sys, time
+import logger
+
+def old_log(module, msg, level="INFO"):
+    ts = time.strftime("%H:%M:%S")
+    print(f"[{ts}] [{level:5}] [{module:6}] {msg}")
+
+def per_call(fn, calls, chunk=1000):
+    """ns per fn(i) call; the writer drains between chunks, off the clock, as it
+    would every WRITE_INTERVAL in a server. Returns (caller ns, writer ns)."""
+    timed = writer = 0.0
+    for base in range(0, calls, chunk):
+        start = time.perf_counter()
+        for i in range(base, min(base + chunk, calls)):
+            fn(i)
+        mid = time.perf_counter()
+        logger.flush(timeout=60)
+        timed += mid - start
+        writer += time.perf_counter() - mid
+    return timed / calls * 1e9, writer / calls * 1e9
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cases = {
+        "print": lambda i: old_log("INPUT", f"Button {i % 3 + 1} pressed (P{i % 3 + 1})"),
+        "queued": lambda i: logger.log("INPUT", "Button %s pressed (P%d)", i % 3 + 1, i % 3 + 1, table="t1"),
+        "filtered, lazy": lambda i: logger.debug("INPUT", "Button %s pressed (P%d)", i % 3 + 1, i % 3 + 1),
+        "filtered, f-string": lambda i: logger.debug("INPUT", f"Button {i % 3 + 1} pressed (P{i % 3 + 1})"),
+    }
+    results = {}
+    logger.WRITE_INTERVAL = 3600   # only flush() wakes the writer
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, fn in cases.items():
+            results[name], writer = per_call(fn, calls)
+            if name == "queued":
+                results["writer"] = writer
+    for name, ns in results.items():
+        print(f"{name:20} {ns:8.0f} ns/call")
+
+if __name__ == "__main__":
+    main()
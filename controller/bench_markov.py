@@ -0,0 +1,34 @@
+"""Benchmark: exact Markov solve of growing boards.
+
+Each board repeats the 16-tile BOARD_MAP pattern up to the given size, so
+the number of (position, HP) states grows with the square of the length.
+Reports building the chain and solving the expected turns for every state,
+then a cached lookup of the same layout.
+
+Run: python bench_markov.py [sizes...]
+"""
+import sys, time
+from board import BOARD_MAP, BOARD_SIZE, Board
+import markov
+
+def layout(size):
+    tiles = {t: BOARD_MAP[t % BOARD_SIZE] for t in range(1, size) if t % BOARD_SIZE in BOARD_MAP}
+    return Board(f"repeat{size}", size, tiles)
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [16, 64, 256, 1024]
+    for size in sizes:
+        board = layout(size)
+        start = time.perf_counter()
+        chain = markov.chain(board)
+        built = time.perf_counter()
+        expected = chain.expected()
+        solved = time.perf_counter()
+        markov.chain(board).expected()
+        cached = time.perf_counter()
+        print(f"{size:5d} tiles, {chain.Q.shape[0]:7d} states: build {(built - start) * 1000:6.1f} ms, "
+              f"solve {(solved - built) * 1000:6.1f} ms, cached {(cached - solved) * 1000:5.2f} ms; "
+              f"{expected:.1f} turns from the start")
+
+if __name__ == "__main__":
+    main()
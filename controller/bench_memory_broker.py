@@ -0,0 +1,83 @@
+"""Benchmark: in-memory broker throughput.
+
+"core" publishes sensor readings from N meeples, each subscribed to its own
+config topic, to a server holding the game's wildcard filters, and delivers
+them with broker.pump(); matching walks the subscription trie, so the rate
+should not fall with N. "end to end" drives main.py over MemoryClient: a base
+station ACKs every display frame while pressing buttons through initiative,
+both on their own loop threads as with paho.
+
+Run: python bench_memory_broker.py [meeples] [messages]
+"""
+import atexit, json, sys, threading, time
+from memory_broker import MemoryBroker, MemoryClient
+from mqtt_bus import SUBSCRIPTIONS, TABLE_PREFIX
+
+def core(meeples, messages):
+    broker = MemoryBroker()
+    server = MemoryClient(broker, "server")
+    server.on_message = lambda c, u, m: None
+    server.connect()
+    for prefix in ("", TABLE_PREFIX):
+        for topic in SUBSCRIPTIONS:
+            server.subscribe(prefix + topic)
+    clients = []
+    for i in range(meeples):
+        c = MemoryClient(broker, f"MAC_{i}")
+        c.connect()
+        c.subscribe(f"esp01/config/MAC_{i}")
+        clients.append(c)
+    broker.pump()
+    payload = json.dumps({"sensor": 1})
+    start = time.perf_counter()
+    for n in range(messages):
+        clients[n % meeples].publish(f"table/{n % 50}/esp01/player/{n % 3}/sensor", payload)
+        if n % 256 == 255:
+            broker.pump()
+    broker.pump()
+    return messages / (time.perf_counter() - start)
+
+def end_to_end(rounds):
+    import main, logger, esp01
+    logger.log = esp01.log = main.log = lambda *a, **k: None
+    broker = MemoryBroker()
+    main.use_client(MemoryClient(broker, "server"))
+    done = threading.Event()
+    frames = []
+    def on_display(c, u, m):
+        frame = json.loads(m.payload)
+        frames.append(frame)
+        c.publish("game/ack", json.dumps({"seq": frame["seq"]}))
+        if frame["line1"].startswith("P3 rolled"):
+            done.set()
+    base = MemoryClient(broker, "base")
+    base.on_message = on_display
+    base.connect()
+    base.subscribe("game/display")
+    base.loop_start()
+    main.bus.start()
+    main.open_tables()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        done.clear()
+        main.drop_table("")
+        main.get_table("")
+        for button in (3, 1, 2, 3):
+            base.publish("base/button", json.dumps({"button": button}))
+        done.wait(5)
+    elapsed = time.perf_counter() - start
+    main.bus.stop()
+    base.loop_stop()
+    atexit.unregister(main.cleanup)
+    return rounds * 4 / elapsed, len(frames)
+
+def main_():
+    meeples = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    for n in sorted({10, meeples}):
+        print(f"core, {n:5d} meeples: {core(n, messages):9.0f} msg/s")
+    rate, frames = end_to_end(max(1, messages // 400))
+    print(f"end to end: {rate:9.0f} button presses/s ({frames} display frames)")
+
+if __name__ == "__main__":
+    main_()
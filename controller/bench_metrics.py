@@ -0,0 +1,52 @@
+"""Benchmark: per-event cost of the metrics on the hot path.
+
+Times each update the way the server makes it: "counter" a message counted
+by topic (Bus._on_message, Bus.pub), "histogram" a handler timed by topic
+(main.dispatch: two perf_counter() calls and an observe), "ack" an ACK wait
+observed by the display sender and "tick" an unlabeled tick duration.
+"empty" is the loop and lambda call alone and is subtracted from the rest;
+each case is the best of five runs.
+Topics cycle over 100 tables so the label cache is exercised as in a server.
+"render" is one scrape of everything recorded, in ms.
+
+Run: python bench_metrics.py [events]
+"""
+import sys, time
+import metrics
+from metrics import ACK_WAIT, HANDLER_SECONDS, MESSAGES_IN, TICK_SECONDS, topic_label
+
+def per_call(fn, events, repeat=5):
+    """ns per fn(i) call, best of `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(events):
+            fn(i)
+        best = min(best, time.perf_counter() - start)
+    return best / events * 1e9
+
+def timed(i):
+    started = time.perf_counter()
+    HANDLER_SECONDS.observe(time.perf_counter() - started, topic_label(TOPICS[i % 300]))
+
+TOPICS = [f"table/{t}/esp01/player/{p}/sensor" for t in range(100) for p in (1, 2, 3)]
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cases = {
+        "empty": lambda i: None,
+        "counter": lambda i: MESSAGES_IN.inc(topic_label(TOPICS[i % 300])),
+        "histogram": timed,
+        "ack": lambda i: ACK_WAIT.observe(i * 1e-7),
+        "tick": lambda i: TICK_SECONDS.observe(1e-4),
+    }
+    results = {name: per_call(fn, events) for name, fn in cases.items()}
+    base = results.pop("empty")
+    for name, ns in results.items():
+        print(f"{name:10} {ns - base:6.0f} ns/event")
+    start = time.perf_counter()
+    metrics.render()
+    print(f"{'render':10} {(time.perf_counter() - start) * 1e3:6.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Micro-benchmark: TopicRouter vs the old if/startswith/endswith chain in on_message.
+
+"trie" is an uncached resolve (first time a topic is seen), "router" is the
+steady-state dispatch through the resolved-topic table.
+
+Run: python bench_router.py [iterations]
+"""
+import sys, timeit
+from router import TopicRouter
+
+TOPICS = [
+    "base/button",
+    "esp01/player/2/sensor",
+    "esp01/AA:BB:CC:DD:EE:FF/status",
+    "esp01/register",
+    "game/connection",
+]
+
+def noop(*args):
+    pass
+
+def legacy_chain(topic):
+    """Topic checks of the pre-router on_message, without the handler bodies."""
+    if topic == "game/connection":
+        return noop()
+    if topic == "esp01/register":
+        return noop()
+    if topic.startswith("esp01/") and topic.endswith("/status"):
+        mac = topic.split("/")[1]
+        return noop(mac)
+    if topic.startswith("esp01/player/") and topic.endswith("/sensor"):
+        pid = topic.split("/")[2]
+        return noop(pid)
+    return noop()
+
+def build_router():
+    router = TopicRouter()
+    for pattern in ["game/connection", "esp01/register", "esp01/+/status", "esp01/player/+/sensor", "base/button"]:
+        router.add(pattern, noop)
+    return router
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    router = build_router()
+    print(f"{'topic':34} {'chain ns':>9} {'trie ns':>9} {'router ns':>9} {'speedup':>8}")
+    for topic in TOPICS:
+        t_chain = min(timeit.repeat(lambda: legacy_chain(topic), number=n, repeat=5)) / n * 1e9
+        t_trie = min(timeit.repeat(lambda: router._resolve(topic), number=n, repeat=5)) / n * 1e9
+        t_router = min(timeit.repeat(lambda: router.dispatch(topic), number=n, repeat=5)) / n * 1e9
+        print(f"{topic:34} {t_chain:9.1f} {t_trie:9.1f} {t_router:9.1f} {t_chain / t_router:7.2f}x")
+
+if __name__ == "__main__":
+    main()
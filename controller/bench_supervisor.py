@@ -0,0 +1,163 @@
+"""Benchmark: input throughput of the supervisor's worker pool.
+
+--mode cpu (the default) is open loop and CPU bound: a fixed set of tables is
+sharded over 1, 2, 4, ... workers with the same shard_owner() the server
+uses. Each worker builds its own tables (publishing to a counting sink, as in
+bench_tables.py), puts them in the MASH minigame and then, for a fixed
+duration, feeds JSON button presses round-robin through Table.on_button. The
+aggregate presses/s should scale with the worker count up to the number of
+cores.
+
+--mode e2e starts the broker stand-in (broker.py) and a Supervisor whose
+workers run the real supervisor.worker_main(), each serving its shard over
+MQTT. fleet_sim.py plays every table over TCP: bases press as soon as the
+display offers buttons, meeples register and stream their sensors, and bases
+announce themselves so tables opened by --tables before they subscribed show
+their display again. Answered presses/s (button -> next display frame) and
+their latency are reported with and without --tables, along with the number
+of workers the broker delivers each table's presses to. Without --tables a
+worker subscribes to a table's topics only once it opens it, so that number
+stays 1 in both configurations instead of growing with the pool.
+
+The e2e load generator and the broker are one process each; on a machine
+with few cores they compete with the workers.
+
+Run: python bench_supervisor.py [--mode cpu|e2e] [--tables N] [--seconds S]
+                                [workers ...]
+"""
+import os, time, asyncio, argparse
+import fleet_sim, supervisor
+from broker import BrokerThread, topic_matches
+from fleet_sim import percentile
+from supervisor import Supervisor, shard_predicate, worker_main
+
+def cpu_worker(index, members, heartbeats, control, adopt, table_ids):
+    import logger, esp01
+    from table import State
+    from timer_wheel import TimerWheel
+    from bench_tables import build_tables, msg
+    logger.log = esp01.log = lambda *a, **k: None
+
+    owns = shard_predicate(index, members)
+    mine = [t for t in table_ids if owns(t)]
+    tables = build_tables(len(mine), TimerWheel())
+    for table in tables:
+        table.game.state = "MINIGAME_RUN"
+        table.game.current_minigame = "MASH"
+        table.timer_state = State.PLAYING
+    presses = [msg({"button": b}) for b in (1, 2, 3)]
+    heartbeats.put({"worker": index, "ready": True})
+    _, seconds = control.get()   # ("go", seconds): start together
+
+    count = 0
+    start = time.perf_counter()
+    end = start + seconds
+    while time.perf_counter() < end:
+        for table in tables:
+            table.on_button(presses[count % 3])
+            count += 1
+    heartbeats.put({"worker": index, "inputs": count,
+                    "elapsed": time.perf_counter() - start})
+
+def run_cpu(workers, tables, seconds):
+    """Aggregate presses/s of `workers` workers, each on its own shard."""
+    table_ids = [str(i) for i in range(tables)]
+    sup = Supervisor(workers, target=cpu_worker, table_ids=table_ids)
+    sup.start()
+    ready, results = set(), {}
+    while len(ready) < workers:
+        beat = sup.heartbeats.get(timeout=60)
+        ready.add(beat["worker"])
+    for _, control in sup.procs.values():
+        control.put(("go", seconds))
+    while len(results) < workers:
+        beat = sup.heartbeats.get(timeout=seconds + 60)
+        results[beat["worker"]] = beat
+    for proc, _ in sup.procs.values():
+        proc.join()
+    return sum(r["inputs"] / r["elapsed"] for r in results.values())
+
+def e2e_worker(index, members, heartbeats, control, adopt, table_ids):
+    """worker_main() against the benchmark's broker, without the INFO log."""
+    import logger, main
+    logger.set_level("ERROR")
+    host, _, port = os.environ["BENCH_BROKER"].partition(":")
+    main.bus.host, main.bus.port = host, int(port)
+    worker_main(index, members, heartbeats, control, adopt, table_ids)
+
+def fan_in(broker, tables):
+    """Mean number of workers subscribed to a table's button topic."""
+    subscribed = [filters for session, filters in broker.filters.items()
+                  if session.client_id.startswith("GameServer_")]
+    topics = [f"table/{t}/base/button" for t in range(1, tables + 1)]
+    hits = sum(any(topic_matches(f, topic) for f in filters)
+               for topic in topics for filters in subscribed)
+    return hits / len(topics)
+
+def run_e2e(workers, tables, seconds, fixed):
+    """Play `tables` tables against `workers` workers; returns fleet_sim's
+    Stats and the fan-in."""
+    broker = BrokerThread()
+    address = os.environ["BENCH_BROKER"] = f"127.0.0.1:{broker.port}"
+    table_ids = [str(t) for t in range(1, tables + 1)] if fixed else None
+    sup = Supervisor(workers, target=e2e_worker, table_ids=table_ids)
+    sup.start()
+    try:
+        up = set()
+        while len(up) < workers:   # the first heartbeat comes once subscribed
+            up.add(sup.heartbeats.get(timeout=60)["worker"])
+        args = fleet_sim.parse_args([
+            "--broker", address, "--tables", str(tables),
+            "--duration", str(seconds), "--ramp", "0",
+            "--press-interval", "0.01", "--announce", "--seed", "1"])
+        fleet, _ = asyncio.run(fleet_sim.simulate(args))
+        fanned = broker.call(fan_in, broker.broker, tables)
+    finally:
+        sup.stop(clear=False)
+        broker.stop()
+    return fleet.stats, fanned
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("cpu", "e2e"), default="cpu")
+    parser.add_argument("--tables", type=int)
+    parser.add_argument("--seconds", type=float)
+    parser.add_argument("workers", type=int, nargs="*")
+    args = parser.parse_args()
+    supervisor.log = lambda *a, **k: None
+    cores = os.cpu_count()
+    counts = args.workers or sorted({1, 2, 4, cores})
+
+    if args.mode == "cpu":
+        tables, seconds = args.tables or 256, args.seconds or 2.0
+        print(f"{tables} tables, {cores} cores, {seconds:.0f}s per run")
+        print(f"{'workers':>7} {'presses/s':>12} {'speedup':>8} "
+              f"{'efficiency':>10}")
+        base = None
+        for workers in counts:
+            rate = run_cpu(workers, tables, seconds)
+            base = base or rate
+            print(f"{workers:7d} {rate:12.0f} {rate / base:8.2f} "
+                  f"{rate / base / workers:10.0%}")
+        return
+
+    tables, seconds = args.tables or 100, args.seconds or 5.0
+    print(f"{tables} tables, {cores} cores, {seconds:.0f}s per run")
+    print(f"{'workers':>7} {'subscribed':>10} {'presses/s':>10} "
+          f"{'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'unanswered':>10} "
+          f"{'fan-in':>10}")
+    for fixed in (False, True):
+        base = None
+        for workers in counts:
+            stats, fanned = run_e2e(workers, tables, seconds, fixed)
+            rate = len(stats.display) / seconds
+            base = base or rate
+            speedup = rate / base if base else 0.0
+            print(f"{workers:7d} {'--tables' if fixed else 'discovery':>10} "
+                  f"{rate:10.0f} {speedup:8.2f} "
+                  f"{percentile(stats.display, 50) * 1e3:8.1f} "
+                  f"{percentile(stats.display, 99) * 1e3:8.1f} "
+                  f"{stats.unanswered:10d} {fanned:10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark: memory per table and tick cost as the number of hosted tables grows.
+
+Each table gets a 3-player game with registered meeples and finished initiative
+(so every table holds a pending INITIATIVE_COOLDOWN timer on the shared wheel),
+then the server tick is timed over all tables. Publishing goes to a counting
+sink so the numbers are the table logic alone.
+
+Run: python bench_tables.py [count ...]
+"""
+import sys, json, time, tracemalloc, types
+from table import Table
+from timer_wheel import TimerWheel
+import esp01, logger
+
+class SinkBus:
+    """Counts publishes instead of sending them."""
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.last_display = None
+        self.published = 0
+
+    def pub(self, topic, payload, **kwargs):
+        self.published += 1
+        if topic == "game/display" and kwargs.get("cache", True):
+            self.last_display = json.dumps(payload)
+
+def msg(payload):
+    return types.SimpleNamespace(payload=json.dumps(payload).encode() if not isinstance(payload, str) else payload.encode())
+
+def build_tables(count, timers):
+    tables = []
+    for i in range(count):
+        table = Table(SinkBus(f"table/{i}/"), str(i), timers)
+        table.start()
+        table.on_button(msg({"button": 3}))
+        for n in range(3):
+            mac = f"{i:06d}{n}"
+            table.on_register(msg({"mac": mac}))
+            table.on_meeple_status(msg("ONLINE"), mac)
+        for b in (1, 2, 3):
+            table.on_button(msg({"button": b}))
+        tables.append(table)
+    return tables
+
+def main():
+    counts = [int(c) for c in sys.argv[1:]] or [10, 100, 1000, 5000]
+    logger.log = esp01.log = lambda *a, **k: None
+    print(f"{'tables':>7} {'KiB/table':>10} {'tick ms':>9} {'us/table':>9}")
+    for count in counts:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        timers = TimerWheel()
+        tables = build_tables(count, timers)
+        per_table = (tracemalloc.get_traced_memory()[0] - before) / count
+        tracemalloc.stop()
+
+        now = time.time()
+        rounds = 20
+        start = time.perf_counter()
+        for _ in range(rounds):
+            timers.advance(now)
+            for table in tables:
+                table.tick(now)
+        tick = (time.perf_counter() - start) / rounds
+        print(f"{count:7d} {per_table / 1024:10.2f} {tick * 1e3:9.3f} {tick / count * 1e6:9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
 # board.py
+import json, tomllib
 
 BOARD_SIZE = 16
 
 # Tile Types
 TYPE_NORMAL = "normal"
-TYPE_DMG_1  = "dmg_1" 
-TYPE_DMG_2  = "dmg_2"  
+TYPE_DMG_1  = "dmg_1"
+TYPE_DMG_2  = "dmg_2"
 TYPE_HEAL_1 = "heal_1"
-TYPE_HEAL_2 = "heal_2" 
+TYPE_HEAL_2 = "heal_2"
 TYPE_GOAL   = "goal"
+TYPE_TELEPORT = "teleport"
+TYPE_SKIP     = "skip"
+TYPE_MULTI    = "multi"    # more than one effect on the tile
+TYPE_DMG      = "dmg"      # damage other than 1 or 2
+TYPE_HEAL     = "heal"
 
 BOARD_MAP = {
     2:  TYPE_DMG_1,
@@ -21,15 +27,119 @@ BOARD_MAP = {
     BOARD_SIZE: TYPE_GOAL
 }
 
+# Type codes are indexes into TILE_TYPES
+TILE_TYPES = [TYPE_NORMAL, TYPE_DMG_1, TYPE_DMG_2, TYPE_HEAL_1, TYPE_HEAL_2, TYPE_GOAL,
+              TYPE_TELEPORT, TYPE_SKIP, TYPE_MULTI, TYPE_DMG, TYPE_HEAL]
+TYPE_CODE = {name: code for code, name in enumerate(TILE_TYPES)}
+
+# Effects of the named tiles; a file may also give {"hp": n, "teleport": tile, "skip": turns}
+PRESETS = {
+    TYPE_NORMAL: {},
+    TYPE_DMG_1: {"hp": -1},
+    TYPE_DMG_2: {"hp": -2},
+    TYPE_HEAL_1: {"hp": 1},
+    TYPE_HEAL_2: {"hp": 2},
+    TYPE_GOAL: {},
+}
+HP_TYPES = {-1: TYPE_DMG_1, -2: TYPE_DMG_2, 1: TYPE_HEAL_1, 2: TYPE_HEAL_2}
+
+class Board:
+    """A layout compiled once into flat per-tile lists, indexed by position 0..size:
+
+    kind  type code (TILE_TYPES)
+    hp    HP change on landing
+    jump  where the player ends up (the tile itself unless it teleports)
+    skip  turns the player then sits out
+    """
+    def __init__(self, name, size, tiles):
+        if size < 2:
+            raise ValueError(f"board {name}: size must be at least 2")
+        self.name = name
+        self.size = size
+        self.kind = [TYPE_CODE[TYPE_NORMAL]] * size + [TYPE_CODE[TYPE_GOAL]]
+        self.hp = [0] * (size + 1)
+        self.jump = list(range(size + 1))
+        self.skip = [0] * (size + 1)
+        for pos, spec in tiles.items():
+            pos = int(pos)
+            if pos == size and spec in (TYPE_GOAL, {}):
+                continue
+            if not 0 < pos < size:
+                raise ValueError(f"board {name}: tile {pos} is off the board")
+            self._compile(pos, spec)
+        self.layout = (tuple(self.hp), tuple(self.jump), tuple(self.skip))
+
+    def _compile(self, pos, spec):
+        if isinstance(spec, str):
+            spec = {"type": spec}
+        preset = spec.get("type", TYPE_NORMAL)
+        if preset not in PRESETS:
+            raise ValueError(f"board {self.name}: unknown tile type {preset!r} at {pos}")
+        effects = dict(PRESETS[preset])
+        effects.update((k, v) for k, v in spec.items() if k != "type")
+        hp = int(effects.pop("hp", 0))
+        jump = int(effects.pop("teleport", pos))
+        skip = int(effects.pop("skip", 0))
+        if effects:
+            raise ValueError(f"board {self.name}: unknown tile effect {', '.join(effects)} at {pos}")
+        if not 0 <= jump <= self.size or skip < 0:
+            raise ValueError(f"board {self.name}: bad teleport or skip at {pos}")
+        if (jump != pos) + bool(skip) + bool(hp) > 1:
+            kind = TYPE_MULTI
+        elif jump != pos:
+            kind = TYPE_TELEPORT
+        elif skip:
+            kind = TYPE_SKIP
+        elif hp:
+            kind = HP_TYPES.get(hp, TYPE_DMG if hp < 0 else TYPE_HEAL)
+        else:
+            kind = TYPE_NORMAL
+        self.kind[pos] = TYPE_CODE[kind]
+        self.hp[pos] = hp
+        self.jump[pos] = jump
+        self.skip[pos] = skip
+
+    @classmethod
+    def from_map(cls, name, board_map, size):
+        """A board from a {tile: type} map like BOARD_MAP."""
+        return cls(name, size, board_map)
+
+    def effect(self, pos):
+        """(type, hp change) of landing on `pos`, like get_tile_effect()."""
+        pos = min(pos, self.size)
+        return TILE_TYPES[self.kind[pos]], self.hp[pos]
+
+CLASSIC = Board.from_map("classic", BOARD_MAP, BOARD_SIZE)
+
+BOARDS = {CLASSIC.name: CLASSIC}   # every board this server knows, by name
+TABLE_BOARDS = {}                  # table_id -> board name; others use the default
+default_board = CLASSIC.name
+
 def get_tile_effect(pos):
-    if pos >= BOARD_SIZE:
-        return TYPE_GOAL, 0
-    
-    t_type = BOARD_MAP.get(pos, TYPE_NORMAL)
-    
-    if t_type == TYPE_DMG_1:  return t_type, -1
-    if t_type == TYPE_DMG_2:  return t_type, -2
-    if t_type == TYPE_HEAL_1: return t_type, 1
-    if t_type == TYPE_HEAL_2: return t_type, 2
-    
-    return TYPE_NORMAL, 0
\ No newline at end of file
+    return CLASSIC.effect(pos)
+
+def get_board(name=None):
+    return BOARDS[name or default_board]
+
+def board_for(table_id):
+    return get_board(TABLE_BOARDS.get(table_id))
+
+def load_boards(path):
+    """Add the boards of a JSON or TOML file; returns their names.
+
+    {"boards": {"long": {"size": 40, "tiles": {"3": "dmg_1", "9": {"teleport": 20, "hp": -1}}}},
+     "tables": {"t1": "long"}, "default": "classic"}
+    """
+    with open(path, "rb") as f:
+        data = tomllib.load(f) if str(path).endswith(".toml") else json.load(f)
+    loaded = {name: Board(name, int(spec["size"]), spec.get("tiles", {}))
+              for name, spec in data.get("boards", {}).items()}
+    BOARDS.update(loaded)
+    for table_id, name in data.get("tables", {}).items():
+        if name not in BOARDS:
+            raise ValueError(f"table {table_id}: unknown board {name!r}")
+        TABLE_BOARDS[table_id] = name
+    if "default" in data:
+        global default_board
+        default_board = get_board(data["default"]).name
+    return list(loaded)
@@ -0,0 +1,393 @@
+"""Minimal MQTT broker stand-in for tests and local runs.
+
+Speaks enough of MQTT 3.1.1 and 5.0 for paho clients: CONNECT, SUBSCRIBE and
+UNSUBSCRIBE with '+'/'#' filters, PUBLISH at QoS 0/1, retained messages,
+last will, persistent sessions (kept in memory) and MQTT 5 shared
+subscriptions ($share/{group}/{filter}), which hand each message to one
+member of the group in turn. No auth or QoS 2. memory_broker.py runs the
+same core in-process, without sockets.
+
+Run: python broker.py [--port 1883]
+"""
+import asyncio, argparse, itertools, struct, threading
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+def topic_matches(filt, topic):
+    """MQTT filter matching; wildcards at the first level skip $-topics."""
+    f, t = filt.split("/"), topic.split("/")
+    if t[0].startswith("$") and f[0] in ("+", "#"):
+        return False
+    for i, level in enumerate(f):
+        if level == "#":
+            return True
+        if i >= len(t) or (level != "+" and level != t[i]):
+            return False
+    return len(f) == len(t)
+
+class _Node:
+    """One level of the subscription trie."""
+    __slots__ = ("children", "subs", "shared", "rr")
+
+    def __init__(self):
+        self.children = {}
+        self.subs = {}      # session -> qos
+        self.shared = {}    # group -> {session: qos}
+        self.rr = {}        # group -> next member index
+
+class _Parked:
+    """Stands in for a disconnected persistent session, queueing its QoS 1 messages."""
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.queue = []
+
+    def deliver(self, topic, payload, qos, retain):
+        if qos:
+            self.queue.append((topic, payload, qos, retain))
+
+class Broker:
+    """Transport-independent broker core.
+
+    A session is any object with `client_id` and deliver(topic, payload, qos,
+    retain); an optional `persistent` (clean session off) keeps its
+    subscriptions and queues QoS 1 messages while it is away, and an optional
+    `will` tuple is published when it drops without DISCONNECT. Subscriptions
+    live in a trie of topic levels, so matching costs the topic's depth, not
+    the number of subscribers. on_publish, if set, is called as
+    on_publish(client_id, topic, payload) for every accepted PUBLISH.
+    """
+    def __init__(self):
+        self.root = _Node()
+        self.sessions = {}
+        self.parked = {}      # client_id -> _Parked
+        self.filters = {}     # session -> {filter: (node, group or None)}
+        self.retained = {}    # topic -> (payload, qos)
+        self.on_publish = None
+
+    def connect(self, session):
+        """Attach a session; returns True if a persistent session was resumed."""
+        old = self.sessions.get(session.client_id)
+        if old is not None and old is not session:
+            self.disconnect(old, clean=True)
+            old.close()
+        self.sessions[session.client_id] = session
+        parked = self.parked.pop(session.client_id, None)
+        if parked is None:
+            return False
+        if not getattr(session, "persistent", False):
+            self._drop_subs(parked)
+            return False
+        self._move_subs(parked, session)
+        for message in parked.queue:
+            session.deliver(*message)
+        return True
+
+    def disconnect(self, session, clean):
+        if self.sessions.get(session.client_id) is session:
+            del self.sessions[session.client_id]
+        if getattr(session, "persistent", False):
+            parked = self.parked[session.client_id] = _Parked(session.client_id)
+            self._move_subs(session, parked)
+        else:
+            self._drop_subs(session)
+        will, session.will = getattr(session, "will", None), None
+        if will and not clean:
+            self.publish(*will)
+
+    def _move_subs(self, old, new):
+        subs = self.filters.pop(old, {})
+        for node, group in subs.values():
+            members = node.subs if group is None else node.shared[group]
+            if old in members:
+                members[new] = members.pop(old)
+        self.filters[new] = subs
+
+    def _drop_subs(self, session):
+        for node, group in self.filters.pop(session, {}).values():
+            (node.subs if group is None else node.shared[group]).pop(session, None)
+
+    def _node(self, filt):
+        node = self.root
+        for level in filt.split("/"):
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _Node()
+            node = child
+        return node
+
+    def subscribe(self, session, filt, qos):
+        group = None
+        key = filt
+        if filt.startswith("$share/"):
+            _, group, filt = filt.split("/", 2)
+        node = self._node(filt)
+        if group is None:
+            node.subs[session] = qos
+        else:
+            node.shared.setdefault(group, {})[session] = qos
+        self.filters.setdefault(session, {})[key] = (node, group)
+        if group is None:   # retained messages are not sent to shared subscriptions
+            if "+" in filt or "#" in filt:
+                hits = [(t, m) for t, m in self.retained.items() if topic_matches(filt, t)]
+            else:
+                hits = [(filt, self.retained[filt])] if filt in self.retained else []
+            for topic, (payload, rqos) in hits:
+                session.deliver(topic, payload, min(qos, rqos), True)
+        return qos
+
+    def unsubscribe(self, session, filt):
+        node, group = self.filters.get(session, {}).pop(filt, (None, None))
+        if node is not None:
+            (node.subs if group is None else node.shared[group]).pop(session, None)
+
+    def _match(self, node, levels, i, out, dollar):
+        if i == len(levels):
+            out.append(node)
+            wild = node.children.get("#")   # "a/#" also matches "a"
+            if wild is not None:
+                out.append(wild)
+            return
+        if not (i == 0 and dollar):
+            wild = node.children.get("#")
+            if wild is not None:
+                out.append(wild)
+            plus = node.children.get("+")
+            if plus is not None:
+                self._match(plus, levels, i + 1, out, dollar)
+        child = node.children.get(levels[i])
+        if child is not None:
+            self._match(child, levels, i + 1, out, dollar)
+
+    def publish(self, topic, payload, qos=0, retain=False, sender=None):
+        if self.on_publish:
+            self.on_publish(sender, topic, payload)
+        if retain:
+            if payload:
+                self.retained[topic] = (payload, qos)
+            else:
+                self.retained.pop(topic, None)
+        nodes = []
+        self._match(self.root, topic.split("/"), 0, nodes, topic.startswith("$"))
+        for node in nodes:
+            for session, sub_qos in list(node.subs.items()):
+                session.deliver(topic, payload, min(qos, sub_qos), False)
+            for group, members in node.shared.items():
+                if members:
+                    i = node.rr.get(group, 0)
+                    node.rr[group] = i + 1
+                    session, sub_qos = list(members.items())[i % len(members)]
+                    session.deliver(topic, payload, min(qos, sub_qos), False)
+
+# Packet codec, shared with fleet_sim.py's asyncio client.
+
+def encode_varint(n):
+    """MQTT variable byte integer."""
+    out = bytearray()
+    while True:
+        n, byte = n >> 7, n & 0x7F
+        out.append(byte | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+def encode_str(s):
+    """u16 length-prefixed string or bytes."""
+    data = s.encode() if isinstance(s, str) else s
+    return struct.pack("!H", len(data)) + data
+
+def packet(ptype, flags, body):
+    """One whole packet: fixed header, remaining length and body."""
+    return bytes([ptype << 4 | flags]) + encode_varint(len(body)) + body
+
+async def read_packet(reader):
+    """Next packet from an asyncio StreamReader as (type, flags, body)."""
+    head = (await reader.readexactly(1))[0]
+    n = shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        n |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            break
+    return head >> 4, head & 0x0F, await reader.readexactly(n)
+
+class Reader:
+    """Cursor over a packet body."""
+    def __init__(self, data):
+        self.data, self.pos = data, 0
+
+    def u8(self):
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def u16(self):
+        self.pos += 2
+        return struct.unpack_from("!H", self.data, self.pos - 2)[0]
+
+    def varint(self):
+        n = shift = 0
+        while True:
+            byte = self.u8()
+            n |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return n
+
+    def blob(self):
+        n = self.u16()
+        self.pos += n
+        return self.data[self.pos - n:self.pos]
+
+    def text(self):
+        return self.blob().decode()
+
+    def skip_props(self):
+        n = self.varint()
+        self.pos += n
+
+    def rest(self):
+        return self.data[self.pos:]
+
+class Connection:
+    """One TCP client: decodes packets into Broker calls and encodes deliveries."""
+    def __init__(self, broker, reader, writer):
+        self.broker = broker
+        self.reader, self.writer = reader, writer
+        self.client_id = None
+        self.v5 = False
+        self.will = None
+        self.persistent = False
+        self._pids = itertools.cycle(range(1, 65536))
+
+    def send(self, ptype, flags, body):
+        self.writer.write(packet(ptype, flags, body))
+
+    def props(self):
+        return b"\x00" if self.v5 else b""
+
+    def deliver(self, topic, payload, qos, retain):
+        body = encode_str(topic)
+        if qos:
+            body += struct.pack("!H", next(self._pids))
+        self.send(PUBLISH, qos << 1 | int(retain), body + self.props() + payload)
+
+    def close(self):
+        self.writer.close()
+
+    async def run(self):
+        clean = False
+        try:
+            while True:
+                ptype, flags, body = await read_packet(self.reader)
+                if self.handle(ptype, flags, Reader(body)):
+                    clean = True
+                    break
+                await self.writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if self.client_id is not None:
+                self.broker.disconnect(self, clean)
+            self.writer.close()
+
+    def handle(self, ptype, flags, r):
+        """Process one packet; returns True on DISCONNECT."""
+        if ptype == CONNECT:
+            r.text()
+            self.v5 = r.u8() == 5
+            cflags = r.u8()
+            r.u16()
+            if self.v5:
+                r.skip_props()
+            self.client_id = r.text() or f"auto-{id(self)}"
+            self.persistent = not cflags & 0x02
+            if cflags & 0x04:
+                if self.v5:
+                    r.skip_props()
+                topic, payload = r.text(), r.blob()
+                self.will = (topic, payload, (cflags >> 3) & 3, bool(cflags & 0x20), self.client_id)
+            present = self.broker.connect(self)
+            self.send(CONNACK, 0, bytes([int(present), 0]) + self.props())
+        elif ptype == PUBLISH:
+            qos = (flags >> 1) & 3
+            topic = r.text()
+            if qos:
+                pid = r.u16()
+            if self.v5:
+                r.skip_props()
+            self.broker.publish(topic, r.rest(), qos, bool(flags & 1), self.client_id)
+            if qos == 1:
+                self.send(PUBACK, 0, struct.pack("!H", pid))
+        elif ptype == SUBSCRIBE:
+            pid = r.u16()
+            if self.v5:
+                r.skip_props()
+            codes = bytearray()
+            while r.pos < len(r.data):
+                filt = r.text()
+                codes.append(min(1, self.broker.subscribe(self, filt, min(1, r.u8() & 3))))
+            self.send(SUBACK, 0, struct.pack("!H", pid) + self.props() + bytes(codes))
+        elif ptype == UNSUBSCRIBE:
+            pid = r.u16()
+            if self.v5:
+                r.skip_props()
+            count = 0
+            while r.pos < len(r.data):
+                self.broker.unsubscribe(self, r.text())
+                count += 1
+            self.send(UNSUBACK, 0, struct.pack("!H", pid) + self.props() + (b"\x00" * count if self.v5 else b""))
+        elif ptype == PINGREQ:
+            self.send(PINGRESP, 0, b"")
+        elif ptype == DISCONNECT:
+            return True
+        return False
+
+async def serve(broker, host="127.0.0.1", port=1883):
+    async def on_client(reader, writer):
+        await Connection(broker, reader, writer).run()
+    return await asyncio.start_server(on_client, host, port)
+
+class BrokerThread:
+    """Runs a Broker on its own event loop thread; port=0 picks a free port."""
+    def __init__(self, host="127.0.0.1", port=0):
+        self.broker = Broker()
+        self.host = host
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(serve(self.broker, host, port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the broker loop and wait for its result."""
+        async def run():
+            return fn(*args)
+        return asyncio.run_coroutine_threadsafe(run(), self.loop).result()
+
+    def stop(self):
+        async def shutdown():
+            self.server.close()
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(2)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(2)
+        self.loop.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+
+    async def main():
+        server = await serve(Broker(), args.host, args.port)
+        print(f"Broker listening on {args.host}:{args.port}")
+        await server.serve_forever()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,70 @@
+"""Time sources for the server: the wall clock, or a virtual one for simulated-speed runs.
+
+A clock is a callable returning the current time in seconds (what TimerWheel
+already takes), plus sleep() and monotonic(). main.use_clock() hands one to
+the timer wheel, the tables (which read the wheel's clock), the asyncio
+engine and the display sender.
+
+VirtualClock never waits: run_until(t) jumps straight to the next moment
+something attached to it is due - a timer bucket, a table tick, a display
+retransmit, a queued message - runs it, and repeats until t. A complete
+game, disconnect timeouts included, takes milliseconds.
+"""
+import time
+
+class RealClock:
+    def __call__(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class VirtualClock:
+    MAX_STEPS_AT_ONCE = 10_000   # a source that is always due is a bug, not a busy table
+
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+        self.sources = []   # (next_due() -> time or None, run(now))
+
+    def __call__(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def attach(self, next_due, run):
+        """Have run(now) called whenever next_due() says its time has come."""
+        self.sources.append((next_due, run))
+
+    def next_due(self):
+        due = [d for d in (next_due() for next_due, _ in self.sources) if d is not None]
+        return min(due) if due else None
+
+    def run_until(self, deadline):
+        """Advance to `deadline`, running every source in time order on the way."""
+        steps = 0
+        while True:
+            due = self.next_due()
+            if due is None or due > deadline:
+                break
+            if due > self.now:
+                self.now = due
+                steps = 0
+            steps += 1
+            if steps > self.MAX_STEPS_AT_ONCE:
+                raise RuntimeError(f"virtual clock stuck at {self.now}")
+            for next_due, run in self.sources:
+                d = next_due()
+                if d is not None and d <= self.now:
+                    run(self.now)
+        self.now = max(self.now, deadline)
+
+    def sleep(self, seconds):
+        self.run_until(self.now + seconds)
+
+    def settle(self):
+        """Run everything due now, without moving the clock."""
+        self.run_until(self.now)
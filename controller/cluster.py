@@ -0,0 +1,53 @@
+"""MQTT 5 scale-out: several server nodes split the tables between them.
+
+Node i of N owns the tables that shard_owner() assigns it (the same rendezvous
+hash as the supervisor's workers). Inputs are taken through shared
+subscriptions ($share/{group}/...), so the broker hands each message to a
+single node:
+
+- with a fixed table list, every node subscribes only to its own tables'
+  topics. The shared group still makes a restarted or duplicate instance of a
+  node split that traffic instead of doubling it;
+- without one, every node shares table/+/... and a message that lands on the
+  wrong node is forwarded once to its owner's inbox, node/{owner}/in/{topic}.
+
+ACKs take the same path, so display flow control stays with the owning node.
+Shared subscriptions get no retained messages; meeple status is learned from
+live traffic.
+"""
+from mqtt_bus import SUBSCRIPTIONS, TABLE_PREFIX
+from supervisor import shard_owner, shard_prefixes
+
+class Cluster:
+    def __init__(self, node, nodes, group="game", table_ids=None):
+        self.node = node
+        self.members = list(range(nodes))
+        self.group = group
+        self.table_ids = table_ids
+        self.inbox = self.inbox_of(node)
+
+    @staticmethod
+    def inbox_of(node):
+        return f"node/{node}/in/"
+
+    @property
+    def client_id(self):
+        return f"GameServer_{self.node}"
+
+    def owns(self, table_id):
+        return shard_owner(table_id, self.members) == self.node
+
+    def filters(self):
+        """Subscriptions of this node."""
+        if self.table_ids is None:
+            prefixes = ["", TABLE_PREFIX]
+        else:
+            prefixes = shard_prefixes(self.owns, self.table_ids)
+        share = f"$share/{self.group}/"
+        return [share + prefix + topic for prefix in prefixes for topic in SUBSCRIPTIONS] + [self.inbox + "#"]
+
+    def forward_to(self, topic):
+        """Inbox of the node owning topic's table, or None when it is this node."""
+        table_id = topic.split("/", 2)[1] if topic.startswith("table/") else ""
+        owner = shard_owner(table_id, self.members)
+        return None if owner == self.node else self.inbox_of(owner)
@@ -0,0 +1,8 @@
+import pytest
+import logger
+
+@pytest.fixture(autouse=True)
+def flush_log():
+    """Los registros de cada test se escriben mientras su salida sigue capturada."""
+    yield
+    logger.flush()
@@ -0,0 +1,325 @@
+import json, threading, time
+from collections import deque
+from concurrent.futures import Future
+from metrics import ACK_TIMEOUTS, ACK_WAIT, FRAMES_SENT
+import tracing
+
+ACK_TIMEOUT = 0.5       # initial RTO, before any RTT sample
+MIN_ACK_TIMEOUT = 0.05
+MAX_ACK_TIMEOUT = 2.0
+DISPLAY_WINDOW = 4      # max unacknowledged frames per device
+FRAME_INTERVAL = 1 / 25 # min spacing of coalesced frames (25 FPS)
+
+def parse_ack_seq(payload):
+    """game/ack payloads may be empty (legacy firmware), a bare number or {"seq": n}."""
+    if isinstance(payload, (bytes, bytearray)):
+        payload = payload.decode(errors="ignore")
+    if not payload:
+        return None
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        data = data.get("seq")
+    return data if isinstance(data, int) and not isinstance(data, bool) else None
+
+class Frame:
+    """A queued display update and the handles waiting on it."""
+    __slots__ = ("payload", "retain", "wait_ack", "coalesce", "futures", "traces")
+
+    def __init__(self, payload, retain, wait_ack, coalesce):
+        self.payload = payload
+        self.retain = retain
+        self.wait_ack = wait_ack
+        self.coalesce = coalesce
+        self.futures = []
+        self.traces = None   # [trace, time] entries of sampled messages, see tracing.track()
+
+    def sent(self):
+        if self.traces:
+            for entry in self.traces:
+                entry[0].frame_sent(entry)
+
+    def settle(self, result):
+        for fut in self.futures:
+            if not fut.done():
+                fut.set_result(result)
+        if self.traces:
+            for entry in self.traces:
+                entry[0].frame_settled(entry, result)
+            self.traces = None
+
+    def fail(self, exc):
+        for fut in self.futures:
+            if not fut.done():
+                fut.set_exception(exc)
+        if self.traces:
+            for entry in self.traces:
+                entry[0].frame_settled(entry, None)
+            self.traces = None
+
+class FlowState:
+    """Sequence numbers, in-flight window and RTT estimate for one display device.
+
+    The window grows by 1/cwnd per ACK and halves on timeout (AIMD). The ACK
+    timeout follows the smoothed RTT (srtt + 4*rttvar) and doubles on timeout.
+    RTT samples follow Karn's rule: none from seq-less ACKs, which may belong
+    to a frame that already timed out, nor for frames sent before the last
+    timeout.
+    """
+    def __init__(self, max_window=DISPLAY_WINDOW):
+        self.max_window = max_window
+        self.cwnd = 1.0
+        self.next_seq = 0
+        self.inflight = {}   # seq -> (sent_at, Frame)
+        self.queue = deque()
+        self.srtt = None
+        self.rttvar = 0.0
+        self.rto = ACK_TIMEOUT
+        self.last_frame = None
+        self.acked = 0
+        self.timeouts = 0
+        self.timed_out_at = None   # when expire() last timed a frame out
+        self.next_frame_at = 0.0
+        self.submitted = 0
+        self.coalesced = 0
+        self.sent = 0
+
+    def window(self):
+        return max(1, min(self.max_window, int(self.cwnd)))
+
+    def can_send(self, now):
+        """Whether the head of the queue may go out now."""
+        head = self.queue[0]
+        if head.coalesce and now < self.next_frame_at:
+            return False
+        return not head.wait_ack or len(self.inflight) < self.window()
+
+    def enqueue(self, frame):
+        """Queue a frame, merging it into a still-queued coalescible tail frame.
+
+        Merging is latest-wins per field, so partial updates are never lost.
+        """
+        self.submitted += 1
+        tail = self.queue[-1] if self.queue else None
+        if frame.coalesce and tail is not None and tail.coalesce and tail.wait_ack == frame.wait_ack \
+                and isinstance(tail.payload, dict) and isinstance(frame.payload, dict):
+            tail.payload = {**tail.payload, **frame.payload}
+            tail.retain = frame.retain
+            tail.futures.extend(frame.futures)
+            if frame.traces:
+                tail.traces = (tail.traces or []) + frame.traces
+            self.coalesced += 1
+            return
+        self.queue.append(frame)
+
+    def take_seq(self):
+        seq = self.next_seq
+        self.next_seq += 1
+        return seq
+
+    def on_ack(self, seq, now):
+        """Cumulative ACK: settles every in-flight frame up to seq (oldest one if seq is None)."""
+        if not self.inflight:
+            return 0
+        sample = seq is not None
+        if seq is None:
+            seq = min(self.inflight)
+        done = sorted(s for s in self.inflight if s <= seq)
+        for s in done:
+            sent_at, frame = self.inflight.pop(s)
+            ACK_WAIT.observe(now - sent_at)
+            if s == seq and sample and (self.timed_out_at is None or sent_at > self.timed_out_at):
+                self._sample(now - sent_at)
+            self.cwnd = min(self.max_window, self.cwnd + 1.0 / self.cwnd)
+            self.acked += 1
+            frame.settle(True)
+        return len(done)
+
+    def expire(self, now):
+        """Time out in-flight frames older than the current RTO."""
+        late = [s for s, (sent_at, _) in self.inflight.items() if now - sent_at >= self.rto]
+        for s in sorted(late):
+            _, frame = self.inflight.pop(s)
+            self.timeouts += 1
+            frame.settle(False)
+        if late:
+            self.timed_out_at = now
+            ACK_TIMEOUTS.inc(amount=len(late))
+            self.cwnd = max(1.0, self.cwnd / 2)
+            self.rto = min(MAX_ACK_TIMEOUT, self.rto * 2)
+        return len(late)
+
+    def next_deadline(self):
+        deadlines = []
+        if self.inflight:
+            deadlines.append(min(sent_at for sent_at, _ in self.inflight.values()) + self.rto)
+        if self.queue and self.queue[0].coalesce:
+            deadlines.append(self.next_frame_at)
+        return min(deadlines) if deadlines else None
+
+    def _sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(MAX_ACK_TIMEOUT, max(MIN_ACK_TIMEOUT, self.srtt + 4 * self.rttvar))
+
+class DisplaySender:
+    """Sends game/display frames from its own thread so callers never wait for ACKs.
+
+    Each display topic is a device with its own FlowState. Dict frames are stamped
+    with a "seq" field; game/ack may echo it back to settle frames out of a window
+    of up to DISPLAY_WINDOW. submit() returns a Future that resolves to True
+    (acked), False (timed out) or None (no ACK requested).
+
+    Frames submitted with coalesce=True are rate-limited to one per frame_interval;
+    updates arriving in between are merged into the queued frame, so the last state
+    is always delivered but superseded ones are never sent.
+    """
+    def __init__(self, publish, max_window=DISPLAY_WINDOW, frame_interval=FRAME_INTERVAL, clock=time.monotonic):
+        self._publish = publish
+        self.max_window = max_window
+        self.frame_interval = frame_interval
+        self.clock = clock
+        self.flows = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def flow(self, topic):
+        flow = self.flows.get(topic)
+        if flow is None:
+            flow = self.flows[topic] = FlowState(self.max_window)
+        return flow
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="DisplaySender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        if not self._thread:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, topic, payload, retain=False, wait_ack=True, cache=True, coalesce=False, trace=None):
+        frame = Frame(payload, retain, wait_ack, coalesce)
+        if trace:
+            frame.traces = [tracing.track(trace)]
+        fut = Future()
+        frame.futures.append(fut)
+        with self._cond:
+            flow = self.flow(topic)
+            if cache and wait_ack:
+                flow.last_frame = payload if isinstance(payload, str) else json.dumps(payload)
+            flow.enqueue(frame)
+            self._cond.notify_all()
+        return fut
+
+    def stats(self):
+        """Frame counters summed over all devices."""
+        with self._cond:
+            flows = list(self.flows.values())
+            return {
+                "submitted": sum(f.submitted for f in flows),
+                "coalesced": sum(f.coalesced for f in flows),
+                "sent": sum(f.sent for f in flows),
+                "acked": sum(f.acked for f in flows),
+                "timeouts": sum(f.timeouts for f in flows),
+            }
+
+    def on_ack(self, topic, payload=None):
+        with self._cond:
+            flow = self.flows.get(topic)
+            if flow and flow.on_ack(parse_ack_seq(payload), self.clock()):
+                self._cond.notify_all()
+
+    def flush(self, timeout=1.0):
+        """Block until every frame submitted so far has been sent and settled."""
+        deadline = self.clock() + timeout
+        with self._cond:
+            while any(f.queue or f.inflight for f in self.flows.values()):
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _take(self, now):
+        """Pop every frame that may go out at `now`, stamping seq numbers. Call with _cond held."""
+        out = []
+        for topic, flow in self.flows.items():
+            if flow.expire(now):
+                self._cond.notify_all()
+            while flow.queue and flow.can_send(now):
+                frame = flow.queue.popleft()
+                seq = flow.take_seq()
+                payload = frame.payload
+                if isinstance(payload, dict):
+                    payload = json.dumps(dict(payload, seq=seq))
+                elif not isinstance(payload, str):
+                    payload = json.dumps(payload)
+                if frame.wait_ack:
+                    flow.inflight[seq] = (now, frame)
+                if frame.coalesce:
+                    flow.next_frame_at = now + self.frame_interval
+                flow.sent += 1
+                FRAMES_SENT.inc()
+                out.append((flow, seq, topic, payload, frame))
+        return out
+
+    def _send(self, out):
+        failed = []
+        for flow, seq, topic, payload, frame in out:
+            try:
+                self._publish(topic, payload, frame.retain)
+                frame.sent()
+                if not frame.wait_ack:
+                    frame.settle(None)
+            except Exception as e:
+                failed.append((flow, seq, frame, e))
+        with self._cond:
+            for flow, seq, frame, e in failed:
+                flow.inflight.pop(seq, None)
+                frame.fail(e)
+            self._cond.notify_all()
+
+    def next_deadline(self):
+        """When poll() next has work (now if a frame can go out), or None."""
+        with self._cond:
+            now = self.clock()
+            if any(f.queue and f.can_send(now) for f in self.flows.values()):
+                return now
+            deadlines = [d for d in (f.next_deadline() for f in self.flows.values()) if d is not None]
+            return min(deadlines) if deadlines else None
+
+    def poll(self):
+        """Send what may go out now and expire late frames, on the caller's thread.
+        For runs on a virtual clock, where no sender thread is started."""
+        with self._cond:
+            out = self._take(self.clock())
+        if out:
+            self._send(out)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = self.clock()
+                out = self._take(now)
+                if not out:
+                    deadlines = [d for d in (f.next_deadline() for f in self.flows.values()) if d is not None]
+                    self._cond.wait(max(0.0, min(deadlines) - now) if deadlines else None)
+                    continue
+            self._send(out)
@@ -0,0 +1,92 @@
+import asyncio, heapq, itertools, time
+
+EPSILON = 0.001   # tick() compares with '>', so fire just past the deadline
+
+class AsyncEngine:
+    """Deadline-driven replacement for the 100ms polling loop.
+
+    All table work runs on one asyncio loop: MQTT messages are handed over from
+    paho's thread with call(), and each table is ticked only when its own
+    next_deadline() is due. Table timeouts live on `timers` (a TimerWheel),
+    which is advanced when its next bucket is due. Idle tables cost nothing.
+    """
+    def __init__(self, tables, timers=None, loop=None, clock=None):
+        self.tables = tables
+        self.timers = timers
+        self.clock = clock or (timers.clock if timers else time.time)
+        self.loop = loop or asyncio.get_running_loop()
+        self._heap = []
+        self._due = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.ticks = 0
+        self.on_change = None   # called with each table a timer or tick changed
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the engine loop; safe from any thread."""
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def reschedule(self, table):
+        """Re-read table's deadline after its state changed. Must run on the loop."""
+        if self.timers:
+            self._wakeup.set()   # the change may have armed a timer
+        deadline = table.next_deadline()
+        if deadline is None:
+            self._due.pop(table, None)
+            return
+        deadline += EPSILON
+        if self._due.get(table) == deadline:
+            return
+        self._due[table] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), table))
+        if self._heap[0][2] is table:
+            self._wakeup.set()
+
+    def wake(self):
+        """Re-read the timer wheel after a timer was scheduled outside any table."""
+        self._wakeup.set()
+
+    def forget(self, table):
+        """Stop ticking a table that left this engine; its heap entries go stale."""
+        self._due.pop(table, None)
+
+    def run_due(self, now):
+        """Fire due timers and tick every table whose deadline has passed; return
+        the next time anything is due."""
+        if self.timers:
+            for timer in self.timers.advance(now):
+                if timer.owner is not None:
+                    self.reschedule(timer.owner)
+                    if self.on_change:
+                        self.on_change(timer.owner)
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, _, table = heapq.heappop(heap)
+            if self._due.get(table) != deadline:
+                continue   # superseded by a later reschedule
+            del self._due[table]
+            try:
+                if table.tick(now) and self.on_change:
+                    self.on_change(table)
+                self.ticks += 1
+            except Exception as e:
+                table.log("SERVER", f"Tick error: {e}", level="ERROR")
+            self.reschedule(table)
+        due = [heap[0][0]] if heap else []
+        if self.timers:
+            expiry = self.timers.next_expiry()
+            if expiry is not None:
+                due.append(expiry + EPSILON)
+        return min(due) if due else None
+
+    async def run(self):
+        for table in list(self.tables.values()):
+            self.reschedule(table)
+        while True:
+            self._wakeup.clear()
+            next_at = self.run_due(self.clock())
+            timeout = None if next_at is None else max(0.0, next_at - self.clock())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
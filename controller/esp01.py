@@ -0,0 +1,92 @@
+from logger import log
+
+class ESP01Manager:
+    """Player slots for a table's ESP-01 meeples.
+
+    assignments maps each MAC to its slot; taken slots are also bits of
+    `taken`, so the lowest free one is a bit trick rather than a scan, and
+    `online` counts the assigned MACs whose last status is ONLINE, kept up
+    to date by every register and status change. Assignments travel in
+    to_dict(), so Table.snapshot() - and with it the journal and the standby -
+    carry them across restarts: restored meeples keep their slot without
+    registering again.
+    """
+    def __init__(self, bus, max_players=3):
+        self.bus = bus
+        self.max_players = max_players
+        self.assignments = {}
+        self.taken = 0      # bit pid set when slot pid is assigned
+        self.online = 0
+        self.connection_status = {}
+
+    @property
+    def assigned_ids(self):
+        return {pid for pid in range(self.taken.bit_length()) if self.taken >> pid & 1}
+
+    def handle_register(self, payload):
+        mac = payload.get("mac")
+        if not mac:
+            return
+
+        if mac in self.assignments:
+            self._send_config(mac, self.assignments[mac])
+            return
+
+        pid = (~self.taken & (self.taken + 1)).bit_length() - 1   # lowest free slot
+        if pid < self.max_players:
+            self.assignments[mac] = pid
+            self.taken |= 1 << pid
+            self.connection_status[mac] = "ONLINE"
+            self.online += 1   # not counted while unassigned, even if already ONLINE
+            log("ESP01", "Assigned P%d to MAC %s", pid + 1, mac)
+            self._send_config(mac, pid)
+            return
+
+        log("ESP01", "No slots available for MAC %s", mac, level="WARN")
+
+    def _send_config(self, mac, pid):
+        config = {
+            "player_id": pid + 1,
+            "sensor_topic": f"{self.bus.prefix}esp01/player/{pid+1}/sensor",
+            "led_topic": f"{self.bus.prefix}esp01/player/{pid+1}/led"
+        }
+        self.bus.pub(f"esp01/{mac}/config", config)
+
+    def reset(self):
+        self.assignments.clear()
+        self.taken = 0
+        self.online = 0
+        self.connection_status.clear()
+        self.max_players = 3
+        log("ESP01", "Assignments Reset")
+
+    def to_dict(self):
+        return {
+            "max_players": self.max_players,
+            "assignments": dict(self.assignments),
+            "connection_status": dict(self.connection_status),
+        }
+
+    def restore(self, data):
+        self.max_players = data["max_players"]
+        self.assignments = dict(data["assignments"])
+        self.connection_status = dict(data["connection_status"])
+        self.taken = 0
+        for pid in self.assignments.values():
+            self.taken |= 1 << pid
+        self.online = sum(1 for mac in self.assignments if self.connection_status.get(mac) == "ONLINE")
+
+    def handle_status(self, mac, status):
+        """Handle ESP-01 ONLINE/OFFLINE status from LWT."""
+        old = self.connection_status.get(mac)
+        self.connection_status[mac] = status
+        if mac in self.assignments:
+            self.online += (status == "ONLINE") - (old == "ONLINE")
+            pid = self.assignments[mac]
+            log("ESP01", "P%d (%s) is now %s", pid + 1, mac, status)
+            return pid, status
+        return None, status
+
+    def connected_count(self):
+        """How many assigned players are currently ONLINE."""
+        return self.online
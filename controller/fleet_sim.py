@@ -0,0 +1,347 @@
+"""Load generator: thousands of simulated ESP-01 meeples and ESP32 bases on one event loop.
+
+Every table gets a base and `--meeples` meeples on table/{id}/. A meeple
+connects with its last will (esp01/{mac}/status = OFFLINE, retained),
+announces ONLINE, sends esp01/register and, once configured, streams
+DETECTED/CLEAN on the sensor topic it was given; with --churn it sometimes
+loses power (the will fires) and comes back. A base ACKs every game/display
+frame after --ack-latency seconds, dropping --ack-loss of them, and presses
+one of the buttons the last frame offered; the meeples' registration opens
+the table. With --announce a base first sends game/connection CONNECTED, as
+the ESP32 does, so tables the server opened before the base subscribed
+(main.py --tables) show it their display again.
+
+Reported: registration throughput (register -> config) and p50/p99/p999
+latency of register -> config and of button press -> next display frame.
+
+--broker host:port talks MQTT over TCP to a running broker and server (one
+connection per device); --memory runs main.py's tables in this process over
+memory_broker, with no network.
+
+Run: python fleet_sim.py --memory --tables 300 --duration 10
+     python fleet_sim.py --broker localhost:1883 --tables 1000 --ack-loss 0.05
+"""
+import argparse, asyncio, atexit, contextlib, json, os, random, struct
+from broker import CONNECT, PUBLISH, PUBACK, SUBSCRIBE, DISCONNECT, Reader, encode_str, packet, read_packet
+from memory_broker import MemoryBroker, MemoryClient
+
+PRESS_TIMEOUT = 2.0   # a press with no display frame by then is counted unanswered
+
+def percentile(samples, p):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+class AioLink:
+    """Minimal MQTT 3.1.1 client over asyncio streams: QoS 0 out, QoS 0/1 in."""
+    def __init__(self, host, port, client_id):
+        self.host, self.port = host, port
+        self.client_id = client_id
+        self.on_message = None   # fn(topic, payload)
+        self.writer = None
+        self._reader_task = None
+        self._pids = 0
+
+    def _send(self, ptype, flags, body):
+        self.writer.write(packet(ptype, flags, body))
+
+    async def start(self, will=None):
+        reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        flags = 0x02
+        payload = encode_str(self.client_id)
+        if will:
+            topic, message, retain = will
+            flags |= 0x04 | (0x20 if retain else 0)
+            payload += encode_str(topic) + encode_str(message)
+        self._send(CONNECT, 0, encode_str("MQTT") + bytes([4, flags]) + struct.pack("!H", 0) + payload)
+        await read_packet(reader)   # CONNACK
+        self._reader_task = asyncio.ensure_future(self._read(reader))
+
+    async def _read(self, reader):
+        try:
+            while True:
+                ptype, flags, body = await read_packet(reader)
+                if ptype != PUBLISH:
+                    continue
+                r = Reader(body)
+                topic = r.text()
+                if (flags >> 1) & 3:
+                    self._send(PUBACK, 0, struct.pack("!H", r.u16()))
+                if self.on_message:
+                    self.on_message(topic, r.rest())
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def subscribe(self, filt):
+        self._pids = self._pids % 65535 + 1
+        self._send(SUBSCRIBE, 2, struct.pack("!H", self._pids) + encode_str(filt) + b"\x00")
+
+    def publish(self, topic, payload, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self._send(PUBLISH, int(retain), encode_str(topic) + payload)
+
+    def drop(self):
+        """Cut the connection without DISCONNECT, so the broker fires the will."""
+        self.writer.transport.abort()
+        self._reader_task.cancel()
+
+    async def close(self):
+        with contextlib.suppress(ConnectionError):
+            self._send(DISCONNECT, 0, b"")
+            await self.writer.drain()
+        self.writer.close()
+        self._reader_task.cancel()
+
+class _LoopClient(MemoryClient):
+    """MemoryClient whose callbacks run on an asyncio loop instead of a thread."""
+    def __init__(self, broker, client_id, loop):
+        super().__init__(broker, client_id)
+        self.loop = loop
+
+    def _put(self, event):
+        self.loop.call_soon_threadsafe(self._handle, event)
+
+class MemoryLink:
+    """AioLink's interface over memory_broker."""
+    def __init__(self, broker, client_id):
+        self.client = _LoopClient(broker, client_id, asyncio.get_running_loop())
+        self.client.on_message = lambda c, u, m: self.on_message and self.on_message(m.topic, m.payload)
+        self.on_message = None
+
+    async def start(self, will=None):
+        if will:
+            self.client.will_set(*will[:2], retain=will[2])
+        self.client.connect()
+
+    def subscribe(self, filt):
+        self.client.subscribe(filt)
+
+    def publish(self, topic, payload, retain=False):
+        self.client.publish(topic, payload, retain=retain)
+
+    def drop(self):
+        self.client.drop()
+
+    async def close(self):
+        self.client.disconnect()
+
+class Stats:
+    def __init__(self):
+        self.registered = []       # register -> config latencies
+        self.first_register = None
+        self.last_config = None
+        self.display = []          # button -> display latencies
+        self.unanswered = 0
+        self.acks = self.acks_dropped = 0
+        self.drops = 0
+        self.sent = self.received = 0
+
+class Meeple:
+    def __init__(self, fleet, table_id, index):
+        self.fleet = fleet
+        self.prefix = f"table/{table_id}/"
+        self.mac = f"SIM_{table_id}_{index}"
+        self.configured = None
+        self.register_at = None
+        self.sensor_topic = None
+
+    def on_message(self, topic, payload):
+        self.fleet.stats.received += 1
+        if topic.endswith("/config") and self.register_at is not None:
+            now = self.fleet.loop.time()
+            stats = self.fleet.stats
+            stats.registered.append(now - self.register_at)
+            stats.last_config = now
+            self.register_at = None
+            self.sensor_topic = json.loads(payload)["sensor_topic"]
+            if not self.configured.done():
+                self.configured.set_result(True)
+
+    def publish(self, link, topic, payload, retain=False):
+        self.fleet.stats.sent += 1
+        link.publish(topic, payload, retain)
+
+    async def run(self):
+        fleet, rng = self.fleet, self.fleet.rng
+        status = self.prefix + f"esp01/{self.mac}/status"
+        while fleet.running:
+            link = fleet.link(self.mac)
+            link.on_message = self.on_message
+            self.configured = fleet.loop.create_future()
+            await link.start(will=(status, "OFFLINE", True))
+            link.subscribe(self.prefix + f"esp01/{self.mac}/config")
+            self.publish(link, status, "ONLINE", retain=True)
+            self.register_at = fleet.loop.time()
+            if fleet.stats.first_register is None:
+                fleet.stats.first_register = self.register_at
+            self.publish(link, self.prefix + "esp01/register", json.dumps({"mac": self.mac}))
+            try:
+                await asyncio.wait_for(self.configured, fleet.args.duration)
+            except asyncio.TimeoutError:
+                return   # no free slot on this table
+            state = "DETECTED"
+            while fleet.running:
+                await asyncio.sleep(fleet.args.sensor_interval * rng.uniform(0.5, 1.5))
+                if fleet.args.churn and rng.random() < fleet.args.churn * fleet.args.sensor_interval:
+                    fleet.stats.drops += 1
+                    link.drop()
+                    await asyncio.sleep(1.0)
+                    break
+                state = "CLEAN" if state == "DETECTED" else "DETECTED"
+                self.publish(link, self.sensor_topic, state)
+            else:
+                await link.close()
+
+class Base:
+    def __init__(self, fleet, table_id):
+        self.fleet = fleet
+        self.prefix = f"table/{table_id}/"
+        self.link = None
+        self.buttons = []
+        self.pressed_at = None
+
+    def on_message(self, topic, payload):
+        fleet, stats = self.fleet, self.fleet.stats
+        stats.received += 1
+        now = fleet.loop.time()
+        frame = json.loads(payload)
+        if self.pressed_at is not None:
+            stats.display.append(now - self.pressed_at)
+            self.pressed_at = None
+        self.buttons = frame.get("buttons") or []   # no buttons offered: wait for the next frame
+        seq = frame.get("seq")
+        if seq is None:
+            return
+        if fleet.rng.random() < fleet.args.ack_loss:
+            stats.acks_dropped += 1
+            return
+        stats.acks += 1
+        fleet.loop.call_later(fleet.args.ack_latency, self.publish, "game/ack", json.dumps({"seq": seq}))
+
+    def publish(self, topic, payload):
+        if self.fleet.running:
+            self.fleet.stats.sent += 1
+            self.link.publish(self.prefix + topic, payload)
+
+    async def run(self):
+        fleet, rng = self.fleet, self.fleet.rng
+        self.link = fleet.link(f"SIM_BASE_{self.prefix}")
+        self.link.on_message = self.on_message
+        await self.link.start()
+        self.link.subscribe(self.prefix + "game/display")
+        if fleet.args.announce:
+            # its REFRESH_PENDING pause swallows presses for a couple of seconds
+            self.publish("game/connection", "CONNECTED")
+        while fleet.running:
+            await asyncio.sleep(fleet.args.press_interval * rng.uniform(0.5, 1.5))
+            now = fleet.loop.time()
+            if self.pressed_at is not None and now - self.pressed_at > PRESS_TIMEOUT:
+                fleet.stats.unanswered += 1
+                self.pressed_at = None
+            if self.pressed_at is None and self.buttons:
+                self.pressed_at = now
+                self.publish("base/button", json.dumps({"button": rng.choice(self.buttons)}))
+        await self.link.close()
+
+class Fleet:
+    def __init__(self, args, link):
+        self.args = args
+        self.link = link          # fn(client_id) -> AioLink or MemoryLink
+        self.loop = asyncio.get_running_loop()
+        self.rng = random.Random(args.seed)
+        self.stats = Stats()
+        self.running = True
+
+    async def run(self):
+        devices = []
+        for t in range(1, self.args.tables + 1):
+            devices.append(Base(self, str(t)))
+            devices += [Meeple(self, str(t), i) for i in range(self.args.meeples)]
+        tasks = []
+        for i, device in enumerate(devices):
+            tasks.append(asyncio.ensure_future(device.run()))
+            if self.args.ramp and i % 100 == 99:
+                await asyncio.sleep(self.args.ramp * 100 / len(devices))
+        await asyncio.sleep(self.args.duration)
+        self.running = False
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return devices
+
+    def report(self, devices):
+        stats, args = self.stats, self.args
+        meeples = args.tables * args.meeples
+        span = (stats.last_config or 0) - (stats.first_register or 0)
+        ms = lambda samples, p: percentile(samples, p) * 1e3
+        lines = [
+            f"{meeples} meeples, {args.tables} bases, {args.duration:.0f}s, "
+            f"{stats.sent} messages sent, {stats.received} received",
+            f"registration: {len(stats.registered)} configs in {span:.2f}s "
+            f"({len(stats.registered) / span if span > 0 else float('nan'):.0f}/s), "
+            f"p50 {ms(stats.registered, 50):.1f} ms, p99 {ms(stats.registered, 99):.1f} ms, "
+            f"p999 {ms(stats.registered, 99.9):.1f} ms",
+            f"button -> display: {len(stats.display)} samples, p50 {ms(stats.display, 50):.1f} ms, "
+            f"p99 {ms(stats.display, 99):.1f} ms, p999 {ms(stats.display, 99.9):.1f} ms, "
+            f"{stats.unanswered} unanswered",
+            f"acks: {stats.acks} sent, {stats.acks_dropped} dropped; meeple power losses: {stats.drops}",
+        ]
+        return "\n".join(lines)
+
+async def run_memory(args):
+    """Serve the fleet from main.py's tables in this process."""
+    import main
+    broker = MemoryBroker()
+    main.use_client(MemoryClient(broker, "GameServer_memory"))
+    atexit.unregister(main.cleanup)
+    server = asyncio.ensure_future(main.main_async())
+    while not main.tables:   # main_async() opens the legacy table once subscribed
+        await asyncio.sleep(0.05)
+    fleet = Fleet(args, lambda client_id: MemoryLink(broker, client_id))
+    try:
+        devices = await fleet.run()
+    finally:
+        server.cancel()
+        main.bus.stop()
+        for table_id in list(main.tables):
+            main.drop_table(table_id)
+        main.engine = None
+    return fleet, devices
+
+async def run_tcp(args):
+    host, _, port = args.broker.partition(":")
+    fleet = Fleet(args, lambda client_id: AioLink(host, int(port or 1883), client_id))
+    return fleet, await fleet.run()
+
+async def simulate(args):
+    """Run the fleet; returns (Fleet, devices)."""
+    return await (run_memory(args) if args.memory else run_tcp(args))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--broker", help="host:port of a broker with main.py connected")
+    where.add_argument("--memory", action="store_true", help="run main.py in-process over memory_broker")
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--meeples", type=int, default=3, help="meeples per table")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds to bring all devices up")
+    parser.add_argument("--press-interval", type=float, default=0.5)
+    parser.add_argument("--sensor-interval", type=float, default=1.0)
+    parser.add_argument("--ack-latency", type=float, default=0.01)
+    parser.add_argument("--ack-loss", type=float, default=0.0)
+    parser.add_argument("--churn", type=float, default=0.0, help="meeple power losses per second")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--announce", action="store_true", help="bases send game/connection CONNECTED first")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's log (--memory)")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        fleet, devices = asyncio.run(simulate(args))
+    print(fleet.report(devices))
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,40 @@
 import random
-from board import BOARD_SIZE, get_tile_effect
+from board import CLASSIC, TILE_TYPES, get_board
 
 class Player:
+    __slots__ = ("id", "hp", "pos", "finished", "skip", "mini_score", "mini_done", "sensor_state",
+                 "lifted_piece", "move_verified")
+
     def __init__(self, pid):
         self.id = pid
         self.hp = 10
         self.pos = 0
         self.finished = False
+        self.skip = 0           # turns left to sit out (skip tiles)
         self.mini_score = 0     
         self.mini_done = False  
         self.sensor_state = "UNKNOWN"
+        self.lifted_piece = False    # WAIT_FOR_MOVE: the piece has left its sensor
+        self.move_verified = False   # the piece was put back after the last roll
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        p = cls(data["id"])
+        for name in cls.__slots__:
+            if name in data:
+                setattr(p, name, data[name])
+        return p
 
 class Game:
-    def __init__(self, n_players=3):
+    __slots__ = ("board", "players", "turn_order", "current_idx", "state", "winner",
+                 "current_minigame", "minigame_target")
+    FIELDS = __slots__[2:]   # plain data carried by to_dict()
+
+    def __init__(self, n_players=3, board=None):
+        self.board = board or CLASSIC
         self.players = [Player(i) for i in range(n_players)]
         self.turn_order = []
         self.current_idx = 0
@@ -21,6 +43,23 @@ class Game:
         self.current_minigame = None
         self.minigame_target = 0
         
+    def to_dict(self):
+        """Plain-data copy of the game (for replication and journaling)."""
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        data["turn_order"] = list(self.turn_order)
+        data["board"] = self.board.name
+        data["players"] = [p.to_dict() for p in self.players]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        game = cls(n_players=len(data["players"]), board=get_board(data.get("board")))
+        for name in cls.FIELDS:
+            if name in data:
+                setattr(game, name, data[name])
+        game.players = [Player.from_dict(p) for p in data["players"]]
+        return game
+
     def update_sensor(self, pid, state):
         if 0 <= pid < len(self.players):
             self.players[pid].sensor_state = state
@@ -35,19 +74,32 @@ class Game:
 
     def move_player(self, steps):
         p = self.get_current_player()
-        p.pos = min(p.pos + steps, BOARD_SIZE)
-        if p.pos == BOARD_SIZE:
-            self.winner = p.id
-            self.state = "GAME_OVER"
-            return f"WINNER: P{p.id+1}!"
-        t_type, hp_mod = get_tile_effect(p.pos)
-        p.hp += hp_mod
-        msg = f"P{p.id+1} to {p.pos} ({t_type})"
+        board = self.board
+        if p.skip:
+            p.skip -= 1
+            return f"P{p.id+1} skips turn"
+        p.pos = min(p.pos + steps, board.size)
+        if p.pos == board.size:
+            return self._win(p)
+        tile = p.pos
+        p.hp += board.hp[tile]
+        msg = f"P{p.id+1} to {tile} ({TILE_TYPES[board.kind[tile]]})"
         if p.hp <= 0:
             p.pos = max(0, p.pos - 1)
             p.hp = 10
-            msg = f"P{p.id+1} DIED! Rspwn"
+            return f"P{p.id+1} DIED! Rspwn"
+        p.skip = board.skip[tile]
+        if board.jump[tile] != tile:
+            p.pos = board.jump[tile]
+            if p.pos == board.size:
+                return self._win(p)
+            msg = f"P{p.id+1} {tile}>{p.pos} ({TILE_TYPES[board.kind[tile]]})"
         return msg
+
+    def _win(self, p):
+        self.winner = p.id
+        self.state = "GAME_OVER"
+        return f"WINNER: P{p.id+1}!"
         
     def next_turn(self):
         self.current_idx += 1
@@ -0,0 +1,266 @@
+"""Append-only journal of table state, for crash recovery.
+
+Each change to a table (after an input, a timer or a tick) is recorded as an
+event holding only the snapshot leaves that changed, labelled with the domain
+facts in it: initiative roll, turn order, move, minigame, score, penalty,
+meeple assignment or status, FSM state. Every `snapshot_every` events a table
+gets a full snapshot instead, so recovery replays a bounded tail.
+
+record() only queues the table's snapshot. A writer thread diffs and labels
+everything queued, appends it and fsyncs once per batch every
+`commit_interval` (group commit), so no input waits on the disk or the
+diff. Past `compact_after` records the file is rewritten as one snapshot per
+table and atomically replaced. load() returns every table's latest snapshot
+for Table.restore(); a torn last line from a crash is cut off.
+"""
+import json, os, threading, time
+
+COMMIT_INTERVAL = 0.05
+SNAPSHOT_EVERY = 256
+COMPACT_AFTER = 100_000
+
+_MISSING = object()
+
+def flatten(snap):
+    """Table.snapshot() as {dotted path: leaf}, so events can carry only what changed."""
+    flat = {}
+    for key, value in snap.items():
+        flat.update(_flat(key, value))
+    return flat
+
+def _flat(key, value):
+    if key == "game" and value is not None:
+        out = {}
+        for gkey, gvalue in value.items():
+            if gkey == "players":
+                for i, player in enumerate(gvalue):
+                    out.update(_flat_player(i, player))
+            else:
+                out["game." + gkey] = gvalue
+        return out
+    if key == "esp01":
+        out = {}
+        for ekey, evalue in value.items():
+            if isinstance(evalue, dict):
+                for mac, v in evalue.items():
+                    out[f"esp01.{ekey}.{mac}"] = v
+            else:
+                out["esp01." + ekey] = evalue
+        return out
+    return {key: value}
+
+def _flat_player(i, player):
+    prefix = f"game.players.{i}."
+    return {prefix + k: v for k, v in player.items()}
+
+def _diff_flat(old, new, changes, removed):
+    for key, value in new.items():
+        if old.get(key, _MISSING) != value:
+            changes[key] = value
+    removed.extend(k for k in old if k not in new)
+
+def diff(old, new):
+    """Changed paths between two snapshots: ({path: new leaf}, [removed paths]).
+    Unchanged sections and players are skipped with one dict comparison."""
+    changes, removed = {}, []
+    for key, value in new.items():
+        before = old.get(key, _MISSING)
+        if before == value:
+            continue
+        if key == "game" and value and before and len(before["players"]) == len(value["players"]):
+            for gkey, gvalue in value.items():
+                if gkey == "players":
+                    for i, (p0, p1) in enumerate(zip(before["players"], gvalue)):
+                        if p0 != p1:
+                            _diff_flat(_flat_player(i, p0), _flat_player(i, p1), changes, removed)
+                elif before.get(gkey, _MISSING) != gvalue:
+                    changes["game." + gkey] = gvalue
+        else:
+            _diff_flat({} if before is _MISSING else _flat(key, before), _flat(key, value), changes, removed)
+    return changes, removed
+
+def unflatten(flat):
+    snap, game, players = {}, {}, {}
+    esp01 = {"assignments": {}, "connection_status": {}}
+    for key, value in flat.items():
+        head, _, rest = key.partition(".")
+        if head == "game" and rest:
+            if rest.startswith("players."):
+                i, _, pkey = rest[len("players."):].partition(".")
+                players.setdefault(int(i), {})[pkey] = value
+            else:
+                game[rest] = value
+        elif head == "esp01" and rest:
+            sub, _, mac = rest.partition(".")
+            if mac:
+                esp01[sub][mac] = value
+            else:
+                esp01[sub] = value
+        else:
+            snap[key] = value
+    if "game" not in snap:
+        game["players"] = [players[i] for i in sorted(players)]
+        snap["game"] = game
+    snap["esp01"] = esp01
+    return snap
+
+def event_kinds(keys):
+    """Domain labels for a set of changed paths."""
+    kinds = set()
+    if "game" in keys:
+        # a game started or ended: its fields all changed at once
+        keys = [k for k in keys if not k.startswith("game.")]
+    for key in keys:
+        if key == "init_rolls":
+            kinds.add("roll")
+        elif key == "game.turn_order":
+            kinds.add("order")
+        elif key in ("game", "n_players"):
+            kinds.add("game")
+        elif key in ("game.current_minigame", "game.minigame_target"):
+            kinds.add("minigame")
+        elif key.startswith("esp01.assignments") or key == "esp01.max_players":
+            kinds.add("assign")
+        elif key.startswith("esp01.connection_status"):
+            kinds.add("status")
+        elif key.startswith("game.players."):
+            field = key.rsplit(".", 1)[1]
+            if field in ("pos", "hp"):
+                kinds.add("move")
+            elif field in ("mini_score", "mini_done"):
+                kinds.add("score")
+        elif key == "timer_state":
+            kinds.add("state")
+    if {"move", "score"} <= kinds:
+        # apply_minigame_penalties(): hp/pos change while the scores reset
+        kinds -= {"move", "score"}
+        kinds.add("penalty")
+    return sorted(kinds)
+
+class Journal:
+    def __init__(self, path, snapshot_every=SNAPSHOT_EVERY, compact_after=COMPACT_AFTER,
+                 commit_interval=COMMIT_INTERVAL, fsync=True):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.compact_after = compact_after
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+        self.state = {}      # table_id -> snapshot as last recorded (writer thread)
+        self.since_snapshot = {}
+        self.pending = []    # (table_id, time, snapshot) not written yet
+        self.records = 0     # records in the file
+        self.commits = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def load(self):
+        """Replay the file; returns {table_id: snapshot} and primes the diff state."""
+        if not os.path.exists(self.path):
+            return {}
+        good = records = 0
+        flats = {}
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("torn record")
+                    rec = json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                records += 1
+                if "snap" in rec:
+                    flats[rec["t"]] = flatten(rec["snap"])
+                else:
+                    flat = flats.setdefault(rec["t"], {})
+                    flat.update(rec["set"])
+                    for key in rec.get("del", ()):
+                        flat.pop(key, None)
+        if good < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+        self.state = {table_id: unflatten(flat) for table_id, flat in flats.items()}
+        self.since_snapshot = dict.fromkeys(self.state, 0)
+        with self._cond:
+            self.records += records
+        return dict(self.state)
+
+    def record(self, table, snap=None):
+        """Queue table's state for the writer; pass `snap` if table.snapshot() was
+        already taken for this change (main.route() shares it with the replica)."""
+        if snap is None:
+            snap = table.snapshot()
+        with self._cond:
+            self.pending.append((table.table_id, time.time(), snap))
+
+    def _entry(self, table_id, ts, snap):
+        """The record for a queued snapshot: the leaves that changed since the
+        table's previous one, or a full snapshot; None if nothing changed."""
+        old = self.state.get(table_id)
+        if old is None or self.since_snapshot[table_id] >= self.snapshot_every:
+            rec = {"t": table_id, "ts": ts, "snap": snap}
+            self.since_snapshot[table_id] = 0
+        else:
+            changes, removed = diff(old, snap)
+            if not changes and not removed:
+                return None
+            rec = {"t": table_id, "ts": ts, "ev": event_kinds(list(changes) + removed), "set": changes}
+            if removed:
+                rec["del"] = removed
+            self.since_snapshot[table_id] += 1
+        self.state[table_id] = snap
+        return rec
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="journal")
+        self._thread.start()
+
+    def stop(self):
+        """Commit everything queued and stop the writer."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        f = open(self.path, "ab")
+        while True:
+            with self._cond:
+                if self._running:
+                    self._cond.wait(self.commit_interval)
+                queued, self.pending = self.pending, []
+                running = self._running
+            batch = [rec for rec in (self._entry(*item) for item in queued) if rec]
+            if self.records + len(batch) >= self.compact_after:
+                f.close()
+                self._compact(self.state)   # the state already includes `batch`
+                f = open(self.path, "ab")
+            elif batch:
+                f.write(b"".join(json.dumps(rec).encode() + b"\n" for rec in batch))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                with self._cond:
+                    self.records += len(batch)
+                    self.commits += 1
+            if not running:
+                f.close()
+                return
+
+    def _compact(self, state):
+        tmp = self.path + ".tmp"
+        now = time.time()
+        with open(tmp, "wb") as f:
+            for table_id, snap in state.items():
+                f.write(json.dumps({"t": table_id, "ts": now, "snap": snap}).encode() + b"\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        with self._cond:
+            self.records = len(state)
+            self.commits += 1
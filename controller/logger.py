@@ -1,15 +1,189 @@
-import time
+"""Level-gated logging off the calling thread.
 
-def log(module: str, msg: str, level: str = "INFO"):
+log() drops records below the current level before touching the message,
+so hot paths can pass a format string and its arguments and pay for the
+formatting only when the record is kept:
+
+    log("INPUT", "Button %s pressed (P%d)", button, pid + 1)
+
+Kept records go to an in-memory ring buffer (recent(), for post-mortems)
+and onto a queue that a background writer thread drains every
+WRITE_INTERVAL seconds, formatting them for stdout and, after add_file(),
+a JSON-lines file rotated by size. The caller never waits on I/O nor wakes
+the writer per record.
+Keyword arguments are extra fields (table=...) carried into the JSON.
+flush() waits for the writer; it runs at exit too.
+
+LOG_LEVEL in the environment sets the starting level.
+"""
+import atexit, collections, json, os, sys, threading, time
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40}
+NAMES = {v: k for k, v in LEVELS.items()}
+RING_SIZE = 1000
+WRITE_INTERVAL = 0.05
+
+threshold = LEVELS.get(os.environ.get("LOG_LEVEL", "INFO").upper(), 20)
+ring = collections.deque(maxlen=RING_SIZE)   # recent records, newest last
+console = True                               # also print to stdout
+_files = []
+_queue = collections.deque()   # records and flush() markers for the writer
+_wake = threading.Event()
+_writer = None
+_lock = threading.Lock()
+
+def set_level(level):
+    global threshold
+    threshold = LEVELS[level.upper()] if isinstance(level, str) else level
+
+def enabled(level="INFO"):
+    return LEVELS[level] >= threshold
+
+def log(module: str, msg: str, *args, level: str = "INFO", **fields):
     """Log a message with timestamp and module name."""
-    ts = time.strftime("%H:%M:%S")
-    print(f"[{ts}] [{level:5}] [{module:6}] {msg}")
+    lvl = LEVELS[level]
+    if lvl < threshold:
+        return
+    # the stream is taken now so redirect_stdout() still applies to queued records
+    record = (time.time(), lvl, module, msg, args, fields, sys.stdout if console else None)
+    ring.append(record)
+    if _writer is None:
+        _start()
+    _queue.append(record)
+
+def info(module: str, msg: str, *args, **fields):
+    if threshold <= 20:
+        log(module, msg, *args, level="INFO", **fields)
+
+def warn(module: str, msg: str, *args, **fields):
+    if threshold <= 30:
+        log(module, msg, *args, level="WARN", **fields)
+
+def error(module: str, msg: str, *args, **fields):
+    if threshold <= 40:
+        log(module, msg, *args, level="ERROR", **fields)
+
+def debug(module: str, msg: str, *args, **fields):
+    if threshold <= 10:
+        log(module, msg, *args, level="DEBUG", **fields)
+
+def message(record):
+    """The record's text, with its arguments applied."""
+    msg, args = record[3], record[4]
+    if args:
+        try:
+            msg = msg % args
+        except (TypeError, ValueError):
+            msg = f"{msg} {args!r}"
+    return msg
+
+_stamp = (None, "")   # (second, "HH:MM:SS"): strftime once per second, not per line
+
+def format_line(record):
+    global _stamp
+    ts, lvl, module, _, _, fields, _ = record
+    second = int(ts)
+    if _stamp[0] != second:
+        _stamp = (second, time.strftime("%H:%M:%S", time.localtime(second)))
+    table = fields.get("table")
+    prefix = f"[{table}] " if table else ""
+    return f"[{_stamp[1]}] [{NAMES[lvl]:5}] [{module:6}] {prefix}{message(record)}"
+
+def recent(count=None):
+    """The last `count` records kept (all of the ring by default), formatted."""
+    records = list(ring)[-count:] if count else list(ring)
+    return [format_line(r) for r in records]
+
+class JsonLinesFile:
+    """Appends one compact JSON object per record; past max_bytes the file is
+    renamed to path.1 (path.1 to path.2, ...) keeping `backups` old files."""
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, records):
+        for r in records:
+            data = {"ts": round(r[0], 3), "lvl": NAMES[r[1]], "mod": r[2], "msg": message(r)}
+            data.update(r[5])
+            self.file.write(json.dumps(data, separators=(",", ":"), default=str) + "\n")
+            if self.file.tell() >= self.max_bytes:
+                self.rotate()
+        self.file.flush()
+
+    def rotate(self):
+        self.file.close()
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self.file.close()
+
+def add_file(path, max_bytes=10 * 1024 * 1024, backups=3):
+    sink = JsonLinesFile(path, max_bytes, backups)
+    _files.append(sink)
+    return sink
+
+def flush(timeout=2.0):
+    """Wait until everything logged so far has been written."""
+    if _writer is None:
+        return True
+    done = threading.Event()
+    _queue.append(done)
+    _wake.set()
+    return done.wait(timeout)
+
+def _start():
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="logger", daemon=True)
+            _writer.start()
+
+def _write_loop():
+    while True:
+        _wake.wait(WRITE_INTERVAL)
+        _wake.clear()
+        batch = []
+        while _queue:
+            batch.append(_queue.popleft())
+        records = [r for r in batch if isinstance(r, tuple)]
+        if records:
+            _write(records)
+        for marker in batch:
+            if isinstance(marker, threading.Event):
+                marker.set()
 
-def info(module: str, msg: str):
-    log(module, msg, "INFO")
+def _write(records):
+    streams = {}
+    for r in records:
+        if r[6] is not None:
+            streams.setdefault(r[6], []).append(format_line(r))
+    for stream, lines in streams.items():
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except (OSError, ValueError):   # closed or redirected stream
+            pass
+    for sink in _files:
+        try:
+            sink.write(records)
+        except OSError as e:
+            sys.stderr.write(f"logger: {sink.path}: {e}\n")
 
-def warn(module: str, msg: str):
-    log(module, msg, "WARN")
+def _after_fork():
+    global _writer, _queue, _wake
+    _writer = None
+    _queue = collections.deque()
+    _wake = threading.Event()
 
-def error(module: str, msg: str):
-    log(module, msg, "ERROR")
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+atexit.register(flush)
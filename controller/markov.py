@@ -0,0 +1,123 @@
+"""Exact analysis of a board layout as an absorbing Markov chain.
+
+One player's state between turns is (position, HP, turns left to skip). A
+turn is Game.move_player() with a 1-3 roll - the goal absorbs, a tile's HP
+effect applies, HP <= 0 sends the player back a tile with HP 10, otherwise
+the tile's teleport and skip take effect - followed, with `players` > 1, by
+the minigame that closes the round: the player is ranked uniformly and
+loses MINIGAME_PENALTY[rank] HP under the same death rule.
+
+Between two deaths the position only grows, so HP never exceeds 10 plus the
+board's total healing (a teleport backwards breaks that; HP is then capped
+there). The chain is a sparse matrix Q over those states plus the one-turn
+absorption vector. Turns count the player's own turns.
+expected_turns() solves (I - Q) E = 1 by sparse LU for every state at once;
+finish_within() and turn_distribution() give the absorption probabilities
+turn by turn. win_probabilities() combines the turn distributions per seat,
+treating the other players' minigame ranks as independent of each other
+(each player's own chain is exact).
+
+chain() caches one Chain per layout.
+"""
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+from board import CLASSIC
+from montecarlo import MINIGAME_PENALTY, RESPAWN_HP
+
+TAIL = 1e-12   # stop a turn distribution once this much mass is left
+
+class Chain:
+    def __init__(self, board, players=3):
+        size = self.size = board.size
+        deltas, jump, skips = (np.asarray(a, np.int64) for a in (board.hp, board.jump, board.skip))
+        self.players = players
+        self.max_hp = RESPAWN_HP + int(deltas[1:size].clip(min=0).sum())
+        self.waits = int(skips.max()) + 1
+        n = size * self.max_hp * self.waits
+        pos, rest = np.divmod(np.arange(n), self.max_hp * self.waits)
+        hp, wait = np.divmod(rest, self.waits)
+        hp = hp + 1
+        penalties = (MINIGAME_PENALTY + (0,) * players)[:players] if players > 1 else (0,)
+        self.win = np.zeros(n)   # P(absorbed this turn)
+        # the move: (source, position, HP, wait, probability) per branch
+        waiting = np.flatnonzero(wait > 0)
+        branches = [(waiting, pos[waiting], hp[waiting], wait[waiting] - 1, 1.0)]
+        ready = np.flatnonzero(wait == 0)
+        for steps in (1, 2, 3):
+            land = np.minimum(pos[ready] + steps, size)
+            h = hp[ready] + deltas[land]
+            died = h <= 0
+            to = np.where(died, land - 1, jump[land])
+            won = (land == size) | (~died & (to == size))
+            np.add.at(self.win, ready[won], 1 / 3)
+            keep = ~won
+            branches.append((ready[keep], to[keep], np.where(died, RESPAWN_HP, h)[keep],
+                             np.where(died, 0, skips[land])[keep], 1 / 3))
+        # the minigame
+        rows, cols, probs = [], [], []
+        for src, to, h, w, p in branches:
+            h = np.minimum(h, self.max_hp)
+            for penalty in penalties:
+                h2 = h - penalty
+                died = h2 <= 0
+                rows.append(src)
+                cols.append(self.index(np.where(died, np.maximum(to - 1, 0), to), np.where(died, RESPAWN_HP, h2), w))
+                probs.append(np.full(len(src), p / len(penalties)))
+        self.Q = sparse.csr_matrix((np.concatenate(probs), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+        self.start = self.index(0, RESPAWN_HP)
+        self._expected = None
+
+    def index(self, pos, hp, wait=0):
+        return (pos * self.max_hp + hp - 1) * self.waits + wait
+
+    def expected_turns(self):
+        """Expected turns to the goal from every state, indexed like index()."""
+        if self._expected is None:
+            # states are numbered by position, and every transition but a death
+            # moves forward, so I - Q is nearly triangular as it stands; a
+            # fill-reducing column order only costs time here
+            n = self.Q.shape[0]
+            lu = splu((sparse.identity(n, format="csc") - self.Q).tocsc(), permc_spec="NATURAL")
+            self._expected = lu.solve(np.ones(n))
+        return self._expected
+
+    def expected(self, pos=0, hp=RESPAWN_HP):
+        return float(self.expected_turns()[self.index(pos, hp)])
+
+    def finish_within(self, turns):
+        """P(reaching the goal within `turns` turns) from every state."""
+        u = np.zeros(self.Q.shape[0])
+        for _ in range(turns):
+            u = self.win + self.Q @ u
+        return u
+
+    def turn_distribution(self, pos=0, hp=RESPAWN_HP, max_turns=10_000):
+        """P(the goal is reached on exactly turn k), k = 1, 2, ... from one state."""
+        v = np.zeros(self.Q.shape[0])
+        v[self.index(pos, hp)] = 1.0
+        out = []
+        QT = self.Q.T.tocsr()
+        while len(out) < max_turns and v.sum() > TAIL:
+            out.append(float(v @ self.win))
+            v = QT @ v
+        return np.array(out)
+
+    def win_probabilities(self):
+        """P(win) by turn-order seat, all players starting at (0, 10)."""
+        f = self.turn_distribution()
+        survive = 1 - np.cumsum(f)                         # P(T > k), k = 1..
+        before = np.concatenate(([1.0], survive[:-1]))     # P(T > k - 1)
+        n = self.players
+        return np.array([(f * survive ** seat * before ** (n - 1 - seat)).sum() for seat in range(n)])
+
+_chains = {}
+
+def chain(board=CLASSIC, players=3):
+    """The Chain of a board, built once per (layout, players)."""
+    key = (board.layout, players)
+    if key not in _chains:
+        if len(_chains) >= 64:
+            _chains.pop(next(iter(_chains)))
+        _chains[key] = Chain(board, players)
+    return _chains[key]
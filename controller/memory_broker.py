@@ -0,0 +1,228 @@
+"""In-process MQTT broker: the broker.py core with paho-like clients, no sockets.
+
+MemoryClient implements the part of paho.mqtt.client.Client that Bus, the
+simulations and the tests use (connect, subscribe, publish, will_set,
+loop_start, disconnect and the on_connect/on_message/on_disconnect
+callbacks), so `Bus(on_msg, client=MemoryClient(broker))` or
+main.use_client() runs the real server logic end to end in one process.
+
+Publishing only matches topics and queues the message on each subscriber;
+delivery happens on the subscriber's loop thread (loop_start()) like paho,
+or synchronously with broker.pump(), which drains every client until the
+system is quiet - handy for deterministic tests. drop() simulates a crash
+(the last will fires), disconnect() a clean shutdown. QoS 1 is exact here:
+a client with clean_session=False that drops gets its QoS 1 messages queued
+until it reconnects.
+"""
+import itertools, queue, threading
+import paho.mqtt.client as mqtt
+from paho.mqtt.enums import CallbackAPIVersion
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.reasoncodes import ReasonCode
+from broker import Broker
+
+class MemoryBroker(Broker):
+    """Thread-safe Broker for clients in the same process."""
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.RLock()
+        self.pending = set()   # clients without a loop thread that have events queued
+
+    def connect(self, session):
+        with self.lock:
+            return super().connect(session)
+
+    def disconnect(self, session, clean):
+        with self.lock:
+            super().disconnect(session, clean)
+
+    def subscribe(self, session, filt, qos):
+        with self.lock:
+            return super().subscribe(session, filt, qos)
+
+    def unsubscribe(self, session, filt):
+        with self.lock:
+            super().unsubscribe(session, filt)
+
+    def publish(self, topic, payload, qos=0, retain=False, sender=None):
+        with self.lock:
+            super().publish(topic, payload, qos, retain, sender)
+
+    def pump(self, limit=None):
+        """Deliver queued messages on the calling thread until none are left
+        (or `limit` were delivered); returns how many were delivered."""
+        delivered = 0
+        while self.pending and (limit is None or delivered < limit):
+            client = self.pending.pop()
+            while client._thread is None and client.loop(0):
+                delivered += 1
+                if delivered == limit:
+                    if not client._inbox.empty():
+                        self.pending.add(client)
+                    break
+        return delivered
+
+def _payload(payload):
+    """Payload conversion as paho does it."""
+    if payload is None:
+        return b""
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode()
+    if isinstance(payload, (int, float)):
+        return str(payload).encode()
+    raise TypeError("payload must be a string, bytearray, int, float or None.")
+
+class MemoryClient:
+    def __init__(self, broker, client_id="", clean_session=True, userdata=None,
+                 callback_api_version=CallbackAPIVersion.VERSION2):
+        self.broker = broker
+        self.client_id = client_id or f"mem-{id(self)}"
+        self.persistent = not clean_session
+        self.will = None
+        self._will = None
+        self._userdata = userdata
+        self._v1 = callback_api_version == CallbackAPIVersion.VERSION1
+        self._mids = itertools.count(1)
+        self._inbox = queue.SimpleQueue()
+        self._thread = None
+        self._connected = False
+        self.on_connect = None
+        self.on_message = None
+        self.on_disconnect = None
+
+    # --- paho API ---
+
+    def user_data_set(self, userdata):
+        self._userdata = userdata
+
+    def will_set(self, topic, payload=None, qos=0, retain=False):
+        self._will = (topic, _payload(payload), qos, retain, self.client_id)
+
+    def connect(self, host=None, port=None, keepalive=60, *args, **kwargs):
+        """host and port are ignored: the broker is the one given at construction."""
+        self.will = self._will
+        self._connected = True
+        present = self.broker.connect(self)
+        self._put(("connect", present))
+        return 0
+
+    def reconnect(self):
+        return self.connect()
+
+    def is_connected(self):
+        return self._connected
+
+    def subscribe(self, topic, qos=0, *args, **kwargs):
+        mid = next(self._mids)
+        if self._connected:
+            self.broker.subscribe(self, topic, qos)
+        return 0, mid
+
+    def unsubscribe(self, topic, *args, **kwargs):
+        mid = next(self._mids)
+        if self._connected:
+            self.broker.unsubscribe(self, topic)
+        return 0, mid
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        info = mqtt.MQTTMessageInfo(next(self._mids))
+        if not self._connected:
+            info.rc = mqtt.MQTT_ERR_NO_CONN
+            return info
+        info.rc = mqtt.MQTT_ERR_SUCCESS
+        self.broker.publish(topic, _payload(payload), qos, retain, self.client_id)
+        info._set_as_published()
+        return info
+
+    def disconnect(self, *args, **kwargs):
+        """Clean disconnect: no last will."""
+        self._leave(clean=True)
+        return 0
+
+    def loop_start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name=f"mem-{self.client_id}")
+            self._thread.start()
+        return 0
+
+    def loop_stop(self):
+        if self._thread is not None:
+            self._inbox.put(None)
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+            self._thread = None
+        return 0
+
+    def loop(self, timeout=1.0):
+        """Handle one queued event; returns False if there was none."""
+        try:
+            event = self._inbox.get(timeout=timeout) if timeout else self._inbox.get_nowait()
+        except queue.Empty:
+            return False
+        if event is not None:
+            self._handle(event)
+        return True
+
+    def loop_forever(self):
+        self._thread = threading.current_thread()
+        self._run()
+
+    # --- simulation ---
+
+    def drop(self):
+        """Vanish without DISCONNECT, like a device losing power: the will fires."""
+        self._leave(clean=False)
+
+    # --- broker side ---
+
+    def deliver(self, topic, payload, qos, retain):
+        msg = mqtt.MQTTMessage(topic=topic.encode())
+        msg.payload = payload
+        msg.qos = qos
+        msg.retain = retain
+        self._put(("message", msg))
+
+    def close(self):
+        """Taken over by another client with the same id."""
+        self._connected = False
+        self._put(("disconnect", 0))
+
+    def _leave(self, clean):
+        if self._connected:
+            self._connected = False
+            self.broker.disconnect(self, clean)
+            self._put(("disconnect", 0 if clean else 7))
+
+    def _put(self, event):
+        self._inbox.put(event)
+        if self._thread is None:
+            self.broker.pending.add(self)
+
+    def _run(self):
+        while True:
+            event = self._inbox.get()
+            if event is None:
+                return
+            self._handle(event)
+
+    def _handle(self, event):
+        kind, data = event
+        if kind == "message":
+            if self.on_message:
+                self.on_message(self, self._userdata, data)
+        elif kind == "connect":
+            if self.on_connect:
+                if self._v1:
+                    self.on_connect(self, self._userdata, {"session present": int(data)}, 0)
+                else:
+                    self.on_connect(self, self._userdata, mqtt.ConnectFlags(session_present=data),
+                                    ReasonCode(PacketTypes.CONNACK, "Success"), None)
+        elif kind == "disconnect":
+            if self.on_disconnect:
+                if self._v1:
+                    self.on_disconnect(self, self._userdata, data)
+                else:
+                    self.on_disconnect(self, self._userdata, mqtt.DisconnectFlags(is_disconnect_packet_from_server=False),
+                                       ReasonCode(PacketTypes.DISCONNECT, identifier=0 if not data else 0x80), None)
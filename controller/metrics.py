@@ -0,0 +1,206 @@
+"""Process-wide counters and latency histograms, scraped over HTTP.
+
+Counters and histograms are module globals that the bus, the display
+sender and main.py update inline: an event is a dict lookup and a few
+integer operations, with no lock and no allocation. Updates from
+different threads are not serialized; the GIL keeps each store whole, and
+a rare lost increment is an acceptable price for the hot path.
+
+Histograms are HDR-style: a duration, in units of about 1 ns, lands in one
+of 2**SUB_BITS linear sub-buckets of its power of two, so every bucket is
+within 1/2**SUB_BITS of the values in it from 1 ns to about 17 minutes,
+in a fixed list of counts. Percentiles come from those counts; the
+exported Prometheus buckets are the LE bounds below, summed from them.
+
+serve(port) exposes render() as Prometheus text on /metrics from a daemon
+thread; main.py starts it with --metrics-port.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUB_BITS = 4
+UNIT = 2.0 ** 30                # histogram resolution: 2**-30 s, about 1 ns
+MAX_UNITS = (1 << 40) - 1      # about 17 minutes
+LE = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+      1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _index(units):
+    bits = units.bit_length()
+    if bits <= SUB_BITS + 1:
+        return units
+    shift = bits - SUB_BITS - 1
+    return (shift << SUB_BITS) + (units >> shift)
+
+def _bounds(index):
+    """[lower, upper) in seconds of a histogram bucket."""
+    if index < 2 << SUB_BITS:
+        return index / UNIT, (index + 1) / UNIT
+    shift = (index >> SUB_BITS) - 1
+    mantissa = index - (shift << SUB_BITS)
+    return (mantissa << shift) / UNIT, ((mantissa + 1) << shift) / UNIT
+
+BUCKETS = _index(MAX_UNITS) + 1
+_UPPER = [_bounds(i)[1] for i in range(BUCKETS)]
+
+registry = []
+
+class Counter:
+    """A monotonically increasing count, optionally split by one label."""
+    kind = "counter"
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}
+        registry.append(self)
+
+    def inc(self, key=None, amount=1):
+        values = self.values
+        values[key] = values.get(key, 0) + amount
+
+    def get(self, key=None):
+        return self.values.get(key, 0)
+
+    def samples(self):
+        for key, value in sorted(self.values.items(), key=_by_key):
+            yield self.name, _labels(self.label, key), value
+
+class Histogram:
+    """Distribution of durations in seconds, optionally split by one label."""
+    kind = "histogram"
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.series = {}   # key -> bucket counts, then the sum of values
+        registry.append(self)
+
+    def observe(self, seconds, key=None):
+        counts = self.series.get(key)
+        if counts is None:
+            counts = self.series[key] = [0] * BUCKETS + [0.0]
+        units = int(seconds * UNIT)
+        if units > MAX_UNITS:
+            units = MAX_UNITS
+        elif units < 0:
+            units = 0
+        bits = units.bit_length()
+        if bits > SUB_BITS + 1:   # _index(), inlined
+            units = ((bits - SUB_BITS - 1) << SUB_BITS) + (units >> (bits - SUB_BITS - 1))
+        counts[units] += 1
+        counts[-1] += seconds
+
+    def count(self, key=None):
+        counts = self.series.get(key)
+        return sum(counts[:-1]) if counts else 0
+
+    def percentile(self, q, key=None):
+        """Upper bound, in seconds, of the bucket holding the q-th percentile (0-100), or None."""
+        total = self.count(key)
+        counts = self.series.get(key)
+        if not total:
+            return None
+        rank = max(1, q / 100 * total)
+        seen = 0
+        for i in range(BUCKETS):
+            seen += counts[i]
+            if seen >= rank:
+                return _UPPER[i]
+        return _UPPER[-1]
+
+    def samples(self):
+        for key, counts in sorted(self.series.items(), key=_by_key):
+            le_counts = [0] * len(LE)
+            for i in range(BUCKETS):
+                if counts[i]:
+                    upper = _UPPER[i]
+                    for j, le in enumerate(LE):
+                        if upper <= le:
+                            le_counts[j] += counts[i]
+                            break
+            total = sum(counts[:-1])
+            seen = 0
+            for le, n in zip(LE, le_counts):
+                seen += n
+                yield self.name + "_bucket", _labels(self.label, key, le=_number(le)), seen
+            yield self.name + "_bucket", _labels(self.label, key, le="+Inf"), total
+            yield self.name + "_sum", _labels(self.label, key), counts[-1]
+            yield self.name + "_count", _labels(self.label, key), total
+
+def _by_key(item):
+    return "" if item[0] is None else str(item[0])
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _labels(label, key, **extra):
+    pairs = [(label, key)] if label and key is not None else []
+    pairs += extra.items()
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+_topics = {}
+
+def topic_label(topic):
+    """The topic with its table/{id}/ prefix and device ids folded into "+",
+    so per-table and per-device topics share one label."""
+    label = _topics.get(topic)
+    if label is None:
+        parts = topic.split("/")
+        if parts[0] == "table" and len(parts) > 2:
+            parts = parts[2:]
+        if parts[0] == "esp01" and len(parts) > 2:
+            parts = [p if i == 0 or i == len(parts) - 1 or p == "player" else "+" for i, p in enumerate(parts)]
+        label = "/".join(parts)
+        if len(_topics) >= 4096:
+            _topics.clear()
+        _topics[topic] = label
+    return label
+
+def render():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass   # scrapes every few seconds would flood the log
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics on host:port from a daemon thread; returns the server
+    (server.server_address has the port when 0 was asked for)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+MESSAGES_IN = Counter("mqtt_messages_received_total", "MQTT messages received, by topic.", "topic")
+MESSAGES_OUT = Counter("mqtt_messages_published_total", "MQTT messages published, by topic.", "topic")
+FRAMES_SENT = Counter("display_frames_sent_total", "game/display frames sent to devices.")
+ACK_TIMEOUTS = Counter("display_ack_timeouts_total", "game/display frames whose ACK timed out.")
+ACK_WAIT = Histogram("display_ack_wait_seconds", "Time from sending a display frame to its ACK.")
+HANDLER_SECONDS = Histogram("handler_seconds", "Time spent handling an inbound message, by topic.", "topic")
+UNHANDLED = Counter("mqtt_messages_unhandled_total", "Inbound messages with no handler or whose handler raised.", "reason")
+TICK_SECONDS = Histogram("tick_seconds", "Duration of one main loop step: timers and table ticks.")
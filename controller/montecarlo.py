@@ -0,0 +1,121 @@
+"""Vectorized Monte Carlo of the board rules, for balancing board layouts.
+
+Plays a whole batch of games at once with NumPy, one array row per game,
+following Game.move_player() and apply_minigame_penalties():
+
+  - the player to move steps 1-3 tiles, capped at the goal; reaching it wins
+  - the tile's HP effect applies; at HP <= 0 the player goes back one tile
+    with HP reset to 10, otherwise teleports and skip turns take effect
+  - after every full round a minigame ranks the players at random (bots of
+    equal skill) and the 2nd and 3rd lose 1 and 2 HP, with the same death rule
+
+Seats are turn-order positions (seat 1 moves first). Finished games are
+dropped from the arrays after each move, so the cost follows the games
+still running. Any board.Board works: its flat per-tile lists become the
+HP, teleport and skip lookup arrays.
+
+Run: python montecarlo.py [games] [--players 3] [--seed N] [--boards FILE --board NAME]
+"""
+import argparse, time
+import numpy as np
+from board import CLASSIC, get_board, load_boards
+
+MINIGAME_PENALTY = (0, 1, 2)   # HP lost by 1st, 2nd, 3rd
+RESPAWN_HP = 10
+MAX_ROUNDS = 1000
+
+class Results:
+    def __init__(self, players, size, games):
+        self.games = games
+        self.wins = np.zeros(players, np.int64)          # by seat
+        self.lengths = np.zeros(games, np.int32)         # moves until someone won, 0 if unfinished
+        self.tile_deaths = np.zeros(size + 1, np.int64)  # deaths on landing, by tile
+        self.minigame_deaths = np.zeros(size + 1, np.int64)  # deaths after a minigame, by tile held
+
+    @property
+    def win_rate(self):
+        return self.wins / self.games
+
+    def length_percentiles(self, q=(5, 25, 50, 75, 95, 99)):
+        done = self.lengths[self.lengths > 0]
+        return dict(zip(q, np.percentile(done, q))) if len(done) else {}
+
+def _respawn(pos, hp, died):
+    np.subtract(pos, 1, out=pos, where=died & (pos > 0))
+    hp[died] = RESPAWN_HP
+
+def simulate(games, players=3, board=CLASSIC, seed=None, max_rounds=MAX_ROUNDS):
+    """Play `games` games on `board`; returns Results."""
+    size = board.size
+    deltas = np.asarray(board.hp, np.int16)
+    jump = np.asarray(board.jump, np.int16)
+    skips = np.asarray(board.skip, np.int16)
+    rng = np.random.default_rng(seed)
+    penalty = np.array((MINIGAME_PENALTY + (0,) * players)[:players], np.int16)
+    res = Results(players, size, games)
+    pos = np.zeros((games, players), np.int16)
+    hp = np.full((games, players), RESPAWN_HP, np.int16)
+    wait = np.zeros((games, players), np.int16)   # turns left to skip
+    ids = np.arange(games)
+    moves = 0
+    for _ in range(max_rounds):
+        for seat in range(players):
+            moves += 1
+            here, w = pos[:, seat], wait[:, seat]
+            moving = w == 0
+            p = np.minimum(here + rng.integers(1, 4, len(ids), dtype=np.int16), size)
+            h = hp[:, seat] + deltas[p]
+            won = moving & (p == size)
+            died = moving & ~won & (h <= 0)
+            landed = moving & ~won & ~died
+            res.tile_deaths += np.bincount(p[died], minlength=size + 1)
+            _respawn(p, h, died)
+            pos[:, seat] = np.where(landed, jump[p], np.where(moving, p, here))
+            hp[:, seat] = np.where(moving, h, hp[:, seat])
+            wait[:, seat] = np.where(landed, skips[p], np.maximum(w - 1, 0))
+            won |= landed & (pos[:, seat] == size)
+            if won.any():
+                res.wins[seat] += np.count_nonzero(won)
+                res.lengths[ids[won]] = moves
+                keep = ~won
+                pos, hp, wait, ids = pos[keep], hp[keep], wait[keep], ids[keep]
+                if not len(ids):
+                    return res
+        # minigame: a random ranking per game, rank r loses penalty[r]
+        ranks = rng.random((len(ids), players)).argsort(axis=1).argsort(axis=1)
+        hp -= penalty[ranks]
+        died = hp <= 0
+        res.minigame_deaths += np.bincount(pos[died], minlength=size + 1)
+        _respawn(pos, hp, died)
+    return res
+
+def report(res, elapsed=None):
+    lines = []
+    if elapsed:
+        lines.append(f"{res.games:,} games in {elapsed:.2f}s ({res.games / elapsed:,.0f} games/s)")
+    lines.append("win rate by seat: " + "  ".join(f"{i + 1}: {r:.1%}" for i, r in enumerate(res.win_rate)))
+    pct = res.length_percentiles()
+    lines.append("game length (moves): " + "  ".join(f"p{q}: {v:.0f}" for q, v in pct.items()))
+    lines.append("deaths per 1000 games by tile (landing + minigame):")
+    for tile in range(len(res.tile_deaths)):
+        t, m = res.tile_deaths[tile], res.minigame_deaths[tile]
+        if t or m:
+            lines.append(f"  {tile:3d}: {t * 1000 / res.games:7.1f} + {m * 1000 / res.games:7.1f}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo of the board rules")
+    parser.add_argument("games", type=int, nargs="?", default=1_000_000)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--boards", help="JSON or TOML board file")
+    parser.add_argument("--board", help="board name (default: the file's default, or classic)")
+    args = parser.parse_args()
+    if args.boards:
+        load_boards(args.boards)
+    start = time.perf_counter()
+    res = simulate(args.games, args.players, get_board(args.board), seed=args.seed)
+    print(report(res, time.perf_counter() - start))
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,197 @@
-import json, random
+import json, random, time
 import paho.mqtt.client as mqtt
 from paho.mqtt.enums import CallbackAPIVersion, MQTTProtocolVersion
+from display_sender import DisplaySender
+from metrics import MESSAGES_IN, MESSAGES_OUT, topic_label
+import tracing
 
 BROKER = "localhost"
 PORT   = 1883
 
+SUBSCRIPTIONS = [
+    "base/button",
+    "game/connection",
+    "game/ack",
+    "esp01/register",
+    "esp01/player/+/sensor",
+    "esp01/+/status",
+]
+TABLE_PREFIX = "table/+/"   # multi-table topics: table/{id}/base/button, ...
+OPENING = ("game/connection", "esp01/register")   # may open a table, see main.HANDLERS
+
 class Bus:
-    def __init__(self, on_msg):
-        self.client = mqtt.Client(
-            callback_api_version=CallbackAPIVersion.VERSION2,
-            client_id=f"GameServer_{random.randint(1000,9999)}",
-            protocol=MQTTProtocolVersion.MQTTv311,
-            clean_session=True
-        )
+    prefix = ""
+
+    def __init__(self, on_msg, cluster=None, client=None, clock=time.monotonic):
+        self.cluster = cluster
+        self.host, self.port = BROKER, PORT
+        if client is not None:
+            # any paho-compatible client, e.g. memory_broker.MemoryClient
+            self.client = client
+        elif cluster:
+            # MQTT 5 for shared subscriptions; the client id is stable per node
+            self.client = mqtt.Client(
+                callback_api_version=CallbackAPIVersion.VERSION2,
+                client_id=cluster.client_id,
+                protocol=MQTTProtocolVersion.MQTTv5
+            )
+        else:
+            self.client = mqtt.Client(
+                callback_api_version=CallbackAPIVersion.VERSION2,
+                client_id=f"GameServer_{random.randint(1000,9999)}",
+                protocol=MQTTProtocolVersion.MQTTv311,
+                clean_session=True
+            )
         self.client.on_connect = self._on_connect
         self._user_on_message = on_msg
         self.client.on_message = self._on_message
-        self.last_display = None
-        self.ack_received = True
+        self.display = DisplaySender(self._publish, clock=clock)
+        self.prefixes = ["", TABLE_PREFIX]
+        self.extra = []      # further raw filters, e.g. replication topics
+        self.discovery = False   # see topics()
 
     def _on_connect(self, client, userdata, flags, reason_code, properties):
         print(f"Connected to Broker (reason_code: {reason_code})")
-        self.client.subscribe("base/button")
-        self.client.subscribe("game/connection")
-        self.client.subscribe("game/ack")
-        self.client.subscribe("esp01/register")
-        self.client.subscribe("esp01/player/+/sensor")
-        self.client.subscribe("esp01/+/status")
+        for topic in self.extra:
+            self.client.subscribe(topic)
+        if self.cluster:
+            for topic in self.cluster.filters():
+                self.client.subscribe(topic)
+            return
+        for prefix in self.prefixes:
+            for topic in self.topics(prefix):
+                self.client.subscribe(prefix + topic)
+
+    def topics(self, prefix):
+        """The SUBSCRIPTIONS followed under prefix. With discovery (supervisor
+        workers without a table list) TABLE_PREFIX carries only the OPENING
+        topics, so every worker hears of new tables, and each table's own
+        "table/{id}/" prefix, added when its worker opens it, the rest."""
+        if not self.discovery or not prefix:
+            return SUBSCRIPTIONS
+        if prefix == TABLE_PREFIX:
+            return OPENING
+        return [topic for topic in SUBSCRIPTIONS if topic not in OPENING]
+
+    def set_prefixes(self, prefixes):
+        """Subscribe to the inputs of these topic prefixes only ("" is the legacy
+        table, TABLE_PREFIX every table, "table/{id}/" a single one)."""
+        old, self.prefixes = set(self.prefixes), list(prefixes)
+        if not self.client.is_connected():
+            return
+        for prefix in old - set(self.prefixes):
+            for topic in self.topics(prefix):
+                self.client.unsubscribe(prefix + topic)
+        for prefix in set(self.prefixes) - old:
+            for topic in self.topics(prefix):
+                self.client.subscribe(prefix + topic)
+
+    def add_prefix(self, prefix):
+        if prefix not in self.prefixes:
+            self.set_prefixes(self.prefixes + [prefix])
+
+    def remove_prefix(self, prefix):
+        if prefix in self.prefixes:
+            self.set_prefixes([p for p in self.prefixes if p != prefix])
+
+    def follow(self, topic):
+        """Subscribe to a raw filter outside the game topics, now and on every reconnect."""
+        self.extra.append(topic)
+        if self.client.is_connected():
+            self.client.subscribe(topic)
+
+    def unfollow(self, topic):
+        if topic in self.extra:
+            self.extra.remove(topic)
+            if self.client.is_connected():
+                self.client.unsubscribe(topic)
 
     def _on_message(self, client, userdata, msg):
-        if msg.topic == "game/ack":
-            self.ack_received = True
+        if self.cluster:
+            msg = self._cluster_route(msg)
+            if msg is None:
+                return
+        MESSAGES_IN.inc(topic_label(msg.topic))
+        if msg.topic.endswith("game/ack"):
+            self.display.on_ack(self.display_topic(msg.topic), msg.payload)
             return
         self._user_on_message(client, userdata, msg) 
 
+    def _cluster_route(self, msg):
+        """Unwrap messages forwarded to this node; forward the ones another node owns."""
+        inbox = self.cluster.inbox
+        if msg.topic.startswith(inbox):
+            forwarded = mqtt.MQTTMessage(mid=msg.mid, topic=msg.topic[len(inbox):].encode())
+            forwarded.payload = msg.payload
+            return forwarded   # never forwarded twice
+        owner = self.cluster.forward_to(msg.topic)
+        if owner:
+            self.client.publish(owner + msg.topic, msg.payload)
+            return None
+        return msg
+
     def start(self):
+        self.display.start()
         try:
-            self.client.connect(BROKER, PORT, 60)
+            self.client.connect(self.host, self.port, 60)
             self.client.loop_start()
         except Exception as e:
             print(f"MQTT Connection Error: {e}")
 
     def stop(self):
+        self.display.flush()
+        self.display.stop()
         self.client.loop_stop()
         self.client.disconnect()
 
-    def pub(self, topic, payload, retain=False, cache=True, wait_ack=True):
-        import time
+    @staticmethod
+    def display_topic(ack_topic):
+        return ack_topic.rsplit("/", 1)[0] + "/display"
+
+    def last_frame(self, topic):
+        flow = self.display.flows.get(topic)
+        return flow.last_frame if flow else None
+
+    @property
+    def last_display(self):
+        return self.last_frame("game/display")
+
+    def pub(self, topic, payload, retain=False, cache=True, wait_ack=True, coalesce=False):
+        """Publish a message. game/display frames are handed to the display sender
+        and a Future for their ACK is returned; every other topic goes out directly.
+        coalesce=True marks high-rate display updates that may be merged.
+
+        A display topic's frames, retained clears (empty payloads) included, go
+        out in the order they were published, so a clear is never overtaken by
+        a frame queued before it. Other topics, e.g. game/sound, are not held
+        behind queued frames and may reach the broker first."""
+        MESSAGES_OUT.inc(topic_label(topic))
+        if topic.endswith("game/display"):
+            if not payload:
+                payload, wait_ack, cache, coalesce = "", False, False, False
+            return self.display.submit(topic, payload, retain=retain, wait_ack=wait_ack, cache=cache, coalesce=coalesce,
+                                       trace=tracing.current())
+
         if isinstance(payload, dict) or isinstance(payload, list):
             payload = json.dumps(payload)
-            
-        if topic == "game/display" and payload and wait_ack:
-            wait_start = time.time()
-            while not self.ack_received and (time.time() - wait_start < 0.5):
-                time.sleep(0.05)
-            
-            if cache:
-                self.last_display = payload
-            self.ack_received = False
-            
+
+        self._publish(topic, payload, retain)
+
+    def _publish(self, topic, payload, retain=False):
         self.client.publish(topic, payload, retain=retain)
 
     def subscribe(self, topic):
-        self.client.subscribe(topic)
\ No newline at end of file
+        self.client.subscribe(topic)
+
+class TableBus:
+    """A Bus view that prefixes every topic with a table's prefix."""
+    def __init__(self, bus, prefix):
+        self.bus = bus
+        self.prefix = prefix
+
+    @property
+    def last_display(self):
+        return self.bus.last_frame(self.prefix + "game/display")
+
+    def pub(self, topic, payload, **kwargs):
+        return self.bus.pub(self.prefix + topic, payload, **kwargs)
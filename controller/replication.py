@@ -0,0 +1,109 @@
+"""Hot standby: a primary server streams table state to a standby over MQTT.
+
+The primary publishes a table's snapshot() on replica/{group}/state with the
+heartbeat after an input, timer or tick changed it: however many inputs a
+table gets in between, it is serialized and sent at most once per beat, and
+not at all if it ends up as last sent. The heartbeat goes out on
+replica/{group}/heartbeat every HEARTBEAT seconds from the primary's own
+timer wheel, so a wedged loop stops beating too.
+
+The standby keeps the latest snapshot of every table without running them.
+After HEARTBEAT_TIMEOUT without a beat, or when the primary announces a clean
+shutdown ("DOWN"), it takes over: the server restores every table, re-arms
+its timeouts, republishes its last display and starts serving (and
+replicating) itself. A standby that never heard a primary stays passive.
+"""
+import json
+from logger import log
+
+HEARTBEAT = 0.1
+HEARTBEAT_TIMEOUT = 0.5
+
+def state_topic(group):
+    return f"replica/{group}/state"
+
+def heartbeat_topic(group):
+    return f"replica/{group}/heartbeat"
+
+class Primary:
+    def __init__(self, bus, tables, timers, group="game"):
+        self.bus = bus
+        self.tables = tables
+        self.timers = timers
+        self.group = group
+        self.sent = {}       # table_id -> last snapshot JSON sent
+        self.pending = {}    # table_id -> (table, snapshot or None to take one at the beat)
+        self.beats = 0
+        self.timer = None
+
+    def start(self):
+        self._beat()
+
+    def changed(self, table):
+        """Snapshot table on the next heartbeat."""
+        self.pending[table.table_id] = (table, None)
+
+    def publish(self, table, snap=None):
+        """Send table's state on the next heartbeat; `snap` is a snapshot() the
+        caller already took after the change (main.route() shares the journal's)."""
+        self.pending[table.table_id] = (table, snap)
+
+    def flush(self):
+        """Send the pending tables that differ from what was last sent."""
+        pending, self.pending = self.pending, {}
+        for table_id, (table, snap) in pending.items():
+            if self.tables.get(table_id) is not table:
+                continue
+            data = json.dumps(snap if snap is not None else table.snapshot())
+            if self.sent.get(table_id) != data:
+                self.sent[table_id] = data
+                self.bus.pub(state_topic(self.group), data)
+
+    def _beat(self):
+        self.flush()
+        self.beats += 1
+        self.bus.pub(heartbeat_topic(self.group), str(self.beats))
+        self.timer = self.timers.schedule(HEARTBEAT, self._beat)
+
+    def stop(self):
+        """Clean shutdown: send what is pending and hand over to the standby at once."""
+        if self.timer:
+            self.timer.cancel()
+        self.flush()
+        self.bus.pub(heartbeat_topic(self.group), "DOWN")
+
+class Standby:
+    def __init__(self, timers, on_takeover, timeout=HEARTBEAT_TIMEOUT):
+        self.timers = timers
+        self.on_takeover = on_takeover
+        self.timeout = timeout
+        self.snapshots = {}
+        self.watchdog = None
+        self.active = False
+        self.last_beat = 0
+
+    def on_state(self, msg, group):
+        snap = json.loads(msg.payload)
+        self.snapshots[snap["table_id"]] = snap
+
+    def on_heartbeat(self, msg, group):
+        if self.active:
+            return
+        if msg.payload == b"DOWN":
+            self.take_over("primary shut down")
+            return
+        self.last_beat = self.timers.clock()
+        if self.watchdog:
+            self.watchdog.cancel()
+        self.watchdog = self.timers.schedule(self.timeout, self.take_over, "missed heartbeats")
+
+    def take_over(self, reason):
+        if self.active:
+            return
+        self.active = True
+        if self.watchdog:
+            self.watchdog.cancel()
+        silent = self.timers.clock() - self.last_beat if self.last_beat else 0
+        log("REPLICA", f"Taking over ({reason}, {silent:.2f}s since last beat), "
+                       f"restoring {len(self.snapshots)} tables")
+        self.on_takeover(self.snapshots)
@@ -0,0 +1,94 @@
+class TopicRouter:
+    """Dispatches MQTT topics to handlers through a trie of topic levels.
+
+    Patterns use MQTT filter syntax. Each '+' level is passed to the handler as
+    an extra argument, and '#' passes the remaining levels joined by '/'.
+    Literal levels win over '+', which wins over '#'. Resolved topics are kept
+    in a flat table (bounded by cache_size), so a topic seen before costs one
+    dict lookup; the set of live topics is small (buttons, meeple MACs, pids).
+    """
+    def __init__(self, cache_size=4096):
+        self._root = {}
+        self._cache = {}
+        self.cache_size = cache_size
+
+    def add(self, pattern, handler):
+        node = self._root
+        for level in pattern.split("/"):
+            node = node.setdefault(level, {})
+        node[None] = handler
+        self._cache.clear()
+
+    def remove(self, pattern):
+        """Unroute pattern; returns its handler, or None if it was not routed."""
+        node = self._root
+        for level in pattern.split("/"):
+            node = node.get(level)
+            if node is None:
+                return None
+        self._cache.clear()
+        return node.pop(None, None)
+
+    def match(self, topic):
+        """Return (handler, wildcard_values) or (None, ()) if nothing matches."""
+        hit = self._cache.get(topic)
+        if hit is not None:
+            return hit
+        hit = self._resolve(topic)
+        if hit[0] is not None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[topic] = hit
+        return hit
+
+    def _resolve(self, topic):
+        levels = topic.split("/")
+        # Greedy walk, literal before '+'; fall back to the full search only on a dead end.
+        node = self._root
+        args = []
+        for level in levels:
+            child = node.get(level)
+            if child is None:
+                child = node.get("+")
+                if child is None:
+                    break
+                args.append(level)
+            node = child
+        else:
+            handler = node.get(None)
+            if handler is not None:
+                return handler, tuple(args)
+        return self._match(self._root, levels, 0, ())
+
+    def _match(self, node, levels, i, args):
+        if i == len(levels):
+            if None in node:
+                return node[None], args
+            hash_node = node.get("#")
+            if hash_node is not None and None in hash_node:
+                return hash_node[None], args + ("",)
+            return None, ()
+        level = levels[i]
+        child = node.get(level)
+        if child is not None:
+            found = self._match(child, levels, i + 1, args)
+            if found[0]:
+                return found
+        child = node.get("+")
+        if child is not None:
+            found = self._match(child, levels, i + 1, args + (level,))
+            if found[0]:
+                return found
+        child = node.get("#")
+        if child is not None and None in child:
+            return child[None], args + ("/".join(levels[i:]),)
+        return None, ()
+
+    def dispatch(self, topic, *args):
+        """Call the handler for topic as handler(*args, *wildcards). Returns False if unrouted."""
+        hit = self._cache.get(topic)
+        handler, wildcards = hit if hit is not None else self.match(topic)
+        if handler is None:
+            return False
+        handler(*args, *wildcards)
+        return True
@@ -0,0 +1,191 @@
+"""Headless self-play: bots drive Game through whole games at full speed.
+
+No MQTT, Table or hardware: play() rolls initiative into set_turn_order(),
+moves with move_player() and next_turn(), and scores each minigame from
+the bots' behaviour profiles before apply_minigame_penalties(), following
+the rules Table enforces:
+
+  MASH      presses in the 10 s window, most wins
+  REACTION  seconds from the signal; a false start or no press within 3 s is DNF
+  TIME      distance of the press from the target (3-8 s); no press within
+            target + 3 s is DNF
+
+Every game has its own RNG streams derived from (seed, game), one for the
+table (dice, minigame picks) and one per seat, so a game replays exactly
+whatever worker runs it. run() spreads games over a process pool.
+
+Run: python selfplay.py [games] [--workers N] [--profiles casual,pro,slow]
+"""
+import argparse, contextlib, math, os, random, time
+from concurrent.futures import ProcessPoolExecutor
+from game_fsm import Game
+
+MINIGAMES = ["MASH", "REACTION", "TIME"]
+MASH_WINDOW = 10.0
+REACTION_WINDOW = 3.0
+TIME_SLACK = 3.0
+MAX_TURNS = 1000
+
+class Profile:
+    """How a bot plays: reaction time ~ lognormal(reaction, reaction_sd) seconds,
+    false_start probability per REACTION round, mash_rate presses/s (+- mash_sd),
+    and timing_sd seconds of error when pressing at a target time."""
+    def __init__(self, name, reaction=0.35, reaction_sd=0.25, false_start=0.05,
+                 mash_rate=6.0, mash_sd=1.0, timing_sd=0.8):
+        self.name = name
+        self.reaction = reaction
+        self.reaction_sd = reaction_sd
+        self.false_start = false_start
+        self.mash_rate = mash_rate
+        self.mash_sd = mash_sd
+        self.timing_sd = timing_sd
+
+PROFILES = {
+    "casual": Profile("casual"),
+    "pro": Profile("pro", reaction=0.22, reaction_sd=0.15, false_start=0.02, mash_rate=9.0, timing_sd=0.4),
+    "slow": Profile("slow", reaction=0.6, reaction_sd=0.3, false_start=0.01, mash_rate=4.0, timing_sd=1.5),
+    "jumpy": Profile("jumpy", reaction=0.25, false_start=0.25, mash_rate=7.0),
+}
+
+class Bot:
+    def __init__(self, profile, rng):
+        self.profile = profile
+        self.rng = rng
+
+    def mash(self):
+        p = self.profile
+        return max(0, int(self.rng.gauss(p.mash_rate, p.mash_sd) * MASH_WINDOW))
+
+    def react(self):
+        """Seconds after the signal, or None for a false start."""
+        p = self.profile
+        if self.rng.random() < p.false_start:
+            return None
+        return self.rng.lognormvariate(_log_mean(p.reaction, p.reaction_sd), _log_sd(p.reaction, p.reaction_sd))
+
+    def press_at(self, target):
+        return max(0.0, self.rng.gauss(target, self.profile.timing_sd))
+
+def _log_sd(mean, sd):
+    return math.sqrt(math.log(1 + (sd / mean) ** 2))
+
+def _log_mean(mean, sd):
+    """mu of the lognormal whose mean is `mean`."""
+    return math.log(mean) - _log_sd(mean, sd) ** 2 / 2
+
+def score_minigame(game, bots):
+    """Fill mini_score/mini_done for game.current_minigame as Table would."""
+    kind = game.current_minigame
+    for player, bot in zip(game.players, bots):
+        if kind == "MASH":
+            player.mini_score = bot.mash()
+        elif kind == "REACTION":
+            t = bot.react()
+            player.mini_score = 999.0 if t is None else (t if t < REACTION_WINDOW else 0)
+        else:
+            pressed = bot.press_at(game.minigame_target)
+            late = pressed > game.minigame_target + TIME_SLACK
+            player.mini_score = 0 if late else abs(pressed - game.minigame_target)
+        player.mini_done = kind != "MASH"
+
+def play(seed, game_no=0, profiles=("casual", "casual", "casual")):
+    """Play one game; returns (winner seat, turns, minigames, deaths per seat, minigame wins per seat)."""
+    table_rng = random.Random(f"{seed}:{game_no}")
+    bots = [Bot(PROFILES[name], random.Random(f"{seed}:{game_no}:{seat}")) for seat, name in enumerate(profiles)]
+    game = Game(n_players=len(bots))
+    game.set_turn_order([(seat, table_rng.randint(1, 6), seat) for seat in range(len(bots))])
+    turns = minigames = 0
+    deaths = [0] * len(bots)
+    mini_wins = [0] * len(bots)
+    while game.state != "GAME_OVER" and turns < MAX_TURNS:
+        turns += 1
+        log = game.move_player(table_rng.randint(1, 3))
+        if "DIED" in log:
+            deaths[game.get_current_player().id] += 1
+        if game.state == "GAME_OVER":
+            break
+        if game.next_turn():
+            minigames += 1
+            game.current_minigame = table_rng.choice(MINIGAMES)
+            if game.current_minigame == "TIME":
+                game.minigame_target = table_rng.randint(3, 8)
+            score_minigame(game, bots)
+            logs = game.apply_minigame_penalties()
+            mini_wins[int(logs[0][len("Win:P"):].split()[0]) - 1] += 1
+            for line in logs[2:]:   # "P{n} died! Reset"
+                deaths[int(line[1:].split()[0]) - 1] += 1
+    return game.winner, turns, minigames, deaths, mini_wins
+
+def _play_range(args):
+    seed, start, stop, profiles = args
+    return [play(seed, n, profiles) for n in range(start, stop)]
+
+class Report:
+    def __init__(self, profiles):
+        self.profiles = list(profiles)
+        seats = len(self.profiles)
+        self.games = 0
+        self.wins = [0] * seats
+        self.unfinished = 0
+        self.turns = []
+        self.minigames = 0
+        self.deaths = [0] * seats
+        self.mini_wins = [0] * seats
+
+    def add(self, result):
+        winner, turns, minigames, deaths, mini_wins = result
+        self.games += 1
+        if winner is None:
+            self.unfinished += 1
+        else:
+            self.wins[winner] += 1
+        self.turns.append(turns)
+        self.minigames += minigames
+        self.deaths = [a + b for a, b in zip(self.deaths, deaths)]
+        self.mini_wins = [a + b for a, b in zip(self.mini_wins, mini_wins)]
+
+    def lines(self):
+        out = []
+        turns = sorted(self.turns)
+        out.append(f"turns: mean {sum(turns) / len(turns):.1f}, median {turns[len(turns) // 2]}, "
+                   f"max {turns[-1]}; {self.minigames / self.games:.2f} minigames/game, {self.unfinished} unfinished")
+        for seat, name in enumerate(self.profiles):
+            out.append(f"seat {seat + 1} ({name:6}): wins {self.wins[seat] / self.games:6.1%}, "
+                       f"minigame wins {self.mini_wins[seat] / max(1, self.minigames):6.1%}, "
+                       f"deaths/game {self.deaths[seat] / self.games:.2f}")
+        return out
+
+def run(games, seed=0, profiles=("casual", "casual", "casual"), workers=None, chunk=500):
+    """Play `games` games over `workers` processes (None: one per CPU, 1: in this process)."""
+    workers = workers or os.cpu_count() or 1
+    jobs = [(seed, start, min(start + chunk, games), tuple(profiles)) for start in range(0, games, chunk)]
+    report = Report(profiles)
+    with contextlib.ExitStack() as stack:
+        if workers == 1:
+            batches = map(_play_range, jobs)
+        else:
+            batches = stack.enter_context(ProcessPoolExecutor(workers)).map(_play_range, jobs)
+        for batch in batches:
+            for result in batch:
+                report.add(result)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless self-play")
+    parser.add_argument("games", type=int, nargs="?", default=100_000)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profiles", default="casual,casual,casual",
+                        help=f"comma-separated, one per seat: {', '.join(PROFILES)}")
+    args = parser.parse_args()
+    profiles = args.profiles.split(",")
+    start = time.perf_counter()
+    report = run(args.games, args.seed, profiles, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"{args.games} games in {elapsed:.2f}s: {args.games / elapsed:,.0f} games/s "
+          f"({args.workers or os.cpu_count()} workers)")
+    for line in report.lines():
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Supervisor mode: shard tables across worker processes.
+
+Each worker is a separate process (so a separate GIL) running main.py's asyncio
+engine with its own Bus, TimerWheel and tables, restricted to the tables whose
+id hashes to it. The supervisor watches worker heartbeats, restarts workers
+that crash or hang, and hands a worker's shard to the others when it keeps
+crashing or when the pool is resized.
+
+Run: python supervisor.py --workers 4 [--tables 1,2,3,...]
+
+With --tables each worker subscribes only to its own tables' topics. Without
+it a worker hears only the table-opening topics (game/connection,
+esp01/register) of every table under table/+/..., and subscribes to the rest
+of a table's topics once it opens that table, so it never receives, decodes
+and drops the presses and sensor streams of other shards.
+"""
+import os, time, zlib, queue, asyncio, argparse, collections
+import multiprocessing as mp
+from logger import log
+from mqtt_bus import TABLE_PREFIX
+
+HEARTBEAT = 1.0          # worker -> supervisor status interval
+HEARTBEAT_TIMEOUT = 5.0  # a worker silent this long is considered hung
+MAX_RESTARTS = 5         # restarts within RESTART_WINDOW before the shard is given away
+RESTART_WINDOW = 60.0
+
+def shard_owner(table_id, members):
+    """Rendezvous hash: the member with the highest crc32(member:table_id) owns
+    the table. Stable across processes, and removing a member only moves the
+    tables that member owned."""
+    return max(members, key=lambda m: zlib.crc32(f"{m}:{table_id}".encode()))
+
+def shard_predicate(index, members):
+    members = list(members)
+    return lambda table_id: shard_owner(table_id, members) == index
+
+def shard_prefixes(owns, table_ids):
+    """Topic prefixes a worker subscribes to for a fixed list of table ids."""
+    prefixes = [f"table/{t}/" for t in table_ids if t and owns(t)]
+    return ([""] if owns("") else []) + prefixes
+
+def subscribe_shard(bus, owns, table_ids, tables):
+    """Point a worker's Bus at its shard: the fixed table_ids it owns or, without
+    a list, the tables it already serves plus discovery of new ones."""
+    if table_ids is None:
+        if not bus.discovery:
+            bus.set_prefixes([])   # resubscribe table/+/ to the opening topics only
+            bus.discovery = True
+        table_ids = [t for t in tables if owns(t)]
+        bus.set_prefixes(shard_prefixes(owns, table_ids) + [TABLE_PREFIX])
+    else:
+        bus.set_prefixes(shard_prefixes(owns, table_ids))
+
+def worker_main(index, members, heartbeats, control, adopt=(), table_ids=None):
+    """Worker process entry point: serve this worker's shard with the asyncio engine."""
+    import main   # imported here so every worker builds its own Bus and timers
+    owns = shard_predicate(index, members)
+    main.shard = owns
+    subscribe_shard(main.bus, owns, table_ids, main.tables)
+    try:
+        asyncio.run(_serve(main, index, heartbeats, control, adopt, table_ids))
+    except KeyboardInterrupt:
+        pass   # Ctrl-C reaches the whole process group; exit and clear like main.py
+
+async def _serve(main, index, heartbeats, control, adopt, table_ids):
+    server = asyncio.ensure_future(main.main_async())
+    await asyncio.sleep(HEARTBEAT)
+    main.rebalance(main.shard, adopt)
+    while not server.done():
+        heartbeats.put({"worker": index, "pid": os.getpid(), "time": time.time(),
+                        "tables": sorted(main.tables)})
+        while True:
+            try:
+                cmd = control.get_nowait()
+            except queue.Empty:
+                break
+            if cmd[0] == "members":
+                owns = shard_predicate(index, cmd[1])
+                main.rebalance(owns, cmd[2])
+                subscribe_shard(main.bus, owns, table_ids, main.tables)
+            elif cmd[0] == "stop":
+                if not cmd[1]:
+                    # leaving the pool: the tables live on elsewhere, keep their topics
+                    for table_id in list(main.tables):
+                        main.drop_table(table_id)
+                server.cancel()
+                return
+        await asyncio.sleep(HEARTBEAT)
+    server.result()   # re-raise the crash so the exit code is non-zero
+
+class Supervisor:
+    """Starts, watches and restarts the worker pool.
+
+    `target` is the worker entry point, called as target(index, members,
+    heartbeats, control, adopt, table_ids); workers report on `heartbeats` with
+    dicts carrying at least "worker", and read commands from their own control
+    queue: ("members", members, table_ids) to rebalance, ("stop", clear) to exit.
+    """
+    def __init__(self, workers, target=worker_main, table_ids=None):
+        self.ctx = mp.get_context("spawn")
+        self.target = target
+        self.table_ids = table_ids
+        self.members = list(range(workers))
+        self.heartbeats = self.ctx.Queue()
+        self.procs = {}        # index -> (Process, control queue)
+        self.last_seen = {}
+        self.status = {}       # index -> last heartbeat dict
+        self.retired = []      # processes stopped by scale(), joined in stop()
+        self.restarts = collections.defaultdict(collections.deque)
+
+    def start(self):
+        for index in self.members:
+            self._spawn(index)
+
+    def _spawn(self, index):
+        control = self.ctx.Queue()
+        proc = self.ctx.Process(target=self.target, name=f"shard-{index}", daemon=True,
+                                args=(index, list(self.members), self.heartbeats, control,
+                                      self.known_tables(), self.table_ids))
+        proc.start()
+        self.procs[index] = (proc, control)
+        self.last_seen[index] = time.time()
+        log("SUPER", f"Worker {index} started (pid {proc.pid})")
+
+    def known_tables(self):
+        """Every table id some worker reported hosting."""
+        ids = set(self.table_ids or ())
+        for status in self.status.values():
+            ids.update(status.get("tables", ()))
+        return sorted(ids)
+
+    def poll(self, now=None):
+        """Drain heartbeats and restart dead or silent workers."""
+        while True:
+            try:
+                beat = self.heartbeats.get_nowait()
+            except queue.Empty:
+                break
+            index = beat["worker"]
+            if index in self.procs:
+                self.last_seen[index] = time.time()
+                self.status[index] = beat
+        now = time.time() if now is None else now
+        for index in list(self.members):
+            proc, _ = self.procs[index]
+            if proc.is_alive():
+                if now - self.last_seen[index] < HEARTBEAT_TIMEOUT:
+                    continue
+                log("SUPER", f"Worker {index} missed heartbeats, restarting", level="WARN")
+                proc.terminate()
+                proc.join(1)
+            else:
+                log("SUPER", f"Worker {index} exited (code {proc.exitcode}), restarting", level="WARN")
+            self._restart(index, now)
+
+    def _restart(self, index, now):
+        history = self.restarts[index]
+        history.append(now)
+        while history and now - history[0] > RESTART_WINDOW:
+            history.popleft()
+        if len(history) > MAX_RESTARTS and len(self.members) > 1:
+            log("SUPER", f"Worker {index} keeps crashing, moving its shard", level="ERROR")
+            self.members.remove(index)
+            del self.procs[index]
+            self.rebalance()
+            return
+        self._spawn(index)
+
+    def rebalance(self):
+        """Send the current membership to every worker."""
+        tables = self.known_tables()
+        for index in self.members:
+            self.procs[index][1].put(("members", list(self.members), tables))
+
+    def scale(self, workers):
+        """Grow or shrink the pool; only the tables of added/removed workers move."""
+        removed = self.members[workers:]
+        for index in removed:
+            self.members.remove(index)
+            proc, control = self.procs.pop(index)
+            control.put(("stop", False))
+            self.retired.append(proc)
+        added = []
+        while len(self.members) < workers:
+            index = max(list(self.members) + list(self.procs) + removed, default=-1) + 1
+            self.members.append(index)
+            added.append(index)
+        self.rebalance()
+        for index in added:
+            self._spawn(index)
+
+    def stop(self, clear=True):
+        for proc, control in self.procs.values():
+            control.put(("stop", clear))
+        for proc in [p for p, _ in self.procs.values()] + self.retired:
+            proc.join(HEARTBEAT * 3)
+            if proc.is_alive():
+                proc.terminate()
+
+    def run(self):
+        self.start()
+        log("SUPER", f"Supervising {len(self.members)} workers")
+        while True:
+            time.sleep(HEARTBEAT)
+            self.poll()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--tables", help="comma-separated table ids to pre-assign")
+    args = parser.parse_args()
+    table_ids = args.tables.split(",") if args.tables else None
+    supervisor = Supervisor(args.workers, table_ids=table_ids)
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
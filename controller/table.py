@@ -0,0 +1,801 @@
+import enum, random, json
+from game_fsm import Game
+from board import get_board
+from esp01 import ESP01Manager
+from timer_wheel import TimerWheel
+import logger, tracing
+
+class State(enum.IntEnum):
+    """Table states (Table.timer_state); snapshots store the number."""
+    LOBBY = 0
+    IDLE = 1
+    REFRESH_PENDING = 2
+    INITIATIVE_COOLDOWN = 3
+    WAIT_FOR_MOVE = 4
+    WAIT_CONFIRM = 5
+    TURN_NEXT = 6
+    ANNOUNCE = 7
+    COUNTDOWN = 8
+    WAITING_SIGNAL = 9
+    PLAYING = 10
+    GAME_OVER = 11
+    MEEPLE_DISCONNECT = 12
+
+    @classmethod
+    def load(cls, value):
+        """A state from a snapshot: its number, or its name in older journals."""
+        return cls[value] if isinstance(value, str) else cls(value)
+
+class Table:
+    """One physical table: its Game, ESP-01 meeples and all timer state.
+
+    The server owns one Table per topic prefix ("" for the legacy single-table
+    topics, "table/{id}/" otherwise) and drives it through the on_* handlers
+    and tick(). Nothing here blocks: every timeout is a handle on the (usually
+    server-wide) TimerWheel, and pauses are scheduled with pub_later().
+
+    timer_state is a State; what a state does is looked up in the handler
+    tables at the end of the class (ON_INPUT, ON_DEADLINE, ON_ENTER, ON_EXIT)
+    rather than tested state by state.
+    """
+    def __init__(self, bus, table_id="", timers=None, board=None):
+        self.table_id = table_id
+        self.board = board or get_board()
+        self.bus = bus
+        self.timers = timers or TimerWheel()
+        self.clock = self.timers.clock   # wall time, or a clock.VirtualClock
+        self.esp01_manager = ESP01Manager(bus)
+        self.game = None
+        self.n_players = 0
+        self.timer_start = 0
+        self.timer_state = State.LOBBY
+        self.reaction_trigger_time = 0
+        self.time_limit = 0
+        self.ignore_inputs_until = 0
+        self.disconnected_at = 0
+        self.meeple_disconnect_at = 0
+        self.meeple_disconnect_pid = -1
+        self.low_player_at = 0
+        self.prev_timer_state = State.IDLE
+        self.init_rolls = []
+        self.deferred = set()
+        self.state_timer = None
+        self.low_player_timer = None
+        self.meeple_timer = None
+        self.disconnect_timer = None
+
+    def log(self, module, msg, *args, level="INFO"):
+        logger.log(module, msg, *args, level=level, table=self.table_id)
+
+    def start(self):
+        """Announce the lobby on this table's display."""
+        self.bus.pub("game/status", "LOBBY")
+        self.bus.pub("game/display", {
+            "line1": "Players: 2 or 3?",
+            "line2": "Press 2 or 3",
+            "buttons": [2, 3]
+        })
+
+    def pub_later(self, delay, topic, payload):
+        timer = self.timers.schedule(delay, self._pub_deferred, topic, payload, owner=self)
+        self.deferred.add(timer)
+        return timer
+
+    def _pub_deferred(self, topic, payload):
+        self.deferred = {t for t in self.deferred if t.active}
+        self.bus.pub(topic, payload)
+
+    def cancel_deferred(self):
+        for timer in self.deferred:
+            timer.cancel()
+        self.deferred = set()
+
+    def start_minigame_sequence(self):
+
+        games = ["MASH", "REACTION", "TIME"]
+        self.game.current_minigame = random.choice(games)
+
+        if self.game.current_minigame == "TIME":
+            self.game.minigame_target = random.randint(3, 8) 
+
+        self.log("GAME", f"Minigame: {self.game.current_minigame}")
+
+        if self.game.current_minigame == "MASH":
+            self.bus.pub("game/display", {
+                "line1": "MASH Buttons!", 
+                "line2": "Most clicks wins",
+                "buttons": []  
+            })
+        elif self.game.current_minigame == "REACTION":
+            self.bus.pub("game/display", {
+                "line1": "Wait for signal!", 
+                "line2": "Press FAST!",
+                "buttons": []  
+            })
+        elif self.game.current_minigame == "TIME":
+            self.bus.pub("game/display", {
+                "line1": f"Guess {self.game.minigame_target}s!", 
+                "line2": "Press when ready",
+                "buttons": []  
+            })
+
+        self.set_state(State.ANNOUNCE)
+
+    def on_connection(self, msg):
+        status = msg.payload.decode()
+        self.log("MQTT", f"Connection Status: {status}")
+        if status == "DISCONNECTED":
+            if self.disconnected_at == 0:
+                self.disconnected_at = self.clock()
+                self.disconnect_timer = self.timers.schedule(self.DISCONNECT_TIMEOUT, self._on_disconnect_timeout, owner=self)
+                self.log("MQTT", "ESP32 Disconnected! Game Paused.", level="WARN")
+        elif status == "CONNECTED":
+            if self.disconnected_at > 0:
+                self.log("MQTT", f"ESP32 Reconnected after {self.clock() - self.disconnected_at:.1f}s")
+                self.disconnected_at = 0
+                if self.disconnect_timer:
+                    self.disconnect_timer.cancel()
+                    self.disconnect_timer = None
+
+            self.set_state(State.REFRESH_PENDING)
+
+    def on_register(self, msg):
+        self.esp01_manager.handle_register(json.loads(msg.payload.decode()))
+
+    def on_meeple_status(self, msg, mac):
+        status = msg.payload.decode()
+        pid, _ = self.esp01_manager.handle_status(mac, status)
+        if pid is not None:
+            if status == "OFFLINE":
+                self.meeple_disconnect_at = self.clock()
+                self.meeple_disconnect_pid = pid
+                self.set_state(State.MEEPLE_DISCONNECT)
+                if self.meeple_timer:
+                    self.meeple_timer.cancel()
+                self.meeple_timer = self.timers.schedule(self.MEEPLE_TIMEOUT, self._on_meeple_timeout, owner=self)
+                self.log("GAME", f"P{pid+1} meeple disconnected! Starting countdown.")
+            elif status == "ONLINE":
+                self.log("GAME", f"P{pid+1} meeple reconnected!")
+                connected = self.esp01_manager.connected_count()
+                if connected >= 2 and self.timer_state == State.MEEPLE_DISCONNECT:
+                    self.meeple_disconnect_at = 0
+                    self.meeple_disconnect_pid = -1
+                    self._drop_meeple_timer()
+                    # resume where we left off; timer_start is still the disconnect time
+                    self.timer_state = self.prev_timer_state
+                    self._arm_state_timer()
+                    if self.bus.last_display:
+                        self.bus.pub("game/display", json.loads(self.bus.last_display))
+                    else:
+                        self.bus.pub("game/display", {"line1": "Resumed!", "line2": "Play on...", "buttons": []})
+
+    def on_sensor(self, msg, pid):
+        try:
+            pid_idx = int(pid) - 1
+            state = msg.payload.decode()
+
+            if 0 <= pid_idx < 3:
+                self.log("SENSOR", "P%d: %s", pid_idx + 1, state)
+                if self.game:
+                    self.game.update_sensor(pid_idx, state)
+
+                    if self.timer_state == State.WAIT_FOR_MOVE:
+                        current_p_idx = self.game.turn_order[self.game.current_idx]
+                        if pid_idx == current_p_idx:
+                            current_p = self.game.players[current_p_idx]
+
+                            if state == "CLEAN":
+                                current_p.lifted_piece = True
+                                self.log("GAME", f"P{current_p.id+1} Lifted piece")
+
+                            if current_p.lifted_piece and state == "DETECTED":
+                                self.log("GAME", f"P{current_p.id+1} Placed piece")
+                                self.bus.pub("game/sound", "MOVE")
+                                self.bus.pub(f"esp01/player/{current_p.id+1}/led", "OFF")
+
+                                self.set_state(State.WAIT_CONFIRM)
+                                current_p.move_verified = True
+                                current_p.lifted_piece = False
+
+                                self.bus.pub("game/display", {
+                                    "line1": f"P{current_p.id+1} Moved!",
+                                    "line2": "Confirm?",
+                                    "buttons": [1, 2, 3]
+                                })
+
+        except Exception as e:
+            self.log("SENSOR", f"Error: {e}", level="ERROR")
+
+    def on_button(self, msg):
+        if self.disconnected_at > 0:
+             return
+        handler = self.ON_INPUT[self.timer_state]
+        if handler:
+            handler(self, msg)
+
+    def _confirm_move(self, msg):
+        self.log("GAME", "Move confirmed")
+        self.bus.pub("game/sound", "MOVE")
+        self.set_state(State.TURN_NEXT)
+
+    def _button(self, msg):
+        payload = json.loads(msg.payload.decode()) if msg.payload else {}
+        tracing.mark("decode")
+        button = payload.get("button")
+        if button is None:
+            self.log("MQTT", f"No button in payload: {payload}", level="WARN")
+        return button
+
+    def _choose_players(self, msg):
+        button = self._button(msg)
+        if button is None:
+            return
+        btn = int(button)
+        if btn in [2, 3]:
+            self.n_players = btn
+            self.game = Game(n_players=self.n_players, board=self.board)
+            self.esp01_manager.max_players = self.n_players
+            self.cancel_deferred()
+            self.log("GAME", f"Starting {self.n_players}-player game")
+            self.set_state(State.IDLE)
+
+            players_str = " ".join([f"P{i+1}:-" for i in range(self.n_players)])
+            self.bus.pub("game/display", {
+                "line1": "Roll initiative!",
+                "line2": players_str,
+                "buttons": list(range(1, self.n_players+1))
+            })
+
+    def _game_input(self, msg):
+        """A player's button in any state that hands input to the game phase."""
+        button = self._button(msg)
+        if button is None:
+            return
+
+        if self.clock() < self.ignore_inputs_until:
+             self.log("INPUT", "Ignored buffered input: %s", button)
+             return
+
+        player_id = int(button) - 1 if int(button) > 0 else int(button)
+
+        if not self.game:
+            self.log("INPUT", "Button %s ignored (game not started)", button)
+            return
+
+        if player_id < 0 or player_id >= len(self.game.players):
+            self.log("INPUT", f"Invalid button {button} -> player_id {player_id}", level="WARN")
+            return
+
+        self.log("INPUT", "Button %s pressed (P%d)", button, player_id + 1)
+
+        handler = self.ON_GAME_INPUT.get(self.game.state)
+        if handler:
+            handler(self, player_id, self.clock())
+
+    def _roll_initiative(self, player_id, now):
+        if any(x[0] == player_id for x in self.init_rolls):
+            return
+        val = random.randint(1, 6)
+        self.init_rolls.append((player_id, val, now))
+        self.bus.pub("game/sound", "ROLL")
+
+        roll_dict = {r[0]: r[1] for r in self.init_rolls}
+        summary = " ".join([f"P{i+1}:{roll_dict.get(i, '-')}" for i in range(len(self.game.players))])
+
+        rolled_ids = {r[0] for r in self.init_rolls}
+        remain = [pid for pid in range(len(self.game.players)) if pid not in rolled_ids]
+
+        if len(self.init_rolls) == len(self.game.players):
+            self.bus.pub("game/display", {
+                "line1": f"P{player_id+1} rolled: {val}",
+                "line2": summary
+            })
+            self.set_state(State.INITIATIVE_COOLDOWN)
+        else:
+            self.bus.pub("game/display", {
+                "line1": f"P{player_id+1} rolled: {val}",
+                "line2": summary,
+                "buttons": [p+1 for p in remain]
+            })
+
+    def _roll_move(self, player_id, now):
+        if not self.game.turn_order:
+            self.log("GAME", "Turn order not set yet")
+            return
+        if player_id != self.game.turn_order[self.game.current_idx]:
+            return
+        dice = random.randint(1, 3)
+        self.bus.pub("game/sound", "ROLL")
+
+        skipping = self.game.get_current_player().skip > 0
+        roll_log = self.game.move_player(dice)
+        self.log("GAME", roll_log)
+
+        if skipping:
+            # the meeple stays put: nothing to move or confirm
+            self.bus.pub("game/display", {
+                "line1": roll_log,
+                "line2": "Next turn...",
+                "buttons": []
+            })
+            self.set_state(State.TURN_NEXT)
+            return
+
+        self.bus.pub(f"esp01/player/{player_id+1}/led", "BLINK")
+
+        self.bus.pub("game/display", {
+            "line1": roll_log,
+            "line2": "Move Meeple!",
+            "buttons": []
+        })
+
+        if self.game.state == "GAME_OVER":
+             self.bus.pub("game/display", {
+                 "line1": roll_log,
+                 "line2": "GAME OVER!!",
+                 "buttons": []
+             })
+             self.bus.pub("game/sound", "WIN")
+             self.set_state(State.GAME_OVER)
+             return
+
+        self.set_state(State.WAIT_FOR_MOVE)
+
+    def _minigame_input(self, player_id, now):
+        p = self.game.players[player_id]
+
+        if self.game.current_minigame == "MASH":
+            p.mini_score += 1
+            scores = " ".join([f"{pl.id+1}:{int(pl.mini_score)}" for pl in self.game.players])
+            self.bus.pub("game/display", {
+                "line1": "MASH!!!",
+                "line2": scores,
+                "buttons": [1, 2, 3]
+            }, wait_ack=False, coalesce=True)
+
+        elif self.game.current_minigame == "REACTION":
+            if now < self.reaction_trigger_time:
+                p.mini_score = 999.0
+                p.mini_done = True
+            elif not p.mini_done:
+                p.mini_score = now - self.reaction_trigger_time
+                p.mini_done = True
+
+        elif self.game.current_minigame == "TIME":
+            elapsed = now - self.reaction_trigger_time
+            diff = abs(elapsed - self.game.minigame_target)
+            if not p.mini_done:
+                p.mini_score = diff
+                p.mini_done = True
+
+    # Deadlines of timed states, relative to timer_start (see _state_deadline).
+    STATE_TIMEOUTS = {
+        State.REFRESH_PENDING: 2.0,
+        State.INITIATIVE_COOLDOWN: 3.0,
+        State.ANNOUNCE: 3.0,
+        State.COUNTDOWN: 3.0,
+        State.TURN_NEXT: 0.0,
+        State.GAME_OVER: 10.0,
+    }
+    LOW_PLAYER_TIMEOUT = 30.0
+    MEEPLE_TIMEOUT = 30.0
+    DISCONNECT_TIMEOUT = 60.0
+    PAUSED_RETRY = 0.1
+
+    def set_state(self, state):
+        """Leave the current state and enter `state` (re-entering it if it is the
+        same), running their exit and enter handlers, and arm its timeout."""
+        prev = self.timer_state
+        if prev in self.ON_EXIT:
+            self.ON_EXIT[prev](self)
+        self.timer_state = state
+        self.timer_start = self.clock()
+        if state in self.ON_ENTER:
+            self.ON_ENTER[state](self, prev)
+        self._arm_state_timer()
+
+    def _await_move(self, prev):
+        self.game.get_current_player().move_verified = False
+        self.ignore_inputs_until = self.clock() + 1.0
+
+    def _remember_state(self, prev):
+        if prev != State.MEEPLE_DISCONNECT:
+            self.prev_timer_state = prev
+
+    def _drop_meeple_timer(self):
+        if self.meeple_timer:
+            self.meeple_timer.cancel()
+            self.meeple_timer = None
+
+    def _state_deadline(self, state):
+        if state == State.PLAYING:
+            return self.timer_start + self.time_limit
+        if state == State.WAITING_SIGNAL:
+            return self.reaction_trigger_time
+        timeout = self.STATE_TIMEOUTS.get(state)
+        return None if timeout is None else self.timer_start + timeout
+
+    def _arm_state_timer(self):
+        if self.state_timer:
+            self.state_timer.cancel()
+            self.state_timer = None
+        deadline = self._state_deadline(self.timer_state)
+        if deadline is not None:
+            self.state_timer = self.timers.schedule_at(deadline, self._on_state_timeout,
+                                                       self.timer_state, owner=self)
+
+    def _paused(self):
+        """ESP32 offline or too few meeples online: timed states hold still."""
+        if self.disconnected_at > 0:
+            return True
+        return bool(self.game) and self.timer_state != State.LOBBY and self.esp01_manager.connected_count() < 2
+
+    def _on_state_timeout(self, state):
+        if state != self.timer_state:
+            return
+        if self._paused():
+            self.state_timer = self.timers.schedule(self.PAUSED_RETRY, self._on_state_timeout, state, owner=self)
+            return
+        self.state_timer = None
+        self.ON_DEADLINE[state](self)
+
+    def _refresh_display(self):
+        self.log("MQTT", "Refreshing ESP32 display state")
+        if not self.game:
+             self.bus.pub("game/display", {
+                 "line1": "Players: 2 or 3?",
+                 "line2": "Press 2 or 3",
+                 "buttons": [2, 3]
+             })
+             self.set_state(State.LOBBY)
+        elif self.bus.last_display:
+             self.log("MQTT", f"Sending cached display")
+             self.bus.pub("game/display", json.loads(self.bus.last_display))
+             self.set_state(State.IDLE)
+        else:
+             self.log("MQTT", "No cache, sending initial screen")
+             self.bus.pub("game/display", {"line1": "Roll initiative!", "line2": "P1:- P2:- P3:-", "buttons": [1, 2, 3]})
+             self.set_state(State.IDLE)
+
+    def _start_turns(self):
+        self.game.set_turn_order(self.init_rolls)
+        self.bus.pub("game/status", "PLAYING")
+        first_player = self.game.turn_order[0] + 1
+        self.bus.pub("game/display", {
+            "line1": f"P{first_player} starts!",
+            "line2": f"Turn: P{first_player} ROLL!",
+            "buttons": [first_player]
+        })
+        self.set_state(State.IDLE)
+
+    def _next_turn(self):
+        if self.game.next_turn():
+            self.start_minigame_sequence()
+        else:
+            next_player = self.game.turn_order[self.game.current_idx] + 1
+            hp_summary = " ".join([f"{p.id+1}:{p.hp}" for p in self.game.players])
+            self.bus.pub("game/display", {
+                "line1": f"Turn: P{next_player} ROLL!",
+                "line2": hp_summary,
+                "buttons": [next_player]
+            })
+            self.set_state(State.IDLE)
+
+    def _countdown(self):
+        self.bus.pub("game/sound", "MINIGAME_START")
+        self.bus.pub("game/display", {"buttons": [1, 2, 3]})
+        self.set_state(State.COUNTDOWN)
+
+    def _start_minigame(self):
+        now = self.clock()
+        self.bus.pub("game/sound", "MINIGAME_START")
+        self.game.state = "MINIGAME_RUN"
+
+        if self.game.current_minigame == "MASH":
+            self.bus.pub("game/display", {"line1": "MASH!!!", "line2": "P1:0 P2:0 P3:0", "buttons": [1,2,3]})
+        elif self.game.current_minigame == "REACTION":
+            self.bus.pub("game/display", {"line1": "WAIT FOR IT...", "line2": "...", "buttons": [1,2,3]})
+        elif self.game.current_minigame == "TIME":
+            self.bus.pub("game/display", {"line1": "TIME IT!", "line2": f"Target: {self.game.minigame_target}s", "buttons": [1,2,3]})
+
+        if self.game.current_minigame == "REACTION":
+            delay = random.uniform(2, 4)
+            self.reaction_trigger_time = now + delay
+            self.set_state(State.WAITING_SIGNAL)
+
+        elif self.game.current_minigame == "TIME":
+            self.reaction_trigger_time = now
+            self.time_limit = self.game.minigame_target + 3.0
+            self.set_state(State.PLAYING)
+            self.bus.pub("game/display", {"line1": "Time Challenge", "line2": f"Aim: {self.game.minigame_target}s"})
+
+        else:
+            self.time_limit = 10.0
+            self.set_state(State.PLAYING)
+
+    def _signal(self):
+        self.bus.pub("game/sound", "SIGNAL")
+        self.time_limit = 3.0
+        self.set_state(State.PLAYING)
+
+    def _minigame_results(self):
+        self.log("GAME", "TIME'S UP!")
+        self.ignore_inputs_until = self.clock() + 5.0
+
+        self.bus.pub("game/sound", "WIN")
+        logs = self.game.apply_minigame_penalties()
+        self.log("GAME", f"Results: {logs}")
+
+        l1 = logs[0] if len(logs) > 0 else "Results"
+        l2 = logs[1] if len(logs) > 1 else ""
+        next_p = self.game.turn_order[self.game.current_idx] + 1
+
+        self.bus.pub("game/display", {
+            "line1": l1,
+            "line2": l2,
+            "buttons": []
+        })
+
+        self.pub_later(4.0, "game/display", {
+            "line1": f"Turn: P{next_p} ROLL!",
+            "line2": "Next: Roll!",
+            "buttons": [next_p]
+        })
+
+        self.set_state(State.IDLE)
+
+    def _back_to_lobby(self):
+        self.log("GAME", "Resetting to Lobby")
+        self.game = None
+        self.n_players = 0
+        self.init_rolls = []
+        self.esp01_manager.reset()
+        self.set_state(State.LOBBY)
+        self.bus.pub("game/status", "LOBBY")
+        self.bus.pub("game/display", {
+            "line1": "Players: 2 or 3?",
+            "line2": "Press 2 or 3",
+            "buttons": [2, 3]
+        })
+
+    def _on_low_player_timeout(self):
+        self.low_player_timer = None
+        if not self.game or self.timer_state == State.LOBBY:
+            self.low_player_at = 0
+            return
+        self.log("GAME", "Not enough players. Ending game.")
+        self.bus.pub("game/display", {
+            "line1": "Game Over",
+            "line2": "Not enough players",
+            "buttons": []
+        })
+        self.bus.pub("game/sound", "LOSE")
+        self.game = None
+        self.n_players = 0
+        self.set_state(State.LOBBY)
+        self.low_player_at = 0
+        self.esp01_manager.reset()
+        self.pub_later(3.0, "game/display", {
+            "line1": "Players: 2 or 3?",
+            "line2": "Press 2 or 3",
+            "buttons": [2, 3]
+        })
+
+    def _on_disconnect_timeout(self):
+        self.disconnect_timer = None
+        if self.disconnected_at == 0:
+            return
+        self.log("GAME", "Disconnection Timeout! Resetting Game...")
+        self.game = Game(n_players=3, board=self.board)
+        self.init_rolls = []
+        self.set_state(State.IDLE)
+        self.disconnected_at = 0
+        self.bus.pub("game/status", "RESET") 
+        self.bus.pub("game/display", {
+            "line1": "Resetting...", 
+            "line2": "New Game", 
+            "buttons": []
+        })
+        self.pub_later(2.0, "game/status", "INITIATIVE")
+        self.pub_later(2.0, "game/display", {"line1": "Roll Initiative!", "line2": "P1 P2 P3", "buttons": [1, 2, 3]})
+
+    def _on_meeple_timeout(self):
+        self.meeple_timer = None
+        if self.timer_state != State.MEEPLE_DISCONNECT:
+            return
+        if self.disconnected_at > 0 or (self.game and self.esp01_manager.connected_count() < 2):
+            self.meeple_timer = self.timers.schedule(self.PAUSED_RETRY, self._on_meeple_timeout, owner=self)
+            return
+        self.log("GAME", f"P{self.meeple_disconnect_pid+1} meeple timeout! Continuing without player.")
+        self.meeple_disconnect_at = 0
+        self.meeple_disconnect_pid = -1
+
+        if not self.game:
+            self.set_state(State.LOBBY)
+            self.bus.pub("game/display", {
+                "line1": "Players: 2 or 3?",
+                "line2": "Press 2 or 3",
+                "buttons": [2, 3]
+            })
+        else:
+            self.set_state(State.IDLE)
+            next_p = self.game.turn_order[self.game.current_idx] + 1
+            self.bus.pub("game/display", {
+                "line1": "Game Continues!",
+                "line2": f"P{next_p} turn",
+                "buttons": [next_p]
+            })
+
+    def tick(self, now):
+        """Watch meeple count and refresh countdown screens; called every TICK seconds.
+
+        Timeouts themselves live on the timer wheel and fire from timers.advance().
+        Returns True when the table's state changed, not just its display.
+        """
+        changed = False
+        if self.game and self.timer_state != State.LOBBY:
+            connected = self.esp01_manager.connected_count()
+            if connected < 2:
+                if self.low_player_at == 0:
+                    self.low_player_at = now
+                    self.low_player_timer = self.timers.schedule(self.LOW_PLAYER_TIMEOUT, self._on_low_player_timeout, owner=self)
+                    self.log("GAME", f"Only {connected} players connected! Need 2 to continue.")
+                    changed = True
+                else:
+                    remaining = max(0, 30 - int(now - self.low_player_at))
+                    self.bus.pub("game/display", {
+                        "line1": f"Need 2 players!",
+                        "line2": f"Ending in {remaining}s",
+                        "buttons": []
+                    }, cache=False, coalesce=True)
+                return changed
+            else:
+                if self.low_player_at > 0:
+                    self.log("GAME", "Player count recovered!")
+                    self.low_player_at = 0
+                    changed = True
+                    if self.low_player_timer:
+                        self.low_player_timer.cancel()
+                        self.low_player_timer = None
+                    if self.bus.last_display:
+                         self.bus.pub("game/display", json.loads(self.bus.last_display))
+                    else:
+                         self.bus.pub("game/display", {"line1": "Resumed!", "line2": "Play on...", "buttons": []})
+
+        if self.disconnected_at > 0:
+            return changed
+
+        if self.timer_state == State.MEEPLE_DISCONNECT:
+            elapsed = now - self.meeple_disconnect_at
+            remaining = max(0, 30 - int(elapsed))
+
+            self.bus.pub("game/display", {
+                "line1": f"P{self.meeple_disconnect_pid+1} Offline!",
+                "line2": f"Reconnect: {remaining}s",
+                "buttons": []
+            }, cache=False, coalesce=True)
+        return changed
+
+    def next_deadline(self):
+        """Earliest time at which tick() has work to do, or None if only input or a
+        timer can move this table forward. Used by the asyncio engine instead of polling."""
+        now = self.clock()
+
+        if self.game and self.timer_state != State.LOBBY:
+            connected = self.esp01_manager.connected_count()
+            if connected < 2:
+                if self.low_player_at == 0:
+                    return now
+                # countdown display refreshes once per second
+                return self.low_player_at + int(now - self.low_player_at) + 1
+            if self.low_player_at > 0:
+                return now
+
+        if self.disconnected_at > 0:
+            return None
+
+        if self.timer_state == State.MEEPLE_DISCONNECT:
+            return self.meeple_disconnect_at + int(now - self.meeple_disconnect_at) + 1
+        return None
+
+    # Plain fields carried by snapshot(); timers are rebuilt from them in restore().
+    SNAPSHOT_FIELDS = (
+        "n_players", "timer_start", "timer_state", "prev_timer_state", "reaction_trigger_time",
+        "time_limit", "ignore_inputs_until", "disconnected_at", "meeple_disconnect_at",
+        "meeple_disconnect_pid", "low_player_at", "init_rolls",
+    )
+
+    def snapshot(self):
+        """JSON-ready copy of this table's state, for a standby or the journal."""
+        snap = {name: getattr(self, name) for name in self.SNAPSHOT_FIELDS}
+        snap["init_rolls"] = [list(r) for r in self.init_rolls]
+        snap["table_id"] = self.table_id
+        snap["game"] = self.game.to_dict() if self.game else None
+        snap["esp01"] = self.esp01_manager.to_dict()
+        snap["deferred"] = [[t.deadline, *t.args] for t in self.deferred if t.active]
+        snap["last_display"] = self.bus.last_display
+        return snap
+
+    def restore(self, snap, republish=True):
+        """Take over the state in `snap`: re-arm every pending timeout at its original
+        deadline and, with republish, put the last display back on the base station."""
+        self.close()
+        for name in self.SNAPSHOT_FIELDS:
+            setattr(self, name, snap[name])
+        self.timer_state = State.load(self.timer_state)
+        self.prev_timer_state = State.load(self.prev_timer_state)
+        self.init_rolls = [tuple(r) for r in snap["init_rolls"]]
+        self.game = Game.from_dict(snap["game"]) if snap["game"] else None
+        self.esp01_manager.restore(snap["esp01"])
+
+        self._arm_state_timer()
+        if self.disconnected_at > 0:
+            self.disconnect_timer = self.timers.schedule_at(self.disconnected_at + self.DISCONNECT_TIMEOUT,
+                                                            self._on_disconnect_timeout, owner=self)
+        if self.low_player_at > 0:
+            self.low_player_timer = self.timers.schedule_at(self.low_player_at + self.LOW_PLAYER_TIMEOUT,
+                                                            self._on_low_player_timeout, owner=self)
+        if self.timer_state == State.MEEPLE_DISCONNECT:
+            self.meeple_timer = self.timers.schedule_at(self.meeple_disconnect_at + self.MEEPLE_TIMEOUT,
+                                                        self._on_meeple_timeout, owner=self)
+        for deadline, topic, payload in snap["deferred"]:
+            self.deferred.add(self.timers.schedule_at(deadline, self._pub_deferred, topic, payload, owner=self))
+        if republish and snap["last_display"]:
+            self.bus.pub("game/display", json.loads(snap["last_display"]))
+
+    def close(self):
+        """Cancel every pending timer; the table is being dropped from this server."""
+        self.cancel_deferred()
+        for timer in (self.state_timer, self.low_player_timer, self.meeple_timer, self.disconnect_timer):
+            if timer:
+                timer.cancel()
+        self.state_timer = self.low_player_timer = self.meeple_timer = self.disconnect_timer = None
+
+    def clear_retained(self):
+        """Clear this table's retained topics (server shutdown)."""
+        self.bus.pub("game/status", "OFFLINE", retain=True)
+        self.bus.pub("game/display", {
+            "line1": "Server Offline",
+            "line2": "Reconnecting...",
+            "buttons": []
+        }, retain=True)
+
+        for i in range(1, 4):
+            self.bus.pub(f"esp01/player/{i}/sensor", "", retain=True)
+            self.bus.pub(f"esp01/player/{i}/led", "", retain=True)
+
+        for mac in list(self.esp01_manager.assignments.keys()):
+            self.bus.pub(f"esp01/{mac}/config", "", retain=True)
+            self.bus.pub(f"esp01/{mac}/status", "", retain=True)
+
+    # Handler tables, by state. ON_INPUT: a button press (None: ignored);
+    # ON_DEADLINE: the state's timeout; ON_ENTER(prev) / ON_EXIT: set_state().
+    # Game input is dispatched once more on the game's phase.
+    ON_INPUT = dict.fromkeys(State, _game_input)
+    ON_INPUT.update({
+        State.LOBBY: _choose_players,
+        State.INITIATIVE_COOLDOWN: None,
+        State.WAIT_CONFIRM: _confirm_move,
+    })
+    ON_GAME_INPUT = {
+        "INITIATIVE": _roll_initiative,
+        "TURN": _roll_move,
+        "MINIGAME_RUN": _minigame_input,
+    }
+    ON_DEADLINE = {
+        State.REFRESH_PENDING: _refresh_display,
+        State.INITIATIVE_COOLDOWN: _start_turns,
+        State.TURN_NEXT: _next_turn,
+        State.ANNOUNCE: _countdown,
+        State.COUNTDOWN: _start_minigame,
+        State.WAITING_SIGNAL: _signal,
+        State.PLAYING: _minigame_results,
+        State.GAME_OVER: _back_to_lobby,
+    }
+    ON_ENTER = {
+        State.WAIT_FOR_MOVE: _await_move,
+        State.MEEPLE_DISCONNECT: _remember_state,
+    }
+    ON_EXIT = {
+        State.MEEPLE_DISCONNECT: _drop_meeple_timer,
+    }
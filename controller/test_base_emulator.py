@@ -0,0 +1,30 @@
+import types
+import base_emulator
+from memory_broker import MemoryBroker, MemoryClient
+
+def test_eight_scenarios_pass():
+    """Las ocho pruebas de test_mode.py pasan contra la base emulada, con latencias medidas."""
+    harness = base_emulator.run_scenarios(rounds=2, ack_delay=0.002, jitter=0.002, seed=1)
+    assert len(harness.results) == 8
+    for name, (passed, rounds, samples) in harness.results.items():
+        assert passed == rounds == 2, name
+        assert samples and all(s >= 0 for s in samples), name
+    assert "p99 ms" in harness.report()
+
+def test_lost_acks_fail_the_ack_check():
+    """Si la base pierde todos los ACK, la prueba de ACK falla y se cuentan los perdidos."""
+    harness = base_emulator.run_scenarios([6], rounds=1, drop=1.0, seed=1)
+    assert harness.results["ACK Received"][:2] == [0, 1]
+    assert harness.base.acks == 0 and harness.base.dropped == 1
+
+def test_cleared_retained_topics_are_ignored():
+    """Los payloads vacíos de clear_retained() no rompen el callback de la base ni del arnés."""
+    base = base_emulator.BaseEmulator(MemoryClient(MemoryBroker(), "base"))
+    try:
+        base._on_message(None, None, types.SimpleNamespace(topic="game/display", payload=b""))
+        assert base.frames == [] and base.acks == 0
+    finally:
+        base.stop()
+    harness = base_emulator.Harness(None, base)
+    harness.on_message(None, None, types.SimpleNamespace(topic="base/button", payload=b""))
+    assert harness.buttons == []
@@ -0,0 +1,61 @@
+import json
+import pytest
+import board
+from board import BOARD_SIZE, CLASSIC, Board, get_tile_effect, load_boards
+from game_fsm import Game
+
+@pytest.fixture
+def registry():
+    saved = dict(board.BOARDS), dict(board.TABLE_BOARDS), board.default_board
+    yield
+    board.BOARDS.clear(); board.BOARDS.update(saved[0])
+    board.TABLE_BOARDS.clear(); board.TABLE_BOARDS.update(saved[1])
+    board.default_board = saved[2]
+
+def test_classic_matches_tile_effects():
+    """El tablero clásico compilado da el mismo efecto que get_tile_effect en cada casilla."""
+    assert [CLASSIC.effect(t) for t in range(BOARD_SIZE + 2)] == [get_tile_effect(t) for t in range(BOARD_SIZE + 2)]
+    assert CLASSIC.effect(6) == ("dmg_2", -2) and CLASSIC.effect(BOARD_SIZE) == ("goal", 0)
+
+def test_tile_kinds():
+    """Cada casilla recibe el tipo según sus efectos."""
+    b = Board("x", 10, {1: {"hp": -3}, 2: {"teleport": 7}, 3: {"skip": 2}, 4: {"type": "heal_1", "skip": 1}})
+    assert [board.TILE_TYPES[k] for k in b.kind[:6]] == ["normal", "dmg", "teleport", "skip", "multi", "normal"]
+    assert b.jump[2] == 7 and b.skip[3] == 2 and b.hp[4] == 1
+
+def test_bad_tiles_rejected():
+    """Casillas fuera del tablero o efectos desconocidos dan error."""
+    for tiles in ({10: "dmg_1"}, {3: "lava"}, {3: {"teleport": 11}}, {3: {"swap": 1}}):
+        with pytest.raises(ValueError):
+            Board("bad", 10, tiles)
+
+def test_load_json_and_toml(tmp_path, registry):
+    """Se cargan varios tableros desde JSON y TOML y se asignan a mesas."""
+    path = tmp_path / "boards.json"
+    path.write_text(json.dumps({"boards": {"long": {"size": 40, "tiles": {"5": {"teleport": 12}}}},
+                                "tables": {"t1": "long"}}))
+    assert load_boards(path) == ["long"]
+    toml = tmp_path / "boards.toml"
+    toml.write_text('default = "short"\n[boards.short]\nsize = 8\n[boards.short.tiles]\n"3" = "dmg_2"\n')
+    assert load_boards(toml) == ["short"]
+    assert board.board_for("t1").jump[5] == 12
+    assert board.board_for("t2").name == "short" and board.board_for("t2").hp[3] == -2
+
+def test_teleport_and_skip_in_game():
+    """El teletransporte mueve tras el efecto y saltar turno no mueve."""
+    game = Game(n_players=1, board=Board("x", 20, {3: {"teleport": 9, "skip": 1}, 12: {"teleport": 20}}))
+    game.turn_order = [0]
+    p = game.players[0]
+    game.move_player(3)
+    assert (p.pos, p.skip) == (9, 1)
+    assert game.move_player(2) == "P1 skips turn" and p.pos == 9
+    game.move_player(3)
+    assert game.winner == 0 and game.state == "GAME_OVER"
+
+def test_snapshot_keeps_board(registry):
+    """La instantánea guarda el nombre del tablero y lo recupera."""
+    board.BOARDS["long"] = long = Board("long", 30, {})
+    game = Game(n_players=2, board=long)
+    data = json.loads(json.dumps(game.to_dict()))
+    assert data["board"] == "long"
+    assert Game.from_dict(data).board is long
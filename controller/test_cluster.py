@@ -0,0 +1,84 @@
+import json, os, subprocess, sys, time
+import paho.mqtt.client as mqtt
+from paho.mqtt.enums import CallbackAPIVersion
+from broker import BrokerThread
+from cluster import Cluster
+from supervisor import shard_owner
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TABLES = [str(t) for t in range(1, 9)]
+
+def wait_for(cond, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+def start_node(port, node):
+    return subprocess.Popen(
+        [sys.executable, "main.py", "--engine", "asyncio", "--mqtt5",
+         "--node", str(node), "--nodes", "2", "--broker", f"127.0.0.1:{port}"],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def test_forward_only_foreign_tables():
+    """Un nodo sólo reenvía los mensajes de mesas que pertenecen a otro nodo."""
+    c = Cluster(0, 2)
+    for t in TABLES:
+        expected = None if shard_owner(t, [0, 1]) == 0 else "node/1/in/"
+        assert c.forward_to(f"table/{t}/base/button") == expected
+
+def test_fixed_tables_subscribe_only_own_share():
+    """Con lista de mesas fija cada nodo se suscribe, compartido, sólo a las suyas."""
+    filters = Cluster(1, 2, table_ids=TABLES).filters()
+    mine = [t for t in TABLES if shard_owner(t, [0, 1]) == 1]
+    assert f"$share/game/table/{mine[0]}/base/button" in filters
+    assert not any("table/+/" in f for f in filters)
+    assert filters[-1] == "node/1/in/#"
+
+def test_two_nodes_split_tables_without_duplicates():
+    """Dos servidores MQTT 5 contra el broker local: cada mesa la atiende sólo su nodo."""
+    broker = BrokerThread()
+    published = []
+    broker.broker.on_publish = lambda sender, topic, payload: published.append((sender, topic, payload))
+    nodes = [start_node(broker.port, n) for n in (0, 1)]
+    device = mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2, client_id="base")
+
+    def on_display(client, userdata, msg):
+        seq = json.loads(msg.payload).get("seq")
+        client.publish(msg.topic.rsplit("/", 1)[0] + "/ack", json.dumps({"seq": seq}))
+    device.on_message = on_display
+    try:
+        assert wait_for(lambda: {"GameServer_0", "GameServer_1"} <= set(broker.broker.sessions))
+        assert wait_for(lambda: any(t == "game/display" for _, t, _ in published))
+        device.connect("127.0.0.1", broker.port)
+        device.subscribe("table/+/game/display")
+        device.loop_start()
+        time.sleep(0.2)
+        for t in TABLES:   # a meeple's registration opens its table
+            device.publish(f"table/{t}/esp01/register", json.dumps({"mac": f"M{t}"}))
+        assert wait_for(lambda: {t.split("/")[1] for _, t, _ in published
+                                 if t.startswith("table/") and t.endswith("game/display")} >= set(TABLES))
+        for t in TABLES:
+            device.publish(f"table/{t}/base/button", json.dumps({"button": 3}))
+
+        def rolls():
+            return [(s, t) for s, t, p in published
+                    if t.endswith("game/display") and b"Roll initiative" in p]
+        assert wait_for(lambda: len(rolls()) >= len(TABLES))
+        time.sleep(0.3)
+        assert len(rolls()) == len(TABLES)
+        for sender, topic in rolls():
+            table_id = topic.split("/")[1]
+            assert sender == f"GameServer_{shard_owner(table_id, [0, 1])}"
+        assert {s for s, _ in rolls()} == {"GameServer_0", "GameServer_1"}
+        assert any(t.startswith("node/") for _, t, _ in published)   # misdirected inputs were forwarded
+    finally:
+        device.loop_stop()
+        device.disconnect()
+        for proc in nodes:
+            proc.terminate()
+        for proc in nodes:
+            proc.wait(10)
+        broker.stop()
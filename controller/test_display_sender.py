@@ -0,0 +1,204 @@
+import json, threading, time
+from concurrent.futures import Future
+from display_sender import DisplaySender, FlowState, Frame, parse_ack_seq
+
+T = "game/display"
+
+def make_sender(max_window=1):
+    sent = []
+    sender = DisplaySender(lambda t, p, r: sent.append(p), max_window=max_window)
+    sender.start()
+    return sender, sent
+
+def wait_for(cond, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+def make_frame(payload=None, coalesce=False):
+    frame = Frame(payload or {}, False, True, coalesce)
+    frame.futures.append(Future())
+    return frame
+
+# ==========================================
+# 1. TEST DE ENVÍO Y ACK
+# ==========================================
+
+def test_submit_does_not_block():
+    """submit() vuelve inmediatamente aunque nadie envíe ACK."""
+    sender, sent = make_sender()
+    handles = [sender.submit(T, {"line1": f"f{i}"}) for i in range(5)]
+    assert not handles[-1].done()
+    sender.stop(timeout=0.1)
+
+def test_ack_resolves_handle():
+    """El ACK libera el frame en vuelo y resuelve su handle a True."""
+    sender, sent = make_sender()
+    h1 = sender.submit(T, {"line1": "A"})
+    h2 = sender.submit(T, {"line1": "B"})
+    threading.Timer(0.05, sender.on_ack, (T,)).start()
+    assert h1.result(timeout=1) is True
+    wait_for(lambda: len(sent) == 2)
+    sender.on_ack(T)
+    assert h2.result(timeout=1) is True
+    assert [json.loads(p)["line1"] for p in sent] == ["A", "B"]
+    sender.stop()
+
+def test_timeout_and_order():
+    """Sin ACK, cada frame expira (False) y el orden se mantiene."""
+    sender, sent = make_sender()
+    sender.flow(T).rto = 0.02
+    handles = [sender.submit(T, {"n": n}) for n in range(3)]
+    assert [h.result(timeout=2) for h in handles] == [False, False, False]
+    assert [json.loads(p)["n"] for p in sent] == [0, 1, 2]
+    sender.stop()
+
+def test_no_ack_frames_and_flush():
+    """wait_ack=False no espera ACK; flush() espera a que la cola se vacíe."""
+    sender, sent = make_sender()
+    h = sender.submit(T, {"line1": "MASH"}, wait_ack=False)
+    assert sender.flush(timeout=1)
+    assert h.result() is None
+    assert len(sent) == 1
+    assert sender.flows[T].last_frame is None
+    sender.stop()
+
+# ==========================================
+# 2. TEST DE SECUENCIA, VENTANA Y RTT
+# ==========================================
+
+def test_parse_ack_seq():
+    assert parse_ack_seq(b"") is None
+    assert parse_ack_seq(b"OK") is None
+    assert parse_ack_seq(b"7") == 7
+    assert parse_ack_seq(b'{"seq": 3}') == 3
+
+def test_frames_carry_sequence_numbers():
+    """Cada frame lleva un seq creciente; el caché no lo incluye."""
+    sender, sent = make_sender(max_window=4)
+    for i in range(3):
+        sender.submit(T, {"line1": "x"}, wait_ack=False)
+    sender.flush(timeout=1)
+    assert [json.loads(p)["seq"] for p in sent] == [0, 1, 2]
+    sender.submit(T, {"line1": "cached"})
+    assert "seq" not in json.loads(sender.flows[T].last_frame)
+    sender.stop(timeout=0.1)
+
+def test_cumulative_ack_and_window_growth():
+    """Un ACK con seq confirma todo lo anterior y abre la ventana (AIMD)."""
+    flow = FlowState(max_window=4)
+    frames = [make_frame(), make_frame()]
+    flow.inflight[flow.take_seq()] = (0.0, frames[0])
+    flow.inflight[flow.take_seq()] = (0.01, frames[1])
+    assert flow.on_ack(1, 0.11) == 2
+    assert [f.futures[0].result() for f in frames] == [True, True]
+    assert not flow.inflight
+    assert flow.cwnd > 2
+    assert flow.srtt is not None and flow.rto < 0.5
+
+def test_timeout_halves_window():
+    flow = FlowState(max_window=8)
+    flow.cwnd = 6.0
+    frame = make_frame()
+    flow.inflight[flow.take_seq()] = (0.0, frame)
+    assert flow.expire(1.0) == 1
+    assert frame.futures[0].result() is False
+    assert flow.cwnd == 3.0
+    assert flow.rto == 1.0
+
+def test_late_ack_takes_no_rtt_sample():
+    """Un ACK sin seq que llega tras el timeout de su frame no mide el RTT (regla de Karn)."""
+    flow = FlowState()
+    first, second = make_frame(), make_frame()
+    flow.inflight[flow.take_seq()] = (0.0, first)
+    assert flow.expire(0.5) == 1
+    flow.inflight[flow.take_seq()] = (0.6, second)
+    assert flow.on_ack(None, 0.61) == 1   # meant for the expired frame
+    assert second.futures[0].result() is True
+    assert flow.srtt is None and flow.rto == 1.0
+
+def test_ack_of_frame_sent_before_timeout_takes_no_sample():
+    """Tampoco mide el RTT el ACK de un frame enviado antes del último timeout."""
+    flow = FlowState(max_window=4)
+    first, second = make_frame(), make_frame()
+    flow.inflight[flow.take_seq()] = (0.0, first)
+    flow.inflight[flow.take_seq()] = (0.4, second)
+    assert flow.expire(0.5) == 1
+    assert flow.on_ack(1, 0.6) == 1
+    assert flow.srtt is None
+    third = make_frame()
+    flow.inflight[flow.take_seq()] = (0.7, third)
+    flow.on_ack(2, 0.75)
+    assert abs(flow.srtt - 0.05) < 1e-9
+
+def test_pipelining_sends_up_to_window():
+    """Con ventana abierta se envían varios frames sin esperar ACK."""
+    sender, sent = make_sender(max_window=4)
+    sender.flow(T).cwnd = 4.0
+    handles = [sender.submit(T, {"n": n}) for n in range(4)]
+    wait_for(lambda: len(sent) == 4)
+    assert len(sent) == 4
+    sender.on_ack(T, b'{"seq": 3}')
+    assert all(h.result(timeout=1) for h in handles)
+    sender.stop()
+
+# ==========================================
+# 3. TEST DE COALESCENCIA (MASH)
+# ==========================================
+
+def test_coalesce_merges_queued_frames():
+    """Los frames coalescibles en cola se fusionan campo a campo (gana el último)."""
+    flow = FlowState()
+    flow.enqueue(Frame({"line1": "MASH!!!", "line2": "1:1"}, False, False, True))
+    flow.enqueue(Frame({"line2": "1:2"}, False, False, True))
+    flow.enqueue(Frame({"line2": "1:3", "buttons": [1]}, False, False, True))
+    assert len(flow.queue) == 1
+    assert flow.queue[0].payload == {"line1": "MASH!!!", "line2": "1:3", "buttons": [1]}
+    assert (flow.submitted, flow.coalesced) == (3, 2)
+
+def test_coalesce_keeps_order_with_normal_frames():
+    """Un frame normal no se fusiona y mantiene su posición."""
+    flow = FlowState()
+    flow.enqueue(Frame({"line1": "a"}, False, False, True))
+    flow.enqueue(Frame({"line1": "b"}, False, True, False))
+    flow.enqueue(Frame({"line1": "c"}, False, False, True))
+    assert [f.payload["line1"] for f in flow.queue] == ["a", "b", "c"]
+
+def test_coalesce_rate_limits_and_delivers_final_state():
+    """Una ráfaga de pulsaciones se envía a FPS limitados y el último estado llega."""
+    sender, sent = make_sender()
+    sender.frame_interval = 0.05
+    handles = [sender.submit(T, {"line2": f"1:{n}"}, wait_ack=False, coalesce=True) for n in range(1, 201)]
+    assert sender.flush(timeout=2)
+    assert all(h.done() for h in handles)
+    assert json.loads(sent[-1])["line2"] == "1:200"
+    stats = sender.stats()
+    assert stats["submitted"] == 200
+    assert stats["sent"] == len(sent) < 20
+    assert stats["coalesced"] == 200 - stats["sent"]
+    sender.stop()
+
+class RecordingClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, retain=False):
+        self.published.append((topic, payload, retain))
+
+def test_retained_clear_not_overtaken_by_queued_frame():
+    """Un borrado retenido del display sale detrás de los frames encolados antes, no delante."""
+    from mqtt_bus import Bus
+    client = RecordingClient()
+    bus = Bus(on_msg=None, client=client)
+    topic = "table/1/game/display"
+    bus.pub(topic, {"line1": "x"})
+    bus.display.poll()
+    bus.pub(topic, {"line1": "Server Offline"}, retain=True)   # blocked by the unacked window
+    bus.pub(topic, "", retain=True)
+    bus.pub("table/1/game/sound", "WIN")
+    bus.display.poll()
+    assert [p for _, p, _ in client.published] == [json.dumps({"line1": "x", "seq": 0}), "WIN"]
+    bus.display.on_ack(topic, b'{"seq": 0}')
+    bus.display.poll()
+    assert client.published[-2:] == [(topic, json.dumps({"line1": "Server Offline", "seq": 1}), True), (topic, "", True)]
+    assert bus.last_frame(topic) == json.dumps({"line1": "Server Offline"})
@@ -0,0 +1,45 @@
+import asyncio, time
+from engine import AsyncEngine
+from table import State, Table
+from test_table import RecordingBus, start_game
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_idle_table_has_no_deadline():
+    """En el lobby no hay nada que esperar: la mesa no se despierta."""
+    assert Table(RecordingBus()).next_deadline() is None
+
+def test_engine_fires_state_deadline():
+    """ANNOUNCE pasa a COUNTDOWN al vencer su timer, sin sondeo cada 100ms."""
+    async def scenario():
+        t = Table(RecordingBus())
+        start_game(t, 2)
+        t.game.set_turn_order(t.init_rolls)
+        t.set_state(State.ANNOUNCE)
+        t.timer_start -= 2.95
+        t._arm_state_timer()
+        engine = AsyncEngine({"": t}, t.timers)
+        task = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.2)
+        task.cancel()
+        return t, engine
+    t, engine = run(scenario())
+    assert t.timer_state == State.COUNTDOWN
+    assert engine.ticks == 0
+
+def test_input_reschedules_table():
+    """Un cambio de estado (aquí una publicación diferida) registra el nuevo plazo en el motor."""
+    async def scenario():
+        t = Table(RecordingBus())
+        engine = AsyncEngine({"": t}, t.timers)
+        task = asyncio.create_task(engine.run())
+        await asyncio.sleep(0)
+        t.pub_later(0.05, "game/sound", "ROLL")
+        engine.reschedule(t)
+        await asyncio.sleep(0.15)
+        task.cancel()
+        return t
+    t = run(scenario())
+    assert not t.deferred
+    assert t.bus.sent[-1] == ("game/sound", "ROLL")
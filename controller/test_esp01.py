@@ -0,0 +1,47 @@
+from esp01 import ESP01Manager
+from journal import Journal
+from table import Table
+from test_table import RecordingBus, msg
+
+def test_slots_and_online_count():
+    """Las plazas se dan de menor a mayor y el contador de conectados sigue cada estado."""
+    m = ESP01Manager(RecordingBus(), max_players=3)
+    m.handle_status("a", "ONLINE")   # los meeples anuncian ONLINE antes de registrarse
+    for mac in ("a", "b", "c", "d"):
+        m.handle_register({"mac": mac})
+    assert m.assignments == {"a": 0, "b": 1, "c": 2} and m.assigned_ids == {0, 1, 2}
+    m.handle_register({"mac": "b"})
+    assert m.assignments["b"] == 1 and m.connected_count() == 3
+    m.handle_status("b", "OFFLINE")
+    m.handle_status("b", "OFFLINE")
+    m.handle_status("d", "ONLINE")   # sin plaza: no cuenta
+    assert m.connected_count() == 2
+    m.handle_status("b", "ONLINE")
+    m.handle_status("b", "ONLINE")
+    assert m.connected_count() == 3
+    m.reset()
+    m.handle_register({"mac": "d"})
+    assert m.assignments == {"d": 0} and m.connected_count() == 1
+
+def test_assignments_survive_restart(tmp_path):
+    """Tras reiniciar desde el diario, los meeples conservan su plaza sin registrarse de nuevo."""
+    path = str(tmp_path / "game.journal")
+    t = Table(RecordingBus(), "7")
+    journal = Journal(path)
+    journal.start()
+    t.on_button(msg({"button": 3}))
+    for i in range(2):
+        t.on_register(msg({"mac": f"7-{i}"}))
+        journal.record(t)
+    t.on_meeple_status(msg("OFFLINE"), "7-1")
+    journal.record(t)
+    journal.stop()
+
+    restored = Table(RecordingBus(), "7")
+    restored.restore(Journal(path).load()["7"])
+    m = restored.esp01_manager
+    assert m.assignments == {"7-0": 0, "7-1": 1} and m.connected_count() == 1
+    restored.on_meeple_status(msg("ONLINE"), "7-1")
+    assert m.connected_count() == 2
+    restored.on_register(msg({"mac": "7-2"}))
+    assert m.assignments["7-2"] == 2
@@ -0,0 +1,40 @@
+import asyncio
+import fleet_sim
+from broker import BrokerThread
+
+def test_memory_fleet_registers_and_plays():
+    """Con el broker en memoria, cada meeple recibe un jugador distinto de su mesa y las bases juegan."""
+    args = fleet_sim.parse_args(["--memory", "--tables", "4", "--duration", "2", "--ramp", "0",
+                                 "--press-interval", "0.1", "--seed", "1"])
+    fleet, devices = asyncio.run(fleet_sim.simulate(args))
+    meeples = [d for d in devices if isinstance(d, fleet_sim.Meeple)]
+    assert len(fleet.stats.registered) == 12
+    for prefix in {m.prefix for m in meeples}:
+        topics = [m.sensor_topic for m in meeples if m.prefix == prefix]
+        assert len(set(topics)) == 3 and all(t.startswith(prefix) for t in topics)
+    assert fleet.stats.display and fleet.stats.unanswered == 0
+    assert fleet.stats.acks > 0
+    assert "p999" in fleet.report(devices)
+
+def test_aio_link_will_on_drop():
+    """El cliente asyncio sobre TCP deja su último deseo retenido al perder la conexión."""
+    broker = BrokerThread()
+    received = []
+    async def run():
+        watcher = fleet_sim.AioLink("127.0.0.1", broker.port, "watcher")
+        watcher.on_message = lambda topic, payload: received.append((topic, payload))
+        await watcher.start()
+        watcher.subscribe("esp01/+/status")
+        meeple = fleet_sim.AioLink("127.0.0.1", broker.port, "MAC_1")
+        await meeple.start(will=("esp01/MAC_1/status", "OFFLINE", True))
+        meeple.publish("esp01/MAC_1/status", "ONLINE")
+        await asyncio.sleep(0.1)
+        meeple.drop()
+        await asyncio.sleep(0.1)
+        await watcher.close()
+    try:
+        asyncio.run(run())
+        assert received == [("esp01/MAC_1/status", b"ONLINE"), ("esp01/MAC_1/status", b"OFFLINE")]
+        assert broker.call(lambda: dict(broker.broker.retained)) == {"esp01/MAC_1/status": (b"OFFLINE", 0)}
+    finally:
+        broker.stop()
@@ -189,4 +189,26 @@ def test_death_in_minigame():
     logs = game.apply_minigame_penalties()
     assert p2.pos == 4
     assert p2.hp == 10
-    assert any("P2 muere" in log for log in logs)
\ No newline at end of file
+    assert any("P2 muere" in log for log in logs)
+
+# ==========================================
+# 6. TEST DE REPRESENTACIÓN COMPACTA
+# ==========================================
+
+def test_players_and_game_use_slots():
+    """Player y Game no tienen __dict__: un campo no declarado es un error."""
+    game = Game(n_players=2)
+    assert not hasattr(game, "__dict__") and not hasattr(game.players[0], "__dict__")
+    with pytest.raises(AttributeError):
+        game.players[0].lifted = True
+
+def test_transient_fields_round_trip():
+    """Los campos transitorios viajan en to_dict y faltan sin problema en datos antiguos."""
+    game = Game(n_players=2)
+    game.players[1].lifted_piece = True
+    copy = Game.from_dict(game.to_dict())
+    assert copy.players[1].lifted_piece and not copy.players[1].move_verified
+    old = game.to_dict()
+    for p in old["players"]:
+        del p["lifted_piece"], p["move_verified"], p["skip"]
+    assert Game.from_dict(old).players[1].lifted_piece is False
@@ -0,0 +1,93 @@
+import json
+from table import State, Table
+from journal import Journal, flatten, unflatten
+from test_table import RecordingBus, msg, start_game
+
+def normalized(snap):
+    return json.loads(json.dumps(snap))
+
+def play(table, journal):
+    """Una partida corta, registrando la mesa tras cada paso como hace main.route()."""
+    steps = [lambda: table.on_button(msg({"button": 3}))]
+    for i in range(3):
+        steps.append(lambda i=i: table.on_register(msg({"mac": f"7-{i}"})))
+    for b in (1, 2, 3):
+        steps.append(lambda b=b: table.on_button(msg({"button": b})))
+    steps += [lambda: table.game.set_turn_order(table.init_rolls), lambda: table.set_state(State.IDLE)]
+    for p in range(3):
+        steps.append(lambda p=p: table.on_button(msg({"button": table.game.turn_order[p] + 1})))
+        steps.append(lambda: (table.set_state(State.IDLE), setattr(table, "ignore_inputs_until", 0)))
+    steps.append(lambda: table.on_meeple_status(msg("OFFLINE"), "7-1"))
+    journal.record(table)
+    for step in steps:
+        step()
+        journal.record(table)
+
+def test_flatten_roundtrip():
+    """flatten/unflatten conservan el snapshot, con y sin partida."""
+    t = Table(RecordingBus(), "7")
+    assert unflatten(flatten(normalized(t.snapshot()))) == normalized(t.snapshot())
+    start_game(t, 3)
+    assert unflatten(flatten(normalized(t.snapshot()))) == normalized(t.snapshot())
+
+def test_restart_restores_exact_state(tmp_path):
+    """Tras reiniciar, la mesa reconstruida desde el diario es idéntica a la original."""
+    path = str(tmp_path / "game.journal")
+    t = Table(RecordingBus(), "7")
+    journal = Journal(path)
+    journal.start()
+    play(t, journal)
+    journal.stop()
+
+    snaps = Journal(path).load()
+    assert normalized(snaps["7"]) == normalized(t.snapshot())
+    restored = Table(RecordingBus(), "7")
+    restored.restore(snaps["7"])
+    assert normalized(restored.snapshot()) == normalized(t.snapshot())
+
+    events = [json.loads(line).get("ev", []) for line in open(path)]
+    kinds = {k for ev in events for k in ev}
+    assert {"roll", "assign", "order", "move", "status"} <= kinds
+
+def test_group_commit_batches_records(tmp_path):
+    """Muchos registros seguidos se escriben en pocas confirmaciones (fsync por lote)."""
+    path = str(tmp_path / "game.journal")
+    journal = Journal(path, commit_interval=0.2, snapshot_every=10)
+    journal.start()
+    t = Table(RecordingBus(), "1")
+    for i in range(50):
+        t.ignore_inputs_until = i
+        journal.record(t)
+    journal.stop()
+    assert journal.records == 50 and journal.commits <= 2
+    snaps = [line for line in open(path) if '"snap"' in line]
+    assert len(snaps) == 5   # the first record and then every 10 events
+
+def test_torn_tail_is_dropped(tmp_path):
+    """Una línea a medio escribir por un crash se descarta y se recorta del fichero."""
+    path = str(tmp_path / "game.journal")
+    t = Table(RecordingBus(), "1")
+    journal = Journal(path)
+    journal.start()
+    journal.record(t)
+    journal.stop()
+    with open(path, "ab") as f:
+        f.write(b'{"t": "1", "set": {"timer_st')
+    assert "1" in Journal(path).load()
+    assert open(path, "rb").read().endswith(b"\n")
+
+def test_compaction_keeps_one_snapshot_per_table(tmp_path):
+    """Al superar compact_after el diario se reescribe como un snapshot por mesa."""
+    path = str(tmp_path / "game.journal")
+    journal = Journal(path, compact_after=20, commit_interval=0.01)
+    journal.start()
+    tables = [Table(RecordingBus(), str(i)) for i in range(3)]
+    for i in range(30):
+        for t in tables:
+            t.ignore_inputs_until = i
+            journal.record(t)
+    journal.stop()
+    lines = open(path).read().splitlines()
+    assert len(lines) < 20
+    snaps = Journal(path).load()
+    assert all(snaps[t.table_id]["ignore_inputs_until"] == 29 for t in tables)
@@ -0,0 +1,50 @@
+import contextlib, io, json
+import pytest
+import logger
+
+class Explodes:
+    def __str__(self):
+        raise AssertionError("formatted")
+
+@pytest.fixture
+def quiet():
+    level, console = logger.threshold, logger.console
+    logger.console = False
+    yield
+    logger.flush()
+    logger.threshold, logger.console = level, console
+    for sink in logger._files:
+        sink.close()
+    logger._files.clear()
+
+def test_filtered_records_are_not_formatted(quiet):
+    """Un registro por debajo del nivel no se formatea ni se guarda."""
+    logger.set_level("INFO")
+    before = len(logger.ring)
+    logger.debug("TEST", "valor %s", Explodes())
+    logger.log("TEST", "valor %s", Explodes(), level="DEBUG")
+    assert len(logger.ring) == before
+
+def test_ring_buffer_keeps_recent(quiet):
+    """El buffer circular guarda los últimos eventos ya formateables."""
+    logger.log("GAME", "P%d movió a %d", 2, 7, table="t9")
+    assert logger.recent(1)[0].endswith("[GAME  ] [t9] P2 movió a 7")
+
+def test_writer_uses_stream_at_call_time():
+    """La salida va al stdout vigente al registrar, aunque se escriba después."""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        logger.log("TEST", "hola %s", "mundo")
+    assert logger.flush()
+    assert "hola mundo" in out.getvalue()
+
+def test_json_lines_file_rotates(tmp_path, quiet):
+    """El fichero JSON-lines tiene un objeto por línea y rota por tamaño."""
+    path = str(tmp_path / "server.log")
+    logger.add_file(path, max_bytes=300, backups=2)
+    for i in range(20):
+        logger.log("INPUT", "Button %s pressed", i, level="WARN", table="a")
+    assert logger.flush()
+    records = [json.loads(line) for line in open(path + ".1")]
+    assert records[0]["mod"] == "INPUT" and records[0]["lvl"] == "WARN" and records[0]["table"] == "a"
+    assert (tmp_path / "server.log.2").exists() and not (tmp_path / "server.log.3").exists()
@@ -0,0 +1,39 @@
+import numpy as np
+import markov
+from board import Board
+from montecarlo import simulate
+
+def test_expected_turns_match_simulation():
+    """Los turnos esperados coinciden con la media simulada de un jugador."""
+    mc = simulate(100_000, players=1, seed=4)
+    assert abs(markov.chain(players=1).expected() - mc.lengths.mean()) < 0.05
+
+def test_win_probabilities_match_simulation():
+    """La probabilidad de ganar por asiento coincide con Monte Carlo."""
+    exact = markov.chain().win_probabilities()
+    mc = simulate(100_000, seed=5)
+    assert abs(exact.sum() - 1) < 1e-9
+    assert np.abs(exact - mc.win_rate).max() < 0.01
+
+def test_absorption_from_every_state():
+    """Desde cualquier estado se llega a la meta, y antes cuanto más cerca se está."""
+    chain = markov.chain()
+    assert (chain.finish_within(200) > 1 - 1e-9).all()
+    soon = chain.finish_within(1)
+    assert soon[chain.index(chain.size - 1, 10)] == 1 and soon[chain.start] == 0
+    assert chain.expected(chain.size - 3, 10) < chain.expected(0, 10)
+
+def test_cached_per_layout():
+    """Cada tablero se construye una sola vez."""
+    assert markov.chain() is markov.chain()
+    assert markov.chain(Board("copy", 16, {2: "dmg_1", 4: "heal_1", 6: "dmg_2", 8: "heal_2", 10: "dmg_1",
+                                           12: "heal_1", 14: "dmg_2"})) is markov.chain()
+    assert markov.chain(Board("long", 32, {})) is not markov.chain()
+
+def test_teleport_and_skip_match_simulation():
+    """Teletransporte y turnos perdidos: el modelo exacto coincide con Monte Carlo."""
+    board = Board("tricky", 24, {3: {"teleport": 11}, 7: "dmg_2", 13: {"skip": 1, "hp": -1}, 17: {"teleport": 5}})
+    mc = simulate(100_000, players=1, board=board, seed=6)
+    assert abs(markov.chain(board, players=1).expected() - mc.lengths.mean()) < 0.1
+    exact = markov.chain(board).win_probabilities()
+    assert np.abs(exact - simulate(100_000, board=board, seed=7).win_rate).max() < 0.01
@@ -0,0 +1,116 @@
+import atexit, json, time
+from memory_broker import MemoryBroker, MemoryClient
+
+def client(broker, client_id, *filters, **kwargs):
+    c = MemoryClient(broker, client_id, **kwargs)
+    c.received = []
+    c.on_message = lambda cl, u, m: cl.received.append((m.topic, m.payload, m.retain))
+    c.connect()
+    for filt in filters:
+        c.subscribe(filt, 1)
+    return c
+
+def wait_for(cond, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.005)
+    raise TimeoutError
+
+def test_wildcards():
+    """'+' cubre un nivel, '#' el resto (también el padre) y ningún comodín inicial cubre temas '$'."""
+    broker = MemoryBroker()
+    plus = client(broker, "plus", "esp01/+/status")
+    hash_ = client(broker, "hash", "table/#")
+    everything = client(broker, "all", "#")
+    pub = client(broker, "pub")
+    for topic in ("esp01/AA/status", "esp01/AA/BB/status", "table", "table/1/base/button", "$SYS/load"):
+        pub.publish(topic, "x")
+    broker.pump()
+    assert [t for t, _, _ in plus.received] == ["esp01/AA/status"]
+    assert [t for t, _, _ in hash_.received] == ["table", "table/1/base/button"]
+    assert "$SYS/load" not in [t for t, _, _ in everything.received]
+    assert len(everything.received) == 4
+
+def test_retained_and_shared():
+    """Los retenidos llegan al suscribirse (salvo a grupos compartidos) y un payload vacío los borra."""
+    broker = MemoryBroker()
+    pub = client(broker, "pub")
+    pub.publish("game/display", "hola", retain=True)
+    pub.publish("game/old", "x", retain=True)
+    pub.publish("game/old", "", retain=True)
+    late = client(broker, "late", "game/+")
+    shared = [client(broker, f"s{i}", "$share/g/game/+") for i in range(2)]
+    broker.pump()
+    assert late.received == [("game/display", b"hola", True)]
+    assert all(not s.received for s in shared)
+    for i in range(4):
+        pub.publish("game/display", str(i))
+    broker.pump()
+    assert [p for _, p, _ in shared[0].received] == [b"0", b"2"]
+    assert [p for _, p, _ in shared[1].received] == [b"1", b"3"]
+
+def test_will_on_drop_only():
+    """El último deseo se publica si el cliente cae, no si se desconecta limpiamente."""
+    broker = MemoryBroker()
+    watcher = client(broker, "watcher", "esp01/+/status")
+    for mac, leave in (("A", "drop"), ("B", "disconnect")):
+        c = MemoryClient(broker, mac)
+        c.will_set(f"esp01/{mac}/status", "offline", retain=True)
+        c.connect()
+        getattr(c, leave)()
+    broker.pump()
+    assert watcher.received == [("esp01/A/status", b"offline", False)]
+    assert broker.retained == {"esp01/A/status": (b"offline", 0)}
+
+def test_persistent_session_queues_qos1():
+    """Una sesión persistente desconectada recibe al volver los mensajes QoS 1, no los QoS 0."""
+    broker = MemoryBroker()
+    dev = client(broker, "dev", "esp01/config/A", clean_session=False)
+    pub = client(broker, "pub")
+    broker.pump()
+    dev.drop()
+    pub.publish("esp01/config/A", "q1", qos=1)
+    pub.publish("esp01/config/A", "q0", qos=0)
+    flags = []
+    dev.on_connect = lambda cl, u, f, rc, props: flags.append(f.session_present)
+    dev.connect()
+    broker.pump()
+    assert flags == [True]
+    assert [p for _, p, _ in dev.received] == [b"q1"]
+
+    dev.disconnect()
+    fresh = client(broker, "dev")   # clean session: the old subscriptions are gone
+    pub.publish("esp01/config/A", "again", qos=1)
+    broker.pump()
+    assert fresh.received == []
+
+def test_main_end_to_end_in_process():
+    """main.py completo sobre el broker en memoria: la estación base arranca una partida de 3."""
+    import main
+    broker = MemoryBroker()
+    main.use_client(MemoryClient(broker, "server"))
+    frames = []
+    def on_display(c, u, m):
+        frames.append(json.loads(m.payload))
+        c.publish("game/ack", json.dumps({"seq": frames[-1]["seq"]}))
+    base = MemoryClient(broker, "base")
+    base.on_message = on_display
+    base.connect()
+    base.subscribe("game/display")
+    base.loop_start()
+    main.bus.start()
+    try:
+        main.open_tables()
+        wait_for(lambda: frames)
+        base.publish("base/button", json.dumps({"button": 3}))
+        wait_for(lambda: frames[-1]["line1"] == "Roll initiative!")
+        for button in (1, 2, 3):
+            base.publish("base/button", json.dumps({"button": button}))
+        wait_for(lambda: frames[-1]["line2"].count("-") == 0)
+        assert len(main.tables[""].game.players) == 3
+    finally:
+        main.cleanup()
+        atexit.unregister(main.cleanup)
+        base.loop_stop()
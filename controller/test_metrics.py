@@ -0,0 +1,65 @@
+import urllib.request
+import metrics
+from metrics import Counter, Histogram, topic_label
+from display_sender import FlowState, Frame
+
+def test_histogram_percentiles_within_bucket_precision():
+    """Los percentiles del histograma tienen un error relativo menor que 1/2**SUB_BITS."""
+    h = Histogram("test_seconds", "prueba")
+    metrics.registry.remove(h)
+    for ms in range(1, 1001):
+        h.observe(ms / 1000)
+    assert h.count() == 1000
+    for q, exact in ((50, 0.5), (90, 0.9), (99, 0.99)):
+        assert exact <= h.percentile(q) <= exact * (1 + 1 / 2 ** metrics.SUB_BITS)
+
+def test_topic_label_folds_tables_and_devices():
+    """Las etiquetas agrupan mesas y dispositivos para no crecer sin límite."""
+    assert topic_label("table/t7/base/button") == "base/button"
+    assert topic_label("table/t7/esp01/player/2/sensor") == "esp01/player/+/sensor"
+    assert topic_label("esp01/A4:CF:12/status") == "esp01/+/status"
+    assert topic_label("esp01/register") == "esp01/register"
+
+def test_render_prometheus_text():
+    """render() da el formato de texto de Prometheus con buckets acumulados."""
+    c = Counter("test_total", "prueba", "topic")
+    h = Histogram("test_wait_seconds", "prueba")
+    try:
+        c.inc("base/button")
+        c.inc("base/button")
+        h.observe(0.003)
+        h.observe(0.2)
+        text = metrics.render()
+    finally:
+        metrics.registry.remove(c)
+        metrics.registry.remove(h)
+    assert "# TYPE test_total counter" in text
+    assert 'test_total{topic="base/button"} 2' in text
+    assert 'test_wait_seconds_bucket{le="0.001"} 0' in text
+    assert 'test_wait_seconds_bucket{le="0.005"} 1' in text
+    assert 'test_wait_seconds_bucket{le="+Inf"} 2' in text
+    assert "test_wait_seconds_count 2" in text
+
+def test_display_acks_and_timeouts_counted():
+    """El emisor del display cuenta las esperas de ACK y los ACK vencidos."""
+    acks, timeouts = metrics.ACK_WAIT.count(), metrics.ACK_TIMEOUTS.get()
+    flow = FlowState()
+    flow.inflight[flow.take_seq()] = (0.0, Frame({}, False, True, False))
+    flow.inflight[flow.take_seq()] = (0.0, Frame({}, False, True, False))
+    flow.on_ack(0, 0.01)
+    flow.expire(10.0)
+    assert metrics.ACK_WAIT.count() == acks + 1
+    assert metrics.ACK_TIMEOUTS.get() == timeouts + 1
+
+def test_http_endpoint():
+    """El endpoint /metrics responde desde su hilo con el texto de las métricas."""
+    server = metrics.serve(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as resp:
+            body = resp.read().decode()
+            assert resp.headers["Content-Type"].startswith("text/plain")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert "# TYPE mqtt_messages_received_total counter" in body
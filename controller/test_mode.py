@@ -114,10 +114,8 @@ class TestRunner:
         if self.should_run(6):
             print("\n[TEST 6] ACK Flow Control")
             print("-" * 40)
-            self.bus.ack_received = True  # Reset to True (normal state)
-            self.bus.pub("game/display", {"line1": "ACK Test", "line2": "Waiting...", "buttons": []})
-            time.sleep(0.5)  # Wait for ACK
-            ack_ok = self.bus.ack_received
+            pending = self.bus.pub("game/display", {"line1": "ACK Test", "line2": "Waiting...", "buttons": []})
+            ack_ok = pending.result(timeout=2) is True
             if ack_ok:
                 print("  ✓ ACK received from ESP32")
             self.log_result("ACK Received", ack_ok)
@@ -0,0 +1,23 @@
+from board import BOARD_SIZE, Board
+from montecarlo import simulate
+from selfplay import run
+
+def test_same_seed_same_results():
+    """Con la misma semilla la simulación es idéntica."""
+    a, b = simulate(2000, seed=7), simulate(2000, seed=7)
+    assert (a.wins == b.wins).all() and (a.lengths == b.lengths).all()
+    assert (a.tile_deaths == b.tile_deaths).all() and (a.minigame_deaths == b.minigame_deaths).all()
+
+def test_agrees_with_game_selfplay():
+    """Duración media y muertes por partida coinciden con Game jugado por bots iguales."""
+    mc = simulate(50_000, seed=1)
+    ref = run(2000, workers=1)
+    assert mc.wins.sum() == mc.games
+    assert abs(mc.lengths.mean() - sum(ref.turns) / ref.games) < 0.5
+    deaths = (mc.tile_deaths.sum() + mc.minigame_deaths.sum()) / mc.games
+    assert abs(deaths - sum(ref.deaths) / ref.games) < 0.1
+
+def test_plain_board_only_minigame_deaths():
+    """Sin casillas de daño solo se muere por los minijuegos."""
+    res = simulate(5000, board=Board("plain", BOARD_SIZE, {}), seed=2)
+    assert res.tile_deaths.sum() == 0 and res.wins.sum() == 5000
@@ -0,0 +1,105 @@
+import json, time, types
+import main
+from memory_broker import MemoryClient
+from metrics import MESSAGES_IN
+from table import Table
+from timer_wheel import TimerWheel
+from replication import Primary, Standby, HEARTBEAT_TIMEOUT
+from test_table import RecordingBus, msg, start_game
+from test_timer_wheel import FakeClock
+from virtual_game import VirtualServer
+
+def test_snapshot_restores_table_elsewhere():
+    """Una mesa restaurada desde su snapshot tiene el mismo estado, timers y pantalla."""
+    a = Table(RecordingBus(), "7")
+    start_game(a, 3)
+    a.game.set_turn_order(a.init_rolls)
+    a.game.players[1].hp = 4
+    a.game.players[1].lifted_piece = True
+    a.pub_later(4.0, "game/display", {"line1": "Turn: P1 ROLL!"})
+    snap = json.loads(json.dumps(a.snapshot()))
+
+    b = Table(RecordingBus(), "7")
+    b.restore(snap)
+    assert b.snapshot() == a.snapshot()
+    assert b.game.players[1].hp == 4 and b.game.players[1].lifted_piece
+    assert b.esp01_manager.assigned_ids == {0, 1, 2}
+    assert b.state_timer.active
+    assert abs(b.state_timer.deadline - a.state_timer.deadline) < 1e-6
+    assert len(b.deferred) == 1
+    assert b.bus.sent[-1] == ("game/display", json.loads(a.bus.last_display))
+
+def test_primary_sends_only_changes():
+    """El primario no reenvía un snapshot idéntico al último enviado."""
+    t = Table(RecordingBus())
+    bus = RecordingBus()
+    primary = Primary(bus, {"": t}, t.timers)
+    primary.publish(t)
+    primary.flush()
+    primary.publish(t)
+    primary.flush()
+    t.on_button(msg({"button": 2}))
+    primary.publish(t)
+    primary.flush()
+    states = [p for topic, p in bus.sent if topic == "replica/game/state"]
+    assert len(states) == 2
+    assert json.loads(states[-1])["n_players"] == 2
+
+def test_primary_coalesces_inputs_per_heartbeat():
+    """Muchas entradas entre dos latidos se envían como un solo estado, el último."""
+    t = Table(RecordingBus())
+    bus = RecordingBus()
+    primary = Primary(bus, {"": t}, t.timers)
+    start_game(t, 3)
+    for button in (1, 2, 3):
+        t.on_button(msg({"button": button}))
+        primary.publish(t, t.snapshot())
+    assert not bus.sent
+    primary.flush()
+    states = [json.loads(p) for topic, p in bus.sent if topic == "replica/game/state"]
+    assert states == [json.loads(json.dumps(t.snapshot()))]
+
+def test_standby_takes_over_after_missed_heartbeats():
+    """Sin latidos durante HEARTBEAT_TIMEOUT el standby asume las mesas replicadas."""
+    clock = FakeClock()
+    timers = TimerWheel(clock=clock)
+    taken = []
+    standby = Standby(timers, taken.append)
+    snap = Table(RecordingBus(), "3").snapshot()
+    standby.on_state(types.SimpleNamespace(payload=json.dumps(snap).encode()), "game")
+    beat = types.SimpleNamespace(payload=b"1")
+    standby.on_heartbeat(beat, "game")
+    clock.now += HEARTBEAT_TIMEOUT * 0.8
+    timers.advance()
+    standby.on_heartbeat(beat, "game")
+    clock.now += HEARTBEAT_TIMEOUT * 0.8
+    timers.advance()
+    assert not taken
+    clock.now += HEARTBEAT_TIMEOUT * 0.3
+    timers.advance()
+    assert standby.active and taken == [{"3": snap}]
+
+def test_promoted_standby_ignores_own_replica_traffic():
+    """Tras asumir, el nuevo primario deja el grupo: sus propios latidos no vuelven al standby."""
+    server = VirtualServer()
+    try:
+        main.start_standby("ha")
+        standby = main.standby
+        old_primary = MemoryClient(server.broker, "old-primary")
+        old_primary.connect()
+        old_primary.publish("replica/ha/state", json.dumps(Table(RecordingBus("table/r/"), "r").snapshot()))
+        old_primary.publish("replica/ha/heartbeat", "1")
+        server.run(0.1)
+        assert "r" in standby.snapshots and not standby.active
+        server.run(HEARTBEAT_TIMEOUT + 0.1)   # the old primary went quiet
+        assert standby.active and main.replica and "r" in main.tables
+        received = MESSAGES_IN.get("replica/ha/heartbeat")
+        beats = main.replica.beats
+        server.run(1.0)
+        assert main.replica.beats > beats
+        assert MESSAGES_IN.get("replica/ha/heartbeat") == received
+        assert "replica/ha/#" not in main.bus.extra
+        assert main.router.match("replica/ha/heartbeat") == (None, ())
+    finally:
+        main.replica = main.standby = None
+        server.close()
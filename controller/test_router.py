@@ -0,0 +1,44 @@
+from router import TopicRouter
+
+def make_router(calls):
+    router = TopicRouter()
+    router.add("base/button", lambda msg: calls.append(("button", msg)))
+    router.add("esp01/register", lambda msg: calls.append(("register", msg)))
+    router.add("esp01/+/status", lambda msg, mac: calls.append(("status", mac)))
+    router.add("esp01/player/+/sensor", lambda msg, pid: calls.append(("sensor", pid)))
+    router.add("esp01/log/#", lambda msg, rest: calls.append(("log", rest)))
+    return router
+
+def test_exact_and_wildcards():
+    """Cada topic llega a su handler con los segmentos '+' ya extraídos."""
+    calls = []
+    router = make_router(calls)
+    assert router.dispatch("base/button", "m")
+    assert router.dispatch("esp01/AA:BB/status", "m")
+    assert router.dispatch("esp01/player/2/sensor", "m")
+    assert router.dispatch("esp01/register", "m")
+    assert calls == [("button", "m"), ("status", "AA:BB"), ("sensor", "2"), ("register", "m")]
+
+def test_literal_beats_wildcard():
+    """'esp01/player/status' no es un sensor; 'player' cae en '+' como MAC."""
+    calls = []
+    router = make_router(calls)
+    router.dispatch("esp01/player/status", None)
+    assert calls == [("status", "player")]
+
+def test_hash_and_unrouted():
+    calls = []
+    router = make_router(calls)
+    assert router.dispatch("esp01/log/a/b", None)
+    assert calls == [("log", "a/b")]
+    assert not router.dispatch("game/ack", None)
+    assert not router.dispatch("esp01/player/1/led", None)
+
+def test_cache_is_consistent():
+    """El resultado cacheado es igual al de la primera resolución."""
+    router = make_router([])
+    first = router.match("esp01/player/3/sensor")
+    assert router.match("esp01/player/3/sensor") == first
+    router.cache_size = 1
+    router.match("esp01/X/status")
+    assert router.match("esp01/player/3/sensor") == first
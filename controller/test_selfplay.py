@@ -0,0 +1,24 @@
+import selfplay
+from selfplay import play, run
+
+def test_game_replays_from_seed():
+    """Cada partida depende solo de (semilla, número de partida)."""
+    assert play(3, 17) == play(3, 17)
+    assert play(3, 17) != play(3, 18)
+
+def test_every_game_ends_with_a_winner():
+    """Todas las partidas terminan con un ganador en un número razonable de turnos."""
+    report = run(300, workers=1)
+    assert report.unfinished == 0 and sum(report.wins) == 300
+    assert 5 < sum(report.turns) / 300 < selfplay.MAX_TURNS
+
+def test_profiles_change_minigame_results():
+    """Un perfil rápido gana más minijuegos que uno lento."""
+    report = run(300, profiles=("pro", "casual", "slow"), workers=1)
+    assert report.mini_wins[0] > report.mini_wins[1] > report.mini_wins[2]
+
+def test_pool_matches_serial():
+    """El reparto entre procesos no cambia los resultados."""
+    serial = run(200, seed=5, workers=1, chunk=50)
+    pooled = run(200, seed=5, workers=2, chunk=50)
+    assert (serial.wins, serial.turns, serial.deaths) == (pooled.wins, pooled.turns, pooled.deaths)
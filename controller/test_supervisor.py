@@ -0,0 +1,67 @@
+from memory_broker import MemoryBroker, MemoryClient
+from mqtt_bus import Bus
+from supervisor import Supervisor, shard_owner, shard_predicate, shard_prefixes, subscribe_shard
+
+def exiting_worker(index, members, heartbeats, control, adopt, table_ids):
+    heartbeats.put({"worker": index, "tables": ["7"], "adopt": list(adopt)})
+
+def test_shard_owner_spreads_tables():
+    """Las mesas se reparten entre todos los workers de forma aproximadamente uniforme."""
+    owners = [shard_owner(str(t), range(4)) for t in range(1000)]
+    assert all(150 < owners.count(w) < 350 for w in range(4))
+
+def test_removing_worker_only_moves_its_tables():
+    """Con rendezvous hashing, quitar un worker sólo reasigna las mesas que tenía."""
+    before = {str(t): shard_owner(str(t), [0, 1, 2, 3]) for t in range(500)}
+    after = {t: shard_owner(t, [0, 1, 3]) for t in before}
+    moved = [t for t in before if before[t] != after[t]]
+    assert moved and all(before[t] == 2 for t in moved)
+
+def test_shard_prefixes_cover_every_table_once():
+    """Con --tables cada mesa (y la mesa legacy) se suscribe en exactamente un worker."""
+    ids = [str(t) for t in range(20)]
+    subscribed = []
+    for index in range(3):
+        subscribed += shard_prefixes(shard_predicate(index, range(3)), ids)
+    assert sorted(subscribed) == sorted([""] + [f"table/{t}/" for t in ids])
+
+def test_worker_without_table_list_only_hears_its_tables():
+    """Sin --tables un worker sólo recibe los topics que abren mesas y, de sus mesas, el resto."""
+    broker = MemoryBroker()
+    received = []
+    bus = Bus(lambda client, userdata, msg: received.append(msg.topic),
+              client=MemoryClient(broker, "worker"))
+    subscribe_shard(bus, lambda table_id: True, None, {})
+    bus.client.connect()
+    broker.pump()
+    player = MemoryClient(broker, "player")
+    player.connect()
+    topics = ["table/5/base/button", "table/5/esp01/register", "table/5/game/connection"]
+    for topic in topics:
+        player.publish(topic, "{}")
+    broker.pump()
+    assert received == topics[1:]
+    received.clear()
+    bus.add_prefix("table/5/")
+    for topic in topics:
+        player.publish(topic, "{}")
+    broker.pump()
+    assert received == topics   # each topic once, not under both prefixes
+    received.clear()
+    bus.remove_prefix("table/5/")
+    player.publish(topics[0], "{}")
+    broker.pump()
+    assert received == []
+
+def test_supervisor_restarts_exited_worker():
+    """Un worker que termina se relanza con un pid nuevo y adopta las mesas conocidas."""
+    sup = Supervisor(1, target=exiting_worker)
+    sup.start()
+    first = sup.procs[0][0]
+    first.join(30)
+    sup.poll()
+    second = sup.procs[0][0]
+    assert second is not first
+    assert len(sup.restarts[0]) == 1
+    second.join(30)
+    assert sup.heartbeats.get(timeout=5)["adopt"] == ["7"]
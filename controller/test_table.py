@@ -0,0 +1,140 @@
+import json, time, types
+from table import State, Table
+
+class RecordingBus:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self.sent = []
+        self.last_display = None
+
+    def pub(self, topic, payload, **kwargs):
+        self.sent.append((self.prefix + topic, payload))
+        if topic == "game/display" and kwargs.get("cache", True) and kwargs.get("wait_ack", True):
+            self.last_display = json.dumps(payload)
+
+def msg(payload):
+    data = payload if isinstance(payload, str) else json.dumps(payload)
+    return types.SimpleNamespace(payload=data.encode())
+
+def start_game(table, n=2):
+    table.on_button(msg({"button": n}))
+    for i in range(n):
+        table.on_register(msg({"mac": f"{table.table_id}-{i}"}))
+    for b in range(1, n + 1):
+        table.on_button(msg({"button": b}))
+
+# ==========================================
+# 1. TEST DE MESAS INDEPENDIENTES
+# ==========================================
+
+def test_tables_are_isolated():
+    """Dos mesas no comparten juego, estado ni asignaciones de meeples."""
+    a = Table(RecordingBus("table/a/"), "a")
+    b = Table(RecordingBus("table/b/"), "b")
+    start_game(a, 3)
+    assert a.game and len(a.game.players) == 3
+    assert a.timer_state == State.INITIATIVE_COOLDOWN
+    assert b.game is None and b.timer_state == State.LOBBY
+    assert len(a.esp01_manager.assignments) == 3
+    assert not b.esp01_manager.assignments
+
+def test_meeple_config_uses_table_prefix():
+    """La configuración enviada al meeple apunta a los topics de su mesa."""
+    t = Table(RecordingBus("table/9/"), "9")
+    t.on_register(msg({"mac": "AA"}))
+    topic, config = t.bus.sent[-1]
+    assert topic == "table/9/esp01/AA/config"
+    assert config["sensor_topic"] == "table/9/esp01/player/1/sensor"
+
+def test_results_pause_does_not_block():
+    """Los resultados del minijuego no duermen el hilo: el siguiente turno se programa."""
+    t = Table(RecordingBus(), "")
+    start_game(t, 2)
+    t.game.set_turn_order(t.init_rolls)
+    t.game.current_minigame = "MASH"
+    t.game.state = "MINIGAME_RUN"
+    t.time_limit = 1
+    t.set_state(State.PLAYING)
+    now = time.time()
+    t.timers.advance(now + 1.1)
+    assert t.timer_state == State.IDLE
+    assert len(t.deferred) == 1
+    t.timers.advance(now + 5.2)
+    assert not t.deferred
+    assert t.bus.sent[-1][1]["line2"] == "Next: Roll!"
+
+# ==========================================
+# 2. TEST DE TIMEOUTS EN LA RUEDA DE TIMERS
+# ==========================================
+
+def test_meeple_reconnect_cancels_timeout():
+    """Reconectar el meeple cancela su timeout de 30s y reanuda el estado previo."""
+    t = Table(RecordingBus())
+    start_game(t, 3)
+    for i in range(3):
+        t.on_meeple_status(msg("ONLINE"), f"-{i}")
+    t.on_meeple_status(msg("OFFLINE"), "-0")
+    assert t.timer_state == State.MEEPLE_DISCONNECT and t.meeple_timer.active
+    t.on_meeple_status(msg("ONLINE"), "-0")
+    assert t.meeple_timer is None
+    assert t.timer_state == State.INITIATIVE_COOLDOWN and t.state_timer.active
+    t.timers.advance(time.time() + 31)
+    assert t.timer_state == State.IDLE
+    assert t.game.state == "TURN"
+
+def test_esp32_disconnect_timeout_resets_game():
+    """Sin la base durante 60s la partida se reinicia; la reconexión lo cancela."""
+    t = Table(RecordingBus())
+    start_game(t, 2)
+    t.on_connection(msg("DISCONNECTED"))
+    t.on_connection(msg("CONNECTED"))
+    assert t.disconnect_timer is None and t.timer_state == State.REFRESH_PENDING
+    t.on_connection(msg("DISCONNECTED"))
+    t.timers.advance(time.time() + 61)
+    assert t.disconnected_at == 0
+    assert ("game/status", "RESET") in t.bus.sent
+
+# ==========================================
+# 3. TEST DE LA MÁQUINA DE ESTADOS
+# ==========================================
+
+def test_every_state_has_handlers():
+    """Cada estado tiene manejador de entrada, y los que tienen plazo, de timeout."""
+    assert set(Table.ON_INPUT) == set(State)
+    assert set(Table.STATE_TIMEOUTS) | {State.PLAYING, State.WAITING_SIGNAL} == set(Table.ON_DEADLINE)
+
+def test_snapshot_stores_state_number():
+    """La instantánea guarda el estado como número y acepta el nombre de journals antiguos."""
+    t = Table(RecordingBus())
+    start_game(t, 2)
+    snap = json.loads(json.dumps(t.snapshot()))
+    assert snap["timer_state"] == int(State.INITIATIVE_COOLDOWN)
+    snap["timer_state"], snap["prev_timer_state"] = "INITIATIVE_COOLDOWN", "IDLE"
+    u = Table(RecordingBus())
+    u.restore(snap)
+    assert u.timer_state is State.INITIATIVE_COOLDOWN and u.prev_timer_state is State.IDLE
+
+def test_buttons_ignored_during_cooldown():
+    """Durante la pausa tras la iniciativa los botones no hacen nada."""
+    t = Table(RecordingBus())
+    start_game(t, 2)
+    sent = len(t.bus.sent)
+    t.on_button(msg({"button": 1}))
+    assert len(t.bus.sent) == sent and t.timer_state == State.INITIATIVE_COOLDOWN
+
+def test_skip_turn_goes_to_next_player():
+    """Quien cae en una casilla de saltar turno no mueve el meeple: pasa el turno al siguiente."""
+    t = Table(RecordingBus())
+    start_game(t, 2)
+    t.timers.advance(time.time() + 3.1)
+    assert t.timer_state == State.IDLE
+    current = t.game.get_current_player()
+    current.skip = 1
+    t.on_button(msg({"button": current.id + 1}))
+    assert current.skip == 0
+    assert ("game/display", {"line1": f"P{current.id+1} skips turn", "line2": "Next turn...", "buttons": []}) in t.bus.sent
+    assert (f"esp01/player/{current.id+1}/led", "BLINK") not in t.bus.sent
+    t.timers.advance(time.time() + 3.2)
+    assert t.timer_state == State.IDLE
+    assert t.game.get_current_player() is not current
+    assert t.bus.sent[-1][1]["line1"] == f"Turn: P{t.game.get_current_player().id+1} ROLL!"
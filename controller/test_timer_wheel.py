@@ -0,0 +1,58 @@
+import random
+from timer_wheel import TimerWheel
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_fires_in_order_never_early():
+    """Cada timer dispara después de su plazo y como mucho una resolución tarde."""
+    clock = FakeClock()
+    wheel = TimerWheel(resolution=0.01, slots=16, levels=3, clock=clock)
+    rng = random.Random(7)
+    fired = []
+    delays = [rng.uniform(0, 120) for _ in range(2000)]
+    for i, d in enumerate(delays):
+        wheel.schedule(d, lambda i=i: fired.append((i, clock.now)))
+    while clock.now < 1130:
+        clock.now += rng.uniform(0.001, 0.2)
+        wheel.advance()
+    assert len(fired) == 2000 and wheel.count == 0
+    for i, at in fired:
+        assert 0 <= at - (1000.0 + delays[i]) < 0.21
+
+def test_cancel_is_immediate():
+    clock = FakeClock()
+    wheel = TimerWheel(clock=clock)
+    fired = []
+    keep = wheel.schedule(1.0, fired.append, "keep")
+    drop = wheel.schedule(1.0, fired.append, "drop")
+    drop.cancel()
+    drop.cancel()
+    assert wheel.count == 1 and not drop.active and keep.active
+    clock.now += 2
+    assert wheel.advance() == [keep]
+    assert fired == ["keep"]
+
+def test_idle_wheel_and_next_expiry():
+    """Sin timers, advance() solo mueve el reloj y next_expiry() es None."""
+    clock = FakeClock()
+    wheel = TimerWheel(clock=clock)
+    assert wheel.next_expiry() is None
+    clock.now += 3600
+    assert wheel.advance() == []
+    wheel.schedule(0.05, lambda: None)
+    assert 0 < wheel.next_expiry() - clock.now <= 0.06
+
+def test_overflow_beyond_horizon():
+    clock = FakeClock()
+    wheel = TimerWheel(resolution=0.01, slots=4, levels=2, clock=clock)
+    fired = []
+    wheel.schedule(5.0, fired.append, 1)
+    for _ in range(600):
+        clock.now += 0.01
+        wheel.advance()
+    assert fired == [1]
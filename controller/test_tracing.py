@@ -0,0 +1,68 @@
+import json, types
+import pytest
+import tracing
+from display_sender import FlowState, Frame
+from virtual_game import VirtualServer, play_game
+
+@pytest.fixture
+def sampling():
+    tracing.every = 1
+    yield
+    tracing.flush()
+    tracing.every, tracing._path = 0, None
+    tracing.recent.clear()
+
+@pytest.fixture
+def server():
+    server = VirtualServer()
+    yield server
+    server.close()
+
+def message(topic):
+    return types.SimpleNamespace(topic=topic, payload=b"")
+
+def test_untraced_by_default():
+    """Sin exportar no se traza nada, aunque cada mensaje reciba su id."""
+    assert tracing.every == 0
+    assert tracing.begin(message("base/button")) is None
+    assert tracing.current() is None
+
+def test_button_to_display_spans(sampling, server):
+    """Una pulsación trazada tiene sus tramos en orden, el estado de la mesa y los frames del display."""
+    play_game(server, 3, table_id="tr")
+    buttons = [t for t in tracing.recent if t.topic == "table/tr/base/button" and t.table == "tr"]
+    assert buttons
+    names = [name for name, _, _ in buttons[-1].spans]
+    assert names[:4] == ["dispatch", "decode", "game", "persist"]
+    assert any("publish" in [n for n, _, _ in t.spans] and "ack" in [n for n, _, _ in t.spans] for t in buttons)
+    data = buttons[-1].to_dict()
+    assert data["state"] and data["next_state"] and data["ms"] >= 0
+
+def test_coalesced_frames_settle_every_trace(sampling):
+    """Al fusionar frames, cada traza fusionada termina con el ACK del frame."""
+    flow = FlowState()
+    traces = []
+    for _ in range(2):
+        trace = tracing.begin(message("base/button"))
+        frame = Frame({"line1": "x"}, False, True, True)
+        frame.traces = [tracing.track(trace)]
+        flow.enqueue(frame)
+        tracing.end(trace)
+        traces.append(trace)
+    assert not tracing.recent
+    frame = flow.queue.popleft()
+    frame.sent()
+    frame.settle(True)
+    assert list(tracing.recent) == traces
+    assert [n for n, _, _ in traces[0].spans][-2:] == ["publish", "ack"]
+
+def test_export_and_folded(tmp_path, sampling):
+    """Las trazas exportadas se pliegan en pilas tema;estado;tramo para un flame graph."""
+    path = tmp_path / "traces.jsonl"
+    tracing.export(str(path), sample_every=1)
+    trace = tracing.begin(message("table/t3/base/button"))
+    tracing.end(trace)
+    assert tracing.flush()
+    records = [json.loads(line) for line in open(path)]
+    assert records[-1]["id"] == trace.id
+    assert list(tracing.folded(records)) == ["base/button;-;dispatch"]
@@ -0,0 +1,98 @@
+import time
+import pytest
+import main
+from memory_broker import MemoryClient
+from supervisor import subscribe_shard
+from virtual_game import VirtualServer, GameRun, play_game
+
+@pytest.fixture(scope="module")
+def server():
+    server = VirtualServer()
+    yield server
+    server.close()
+
+def test_full_game_in_milliseconds(server):
+    """Una partida completa dura minutos de tiempo virtual y menos de un segundo real."""
+    start = time.perf_counter()
+    result = play_game(server, 1)
+    assert result["finished"] and result["result"].startswith("WINNER")
+    assert result["seconds"] > 60 and result["minigames"] >= 1
+    assert time.perf_counter() - start < 1.0
+
+def test_same_seed_same_game(server):
+    """La misma semilla reproduce la misma partida, en cualquier mesa."""
+    a = play_game(server, 7, table_id="a")
+    b = play_game(server, 7, table_id="b")
+    assert (a["result"], a["frames"], a["minigames"]) == (b["result"], b["frames"], b["minigames"])
+
+def test_base_disconnect_timeout(server):
+    """Sin la base durante 60 s virtuales, la mesa se reinicia."""
+    run = GameRun(server, "dc", 3)
+    try:
+        assert server.run_until(lambda: run.base.frame.get("line1") == "Roll initiative!", limit=60)
+        run.base.publish("game/connection", "DISCONNECTED")
+        started = server.clock.now
+        assert server.run_until(lambda: run.base.frame.get("line1") == "Resetting...", limit=120, step=0.1)
+        assert 60 <= server.clock.now - started < 60.5
+    finally:
+        run.close()
+
+def test_meeple_power_loss_countdown(server):
+    """Si un meeple pierde la corriente hay cuenta atrás y a los 30 s la partida sigue sin él."""
+    run = GameRun(server, "pl", 4)
+    try:
+        assert server.run_until(lambda: run.table.game and run.table.game.state == "TURN", limit=120)
+        run.meeples[0].drop()
+        started = server.clock.now
+        assert server.run_until(lambda: run.base.frame.get("line1") == "Game Continues!", limit=60, step=0.1)
+        assert 30 <= server.clock.now - started < 30.5
+        assert any(f.get("line1") == "P1 Offline!" for f in run.base.frames)
+    finally:
+        run.close()
+
+def test_many_scripted_games(server):
+    """Decenas de partidas con semillas distintas terminan todas."""
+    results = [play_game(server, seed) for seed in range(100, 130)]
+    assert all(r["finished"] for r in results)
+    assert len({r["result"] for r in results}) > 1
+
+def test_stray_topics_open_no_table(server):
+    """Un botón o sensor de una mesa desconocida no la crea; el registro de un meeple sí."""
+    device = MemoryClient(server.broker, "stray")
+    device.connect()
+    device.publish("table/zz/base/button", '{"button": 3}')
+    device.publish("table/zz/esp01/player/1/sensor", "CLEAN")
+    server.run(1)
+    assert "zz" not in main.tables
+    device.publish("table/zz/esp01/register", '{"mac": "ZZ"}')
+    server.run(1)
+    assert main.tables["zz"].esp01_manager.assignments == {"ZZ": 0}
+    device.disconnect()
+    main.drop_table("zz")
+
+def test_discovery_subscribes_to_opened_tables():
+    """En modo descubrimiento, abrir una mesa suscribe sus topics y cerrarla los suelta."""
+    server = VirtualServer()
+    try:
+        subscribe_shard(main.bus, lambda table_id: True, None, main.tables)
+        device = MemoryClient(server.broker, "dsc")
+        device.connect()
+        device.publish("table/dsc/esp01/register", '{"mac": "DS"}')
+        server.run(1)
+        assert "table/dsc/" in main.bus.prefixes
+        main.drop_table("dsc")
+        assert "table/dsc/" not in main.bus.prefixes
+        device.disconnect()
+    finally:
+        main.bus.discovery = False
+        server.close()
+
+def test_close_restores_main():
+    """close() devuelve a main su bus, reloj, timers y mesas, y descarta las mesas virtuales."""
+    before = main.bus, main.clock, main.timers, dict(main.tables)
+    server = VirtualServer()
+    run = GameRun(server, "cl", 5)
+    assert server.run_until(lambda: run.table is not None, limit=10)
+    server.close()
+    assert (main.bus, main.clock, main.timers, dict(main.tables)) == before
+    assert main.bus.display.clock == main.clock.monotonic
@@ -0,0 +1,129 @@
+import math, time
+from logger import log
+
+class Timer:
+    """Handle returned by TimerWheel.schedule(); cancel() is O(1)."""
+    __slots__ = ("deadline", "callback", "args", "owner", "_slot", "_wheel")
+
+    def __init__(self, deadline, callback, args, owner, wheel):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.owner = owner
+        self._slot = None
+        self._wheel = wheel
+
+    @property
+    def active(self):
+        return self._slot is not None
+
+    def cancel(self):
+        if self._slot is not None:
+            self._slot.discard(self)
+            self._slot = None
+            self._wheel.count -= 1
+
+class TimerWheel:
+    """Hierarchical timing wheel (Varghese & Lauck) for many cancellable timeouts.
+
+    Level 0 has `slots` buckets of `resolution` seconds; each higher level covers
+    `slots` times the span of the one below and is cascaded down as time reaches
+    it. schedule() and cancel() are O(1), and advance() does nothing beyond
+    moving the clock when no timer is pending.
+    """
+    def __init__(self, resolution=0.01, slots=256, levels=4, clock=time.time):
+        assert slots & (slots - 1) == 0, "slots must be a power of two"
+        self.resolution = resolution
+        self.slots = slots
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.levels = levels
+        self.clock = clock
+        self.wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+        self.overflow = set()
+        self.current = self._tick(clock())
+        self.count = 0
+        self._expiry = None   # cached next_expiry() tick; may be early after a cancel, never late
+
+    def _tick(self, t):
+        return int(t / self.resolution)
+
+    def schedule(self, delay, callback, *args, owner=None):
+        """Call callback(*args) once `delay` seconds from now."""
+        return self.schedule_at(self.clock() + max(0.0, delay), callback, *args, owner=owner)
+
+    def schedule_at(self, deadline, callback, *args, owner=None):
+        """Call callback(*args) at clock time `deadline` (on the next advance if already past)."""
+        timer = Timer(deadline, callback, args, owner, self)
+        self._insert(timer)
+        self.count += 1
+        return timer
+
+    def _insert(self, timer):
+        tick = max(math.ceil(timer.deadline / self.resolution), self.current + 1)
+        diff = tick - self.current
+        for level in range(self.levels):
+            if diff < 1 << (self.bits * (level + 1)):
+                slot = self.wheels[level][(tick >> (self.bits * level)) & self.mask]
+                if level == 0 and self._expiry is not None and tick < self._expiry:
+                    self._expiry = tick
+                break
+        else:
+            slot = self.overflow
+        slot.add(timer)
+        timer._slot = slot
+
+    def _cascade(self, level):
+        if level >= self.levels:
+            timers, self.overflow = self.overflow, set()
+        else:
+            idx = (self.current >> (self.bits * level)) & self.mask
+            if idx == 0:
+                self._cascade(level + 1)
+            slot = self.wheels[level][idx]
+            timers = list(slot)
+            slot.clear()
+        for timer in timers:
+            self._insert(timer)
+
+    def advance(self, now=None):
+        """Fire every timer due by `now`; returns the fired timers."""
+        target = self._tick(self.clock() if now is None else now)
+        fired = []
+        while self.current < target:
+            if self.count == 0:
+                self.current = target
+                break
+            self.current += 1
+            idx = self.current & self.mask
+            if idx == 0:
+                self._cascade(1)
+            slot = self.wheels[0][idx]
+            if not slot:
+                continue
+            due = list(slot)
+            slot.clear()
+            self.count -= len(due)
+            for timer in due:
+                timer._slot = None
+                fired.append(timer)
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    log("TIMER", f"Timer callback error: {e}", level="ERROR")
+        if self._expiry is not None and self.current >= self._expiry:
+            self._expiry = None
+        return fired
+
+    def next_expiry(self):
+        """Time of the next level-0 bucket holding a timer, or of the next cascade
+        if level 0 is empty. None when no timer is pending."""
+        if self.count == 0:
+            return None
+        if self._expiry is None:
+            self._expiry = (self.current | self.mask) + 1
+            for tick in range(self.current + 1, (self.current | self.mask) + 1):
+                if self.wheels[0][tick & self.mask]:
+                    self._expiry = tick
+                    break
+        return self._expiry * self.resolution
@@ -0,0 +1,208 @@
+"""Button-to-display latency traces, sampled and written as JSON lines.
+
+Every inbound message gets a trace id in main.dispatch(); one in
+`every` is traced. A trace is a list of spans on the monotonic clock:
+
+    receive   paho's receive timestamp to dispatch (client and engine queues)
+    dispatch  topic routing to the table handler
+    decode    payload parsing (Table._button marks it)
+    game      the table's state machine and game logic
+    persist   engine, replication and journal bookkeeping after the handler
+    publish   a game/display frame, from submit to the client's publish()
+    ack       that frame, from publish to its game/ack (ack_timeout if none)
+
+with the table's timer_state and game.state before and after the handler.
+Spans inside dispatch follow one another (mark() closes the open span at
+the current time); publish and ack spans come from the display sender
+thread, one pair per frame. The trace is written once its dispatch is
+over and all its frames have settled.
+
+The handling thread finds its trace with current(), a thread-local, so
+frames published by ticks on other threads are never attributed to it.
+Untraced messages cost a counter increment and a thread-local lookup.
+
+export(path) turns sampling on and writes finished traces from a
+background thread. To turn the file into a flame graph:
+
+    python tracing.py traces.jsonl > traces.folded
+    flamegraph.pl traces.folded > traces.svg   (or load it in speedscope)
+
+Stacks are topic;state;span, weighted in microseconds.
+"""
+import atexit, collections, itertools, json, sys, threading, time
+from metrics import topic_label
+
+clock = time.monotonic   # paho stamps received messages with it
+WRITE_INTERVAL = 1.0
+
+every = 0   # trace one message in `every`; 0 turns tracing off
+recent = collections.deque(maxlen=100)   # finished traces, newest last
+_ids = itertools.count(1)
+_local = threading.local()
+_lock = threading.Lock()
+_finished = collections.deque()
+_writer = None
+_wake = threading.Event()
+_path = None
+
+class Trace:
+    __slots__ = ("id", "topic", "start", "last", "spans", "table", "state", "game_state",
+                 "next_state", "next_game_state", "pending", "dispatched")
+
+    def __init__(self, trace_id, topic, start):
+        self.id = trace_id
+        self.topic = topic
+        self.start = start
+        self.last = start
+        self.spans = []   # (name, start, end)
+        self.table = None
+        self.state = self.game_state = None
+        self.next_state = self.next_game_state = None
+        self.pending = 0   # display frames not settled yet
+        self.dispatched = False
+
+    def mark(self, name):
+        """Close the span running since the previous mark."""
+        now = clock()
+        self.spans.append((name, self.last, now))
+        self.last = now
+
+    def enter(self, table):
+        """The handler of `table` is about to run."""
+        self.mark("dispatch")
+        self.table = table.table_id
+        self.state, self.game_state = _states(table)
+
+    def leave(self, table):
+        self.mark("game")
+        self.next_state, self.next_game_state = _states(table)
+
+    def frame_sent(self, entry):
+        """A display frame went out; entry is [trace, submitted at]."""
+        now = clock()
+        self.spans.append(("publish", entry[1], now))
+        entry[1] = now
+
+    def frame_settled(self, entry, acked):
+        if acked is not None:
+            self.spans.append(("ack" if acked else "ack_timeout", entry[1], clock()))
+        with _lock:
+            self.pending -= 1
+            done = self.dispatched and not self.pending
+        if done:
+            _finish(self)
+
+    def to_dict(self):
+        ms = lambda t: round((t - self.start) * 1e3, 3)
+        return {
+            "id": self.id, "topic": self.topic, "table": self.table,
+            "state": self.state, "game_state": self.game_state,
+            "next_state": self.next_state, "next_game_state": self.next_game_state,
+            "ms": ms(max(end for _, _, end in self.spans)) if self.spans else 0.0,
+            "spans": [[name, ms(start), ms(end)] for name, start, end in self.spans],
+        }
+
+def _states(table):
+    game = table.game
+    return table.timer_state.name, game.state if game else None
+
+def begin(msg):
+    """Give msg a trace id; returns its Trace, now current(), if it is sampled."""
+    trace_id = next(_ids)
+    if not every or trace_id % every:
+        return None
+    now = clock()
+    received = getattr(msg, "timestamp", 0)
+    trace = Trace(trace_id, msg.topic, received if 0 < received <= now else now)
+    if trace.start < now:
+        trace.mark("receive")
+    _local.trace = trace
+    return trace
+
+def current():
+    return getattr(_local, "trace", None)
+
+def mark(name):
+    """Close the current trace's open span, if the message is traced."""
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.mark(name)
+
+def end(trace):
+    """Dispatch of the traced message is over; its frames may still be in flight."""
+    _local.trace = None
+    trace.mark("persist" if trace.table is not None else "dispatch")
+    with _lock:
+        trace.dispatched = True
+        done = not trace.pending
+    if done:
+        _finish(trace)
+
+def track(trace):
+    """A display frame was submitted while `trace` was current: returns its
+    [trace, submitted at] entry for the frame."""
+    with _lock:
+        trace.pending += 1
+    return [trace, clock()]
+
+def _finish(trace):
+    recent.append(trace)
+    if _path:
+        _finished.append(trace)
+
+def export(path, sample_every=100):
+    """Trace one message in `sample_every` and append finished traces to `path`."""
+    global every, _path, _writer
+    every, _path = sample_every, path
+    if _writer is None:
+        _writer = threading.Thread(target=_write_loop, name="tracing", daemon=True)
+        _writer.start()
+
+def flush(timeout=2.0):
+    """Wait until every finished trace has been written."""
+    if _writer is None:
+        return True
+    done = threading.Event()
+    _finished.append(done)
+    _wake.set()
+    return done.wait(timeout)
+
+def _write_loop():
+    while True:
+        _wake.wait(WRITE_INTERVAL)
+        _wake.clear()
+        batch = []
+        while _finished:
+            batch.append(_finished.popleft())
+        lines = [json.dumps(t.to_dict(), separators=(",", ":")) + "\n" for t in batch if isinstance(t, Trace)]
+        if lines:
+            try:
+                with open(_path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except OSError as e:
+                sys.stderr.write(f"tracing: {_path}: {e}\n")
+        for marker in batch:
+            if isinstance(marker, threading.Event):
+                marker.set()
+
+def folded(records):
+    """Folded stacks (topic;state;span -> microseconds) summed over trace dicts."""
+    stacks = collections.Counter()
+    for r in records:
+        state = r["state"] or "-"
+        for name, start, end in r["spans"]:
+            stacks[f"{topic_label(r['topic'])};{state};{name}"] += round((end - start) * 1e3)
+    return stacks
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("usage: python tracing.py TRACES.jsonl > TRACES.folded")
+    with open(sys.argv[1], encoding="utf-8") as f:
+        stacks = folded(json.loads(line) for line in f if line.strip())
+    for stack, us in sorted(stacks.items()):
+        print(f"{stack} {us}")
+
+atexit.register(flush)
+
+if __name__ == "__main__":
+    main()
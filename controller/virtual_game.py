@@ -0,0 +1,242 @@
+"""Scripted games at simulated speed: main.py on a VirtualClock over memory_broker.
+
+VirtualServer points main.py at a clock.VirtualClock and an in-memory broker
+and attaches everything that can become due to the clock: queued messages,
+display frames, timers and table ticks, and the devices' own actions. No
+thread is started and nothing sleeps, so a whole game - 60s disconnect
+timeouts included - runs in milliseconds, deterministically for a seed.
+
+Base and Meeple are the devices of one table. The base plays by what the
+display shows (ACKing every frame) and the meeples register, then lift and
+place their piece when their LED blinks. play_game() runs one game from the
+lobby to GAME OVER.
+
+Run: python virtual_game.py [games]
+"""
+import atexit, contextlib, heapq, itertools, json, os, random, sys, time
+import main as game_server   # main.py; main() is this script's entry point
+from clock import VirtualClock
+from memory_broker import MemoryBroker, MemoryClient
+
+RETRY = 2.0            # press again if the display did not react
+GAME_LIMIT = 4 * 3600  # virtual seconds before play_game() gives up
+
+class VirtualServer:
+    def __init__(self, start=1_000_000.0):
+        self.clock = VirtualClock(start)
+        self.broker = MemoryBroker()
+        self.actions = []   # heap of (time, seq, fn, args)
+        self._seq = itertools.count()
+        self._saved = game_server.bus, game_server.bus.display.clock, game_server.clock, game_server.timers, dict(game_server.tables)
+        game_server.use_clock(self.clock)
+        game_server.use_client(MemoryClient(self.broker, "GameServer_virtual"))
+        atexit.unregister(game_server.cleanup)
+        game_server.bus.client.connect()   # no loop thread: the clock pumps the broker
+        clock = self.clock
+        clock.attach(lambda: clock.now if self.broker.pending else None, lambda now: self.broker.pump())
+        clock.attach(game_server.bus.display.next_deadline, lambda now: game_server.bus.display.poll())
+        clock.attach(game_server.next_due, game_server.step)
+        clock.attach(lambda: self.actions[0][0] if self.actions else None, self._run_actions)
+        clock.settle()
+
+    def close(self):
+        """Drop the tables opened here and give main.py back its bus, clock,
+        timers, tables and exit cleanup."""
+        for table_id in list(game_server.tables):
+            if table_id not in self._saved[4]:
+                game_server.drop_table(table_id)
+        game_server.bus.display.stop()
+        game_server.bus.client.disconnect()
+        game_server.bus, game_server.bus.display.clock, game_server.clock, game_server.timers, tables = self._saved
+        game_server.tables.clear()
+        game_server.tables.update(tables)
+        atexit.register(game_server.cleanup)
+
+    def at(self, delay, fn, *args):
+        """Run fn(*args) `delay` virtual seconds from now."""
+        heapq.heappush(self.actions, (self.clock.now + delay, next(self._seq), fn, args))
+
+    def _run_actions(self, now):
+        while self.actions and self.actions[0][0] <= now:
+            _, _, fn, args = heapq.heappop(self.actions)
+            fn(*args)
+
+    def run(self, seconds):
+        self.clock.run_until(self.clock.now + seconds)
+
+    def run_until(self, cond, limit=GAME_LIMIT, step=1.0):
+        """Advance until cond() holds; returns False if `limit` seconds pass first."""
+        end = self.clock.now + limit
+        while not cond():
+            if self.clock.now >= end:
+                return False
+            self.run(step)
+        return True
+
+class Device:
+    def __init__(self, server, table_id, client_id, rng):
+        self.server = server
+        self.prefix = f"table/{table_id}/" if table_id else ""
+        self.rng = rng
+        self.client = MemoryClient(server.broker, client_id)
+        self.client.on_message = lambda c, u, m: self.on_message(m.topic[len(self.prefix):], m.payload)
+
+    def publish(self, topic, payload, **kwargs):
+        self.client.publish(self.prefix + topic, payload, **kwargs)
+
+    def on_message(self, topic, payload):
+        pass
+
+class Base(Device):
+    """The ESP32 base: shows frames, ACKs them and presses buttons like a careful table.
+
+    think: seconds before pressing; mash_rate: presses/s in MASH; reaction and
+    timing: spread of REACTION presses after the signal and of TIME guesses.
+    """
+    def __init__(self, server, table_id, rng, players=3, think=(0.3, 1.5), mash_rate=6.0,
+                 reaction=(0.15, 0.6), timing=0.8):
+        super().__init__(server, table_id, f"base-{table_id}", rng)
+        self.players = players
+        self.think, self.mash_rate, self.reaction, self.timing = think, mash_rate, reaction, timing
+        self.frames = []
+        self.sounds = []
+        self.gen = 0          # bumped by every frame; stale planned presses are skipped
+        self.game_over = None
+        self.client.connect()
+        self.client.subscribe(self.prefix + "game/display")
+        self.client.subscribe(self.prefix + "game/sound")
+
+    @property
+    def frame(self):
+        return self.frames[-1] if self.frames else {}
+
+    def press(self, button, gen=None):
+        if gen is not None and gen != self.gen:
+            return
+        self.publish("base/button", json.dumps({"button": button}))
+        if gen is not None:
+            self.server.at(RETRY, self.press, button, gen)
+
+    def plan(self, delay, button):
+        self.server.at(delay, self.press, button, self.gen)
+
+    def on_message(self, topic, payload):
+        if topic == "game/sound":
+            self.sounds.append(payload.decode())
+            if payload == b"SIGNAL":
+                for button in range(1, self.players + 1):
+                    self.server.at(self.rng.uniform(*self.reaction), self.press, button)
+            return
+        frame = json.loads(payload)
+        self.frames.append(frame)
+        if "seq" in frame:
+            self.publish("game/ack", json.dumps({"seq": frame["seq"]}))
+        self.gen += 1
+        self.react(frame)
+
+    def react(self, frame):
+        line1, line2 = frame.get("line1", ""), frame.get("line2", "")
+        buttons = frame.get("buttons") or []
+        rng = self.rng
+        if line2 == "GAME OVER!!":
+            self.game_over = line1
+        elif line1 == "Players: 2 or 3?":
+            self.plan(rng.uniform(*self.think), self.players)
+        elif line1 == "MASH!!!":
+            self.plan(rng.expovariate(self.mash_rate), rng.choice(buttons or [1]))
+        elif line1 in ("WAIT FOR IT...", "TIME IT!"):
+            pass   # presses follow the SIGNAL sound or the target time
+        elif line1 == "Time Challenge":
+            target = float(line2.split()[-1].rstrip("s"))
+            for button in range(1, self.players + 1):
+                self.server.at(max(0.0, rng.gauss(target, self.timing)), self.press, button)
+        elif buttons:
+            self.plan(rng.uniform(*self.think), buttons[0])
+
+class Meeple(Device):
+    """An ESP-01 piece: registers, and on a blinking LED is lifted and put back."""
+    def __init__(self, server, table_id, index, rng, lift=(0.5, 2.0), place=(0.5, 2.0)):
+        self.mac = f"VM_{table_id}_{index}"
+        super().__init__(server, table_id, self.mac, rng)
+        self.lift, self.place = lift, place
+        self.config = None
+        self.client.will_set(self.prefix + f"esp01/{self.mac}/status", "OFFLINE", retain=True)
+        self.connect()
+
+    def connect(self):
+        self.client.connect()
+        self.client.subscribe(self.prefix + f"esp01/{self.mac}/config")
+        self.publish(f"esp01/{self.mac}/status", "ONLINE", retain=True)
+        self.publish("esp01/register", json.dumps({"mac": self.mac}))
+
+    def drop(self):
+        """Power loss: the broker publishes the will."""
+        self.client.drop()
+
+    def on_message(self, topic, payload):
+        if topic.endswith("/config"):
+            self.config = json.loads(payload)
+            self.client.subscribe(self.config["led_topic"])
+        elif self.config and self.prefix + topic == self.config["led_topic"] and payload == b"BLINK":
+            lift = self.rng.uniform(*self.lift)
+            self.server.at(lift, self.sense, "CLEAN")
+            self.server.at(lift + self.rng.uniform(*self.place), self.sense, "DETECTED")
+
+    def sense(self, state):
+        self.client.publish(self.config["sensor_topic"], state)
+
+class GameRun:
+    """One table's devices on a VirtualServer."""
+    def __init__(self, server, table_id, seed, players=3, **profile):
+        self.server = server
+        self.table_id = table_id
+        self.rng = random.Random(seed)
+        self.base = Base(server, table_id, self.rng, players, **profile)
+        self.meeples = [Meeple(server, table_id, i, self.rng) for i in range(players)]
+        server.clock.settle()
+
+    @property
+    def table(self):
+        return game_server.tables.get(self.table_id)
+
+    def close(self):
+        for device in [self.base] + self.meeples:
+            device.client.disconnect()
+        if self.table_id in game_server.tables:
+            game_server.drop_table(self.table_id)
+        game_server.bus.display.flows.pop(self.base.prefix + "game/display", None)
+        self.server.clock.settle()
+
+def play_game(server, seed, players=3, table_id=None, **profile):
+    """Play one game from the lobby to GAME OVER; returns a summary dict."""
+    random.seed(seed)   # the table's dice and minigame picks
+    run = GameRun(server, table_id or f"g{seed}", seed, players, **profile)
+    started = server.clock.now
+    try:
+        finished = server.run_until(lambda: run.base.game_over)
+        return {
+            "seed": seed,
+            "finished": finished,
+            "result": run.base.game_over,
+            "seconds": server.clock.now - started,
+            "frames": len(run.base.frames),
+            "minigames": run.base.sounds.count("MINIGAME_START") // 2,
+        }
+    finally:
+        run.close()
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        server = VirtualServer()
+        start = time.perf_counter()
+        results = [play_game(server, seed) for seed in range(games)]
+        elapsed = time.perf_counter() - start
+    virtual = sum(r["seconds"] for r in results)
+    print(f"{games} games in {elapsed:.2f}s ({games / elapsed:.0f} games/s), "
+          f"{sum(r['finished'] for r in results)} finished")
+    print(f"{virtual / 3600:.1f} virtual hours played, {virtual / elapsed:.0f}x real time; "
+          f"mean game {virtual / games / 60:.1f} min, {sum(r['minigames'] for r in results) / games:.1f} minigames")
+
+if __name__ == "__main__":
+    main()